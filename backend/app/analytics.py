@@ -0,0 +1,275 @@
+"""
+In-process analytics over a columnar copy of a user's transactions.
+
+A user's history is loaded once into NumPy arrays (dates as int64 epoch seconds,
+amounts as float64, type as int8 sign, categories dictionary-encoded to int32),
+kept sorted by date, and cached in a size-bounded LRU that is invalidated by the
+user's data version. Totals, category breakdowns, daily rolling windows,
+month-over-month change and percentiles are then vectorized array operations;
+a date window is two binary searches and a slice.
+"""
+import os
+import time
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from bson import ObjectId
+
+from . import crud
+
+# --- Configuration ---
+ANALYTICS_CACHE_BYTES = int(os.getenv('ANALYTICS_CACHE_BYTES', str(256 * 1024 * 1024)))
+ANALYTICS_CACHE_USERS = int(os.getenv('ANALYTICS_CACHE_USERS', '256'))
+ANALYTICS_CACHE_TTL = float(os.getenv('ANALYTICS_CACHE_TTL', '300'))  # covers writes made by other workers
+
+DAY = 86400
+_EPOCH = datetime(1970, 1, 1)
+INCOME, EXPENSE = 1, -1
+DEFAULT_PERCENTILES = (50, 75, 90, 95, 99)
+
+
+class TxColumns:
+    """A user's transactions as parallel arrays sorted by date."""
+
+    __slots__ = ('dates', 'amounts', 'signs', 'codes', 'categories')
+
+    def __init__(self, dates: np.ndarray, amounts: np.ndarray, signs: np.ndarray, codes: np.ndarray,
+                 categories: List[str]):
+        if len(dates) and np.any(dates[1:] < dates[:-1]):
+            order = np.argsort(dates, kind='stable')
+            dates, amounts, signs, codes = dates[order], amounts[order], signs[order], codes[order]
+        self.dates = dates
+        self.amounts = amounts
+        self.signs = signs
+        self.codes = codes
+        self.categories = categories
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    @property
+    def nbytes(self) -> int:
+        return (self.dates.nbytes + self.amounts.nbytes + self.signs.nbytes + self.codes.nbytes
+                + sum(len(c) + 50 for c in self.categories))
+
+    def window(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> 'TxColumns':
+        """Rows with start <= date <= end, as views (no copy)."""
+        lo = np.searchsorted(self.dates, _ts(start), 'left') if start else 0
+        hi = np.searchsorted(self.dates, _ts(end), 'right') if end else len(self.dates)
+        view = TxColumns.__new__(TxColumns)
+        view.dates, view.amounts = self.dates[lo:hi], self.amounts[lo:hi]
+        view.signs, view.codes = self.signs[lo:hi], self.codes[lo:hi]
+        view.categories = self.categories
+        return view
+
+
+def _ts(dt: datetime) -> int:
+    return (crud.utc_naive(dt) - _EPOCH) // timedelta(seconds=1)
+
+
+class ColumnBuilder:
+    """Accumulates transaction documents into compact typed buffers, then freezes them into TxColumns."""
+
+    def __init__(self):
+        self._dates = array('q')
+        self._amounts = array('d')
+        self._signs = array('b')
+        self._codes = array('i')
+        self._index: Dict[str, int] = {}
+
+    def add(self, doc: Dict[str, Any]):
+        dt = doc.get('date')
+        if not isinstance(dt, datetime):
+            return
+        try:
+            self._dates.append(int((dt - _EPOCH).total_seconds()))
+        except TypeError:  # tz-aware
+            self._dates.append(_ts(dt))
+        try:
+            self._amounts.append(float(doc.get('amount') or 0))
+        except (TypeError, ValueError):
+            self._amounts.append(0.0)
+        typ = doc.get('type')
+        self._signs.append(INCOME if typ == 'income' else EXPENSE if typ == 'expense' else 0)
+        cat = doc.get('category') or 'uncategorized'
+        code = self._index.get(cat)
+        if code is None:
+            code = self._index[cat] = len(self._index)
+        self._codes.append(code)
+
+    def build(self) -> TxColumns:
+        return TxColumns(np.frombuffer(self._dates, dtype=np.int64), np.frombuffer(self._amounts, dtype=np.float64),
+                         np.frombuffer(self._signs, dtype=np.int8), np.frombuffer(self._codes, dtype=np.int32),
+                         list(self._index))
+
+
+# -----------------------
+# Per-user cache
+# -----------------------
+_cache: 'OrderedDict[str, tuple]' = OrderedDict()  # user id -> (data version, loaded at, TxColumns)
+_cache_bytes = 0
+cache_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+
+def _evict(key: str):
+    global _cache_bytes
+    entry = _cache.pop(key, None)
+    if entry is not None:
+        _cache_bytes -= entry[2].nbytes
+
+
+async def load_columns(user_id: ObjectId) -> TxColumns:
+    """Read every transaction of the user (date ascending, projected) into TxColumns."""
+    builder = ColumnBuilder()
+    cursor = crud.get_db()[crud.TRAN_COL].find(
+        {'user_id': ObjectId(user_id)}, {'_id': 0, 'date': 1, 'amount': 1, 'type': 1, 'category': 1},
+    ).sort([('date', 1), ('_id', 1)]).batch_size(crud.EXPORT_BATCH_SIZE)
+    async for doc in cursor:
+        builder.add(doc)
+    return builder.build()
+
+
+async def get_columns(user_id: ObjectId) -> TxColumns:
+    """Cached TxColumns for the user; reloaded after the user's next write or ANALYTICS_CACHE_TTL."""
+    global _cache_bytes
+    key = str(user_id)
+    version = crud.data_version(user_id)
+    hit = _cache.get(key)
+    if hit and hit[0] == version and time.monotonic() - hit[1] < ANALYTICS_CACHE_TTL:
+        _cache.move_to_end(key)
+        cache_stats['hits'] += 1
+        return hit[2]
+    cache_stats['misses'] += 1
+    cols = await load_columns(user_id)
+    _evict(key)
+    if cols.nbytes <= ANALYTICS_CACHE_BYTES:
+        _cache[key] = (version, time.monotonic(), cols)
+        _cache_bytes += cols.nbytes
+        while _cache_bytes > ANALYTICS_CACHE_BYTES or len(_cache) > ANALYTICS_CACHE_USERS:
+            _evict(next(iter(_cache)))
+            cache_stats['evictions'] += 1
+    return cols
+
+
+def invalidate(user_id: Optional[ObjectId] = None):
+    """Drop one user's cached columns, or all of them."""
+    global _cache_bytes
+    if user_id is None:
+        _cache.clear()
+        _cache_bytes = 0
+    else:
+        _evict(str(user_id))
+
+
+# -----------------------
+# Vectorized metrics
+# -----------------------
+def _type_mask(cols: TxColumns, tx_type: Optional[str]):
+    if tx_type == 'income':
+        return cols.signs == INCOME
+    if tx_type == 'expense':
+        return cols.signs == EXPENSE
+    return None
+
+
+def totals(cols: TxColumns) -> Dict[str, Any]:
+    income_mask = cols.signs == INCOME
+    expense_mask = cols.signs == EXPENSE
+    income = float(cols.amounts[income_mask].sum())
+    expense = float(cols.amounts[expense_mask].sum())
+    return {
+        'income': round(income, 2),
+        'expense': round(expense, 2),
+        'net': round(income - expense, 2),
+        'count': int(len(cols)),
+        'income_count': int(np.count_nonzero(income_mask)),
+        'expense_count': int(np.count_nonzero(expense_mask)),
+    }
+
+
+def category_breakdown(cols: TxColumns, tx_type: Optional[str] = 'expense', top: Optional[int] = None) -> List[Dict[str, Any]]:
+    """[{category, total, count, share}] sorted by total, descending."""
+    mask = _type_mask(cols, tx_type)
+    codes = cols.codes if mask is None else cols.codes[mask]
+    amounts = cols.amounts if mask is None else cols.amounts[mask]
+    n = len(cols.categories)
+    sums = np.bincount(codes, weights=amounts, minlength=n)
+    counts = np.bincount(codes, minlength=n)
+    grand = sums.sum()
+    order = np.argsort(-sums, kind='stable')
+    order = order[counts[order] > 0][:top]
+    return [{'category': cols.categories[i], 'total': round(float(sums[i]), 2), 'count': int(counts[i]),
+             'share': round(float(sums[i] / grand), 4) if grand else 0.0} for i in order]
+
+
+def daily_rolling(cols: TxColumns, tx_type: Optional[str] = 'expense', window_days: int = 7) -> List[Dict[str, Any]]:
+    """Per-day totals over the covered range (zero-filled) with a trailing window_days mean."""
+    if not len(cols):
+        return []
+    mask = _type_mask(cols, tx_type)
+    days = cols.dates // DAY
+    first = int(days[0])
+    weights = cols.amounts if mask is None else np.where(mask, cols.amounts, 0.0)
+    daily = np.bincount(days - first, weights=weights)
+    w = max(1, int(window_days))
+    csum = np.concatenate(([0.0], np.cumsum(daily)))
+    idx = np.arange(1, len(daily) + 1)
+    lo = np.maximum(idx - w, 0)
+    rolling = (csum[idx] - csum[lo]) / np.minimum(idx, w)
+    start = _EPOCH + timedelta(days=first)
+    return [{'date': (start + timedelta(days=i)).strftime('%Y-%m-%d'), 'total': round(float(t), 2),
+             'rolling_avg': round(float(r), 2)} for i, (t, r) in enumerate(zip(daily, rolling))]
+
+
+def monthly(cols: TxColumns) -> List[Dict[str, Any]]:
+    """Per-month income / expense / net with month-over-month change in expense."""
+    if not len(cols):
+        return []
+    months = cols.dates.astype('datetime64[s]').astype('datetime64[M]').astype(np.int64)
+    first = int(months[0])
+    offsets = months - first
+    size = int(offsets[-1]) + 1
+    income = np.bincount(offsets, weights=np.where(cols.signs == INCOME, cols.amounts, 0.0), minlength=size)
+    expense = np.bincount(offsets, weights=np.where(cols.signs == EXPENSE, cols.amounts, 0.0), minlength=size)
+    prev = np.concatenate(([np.nan], expense[:-1]))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        change = np.where(prev > 0, (expense - prev) / prev, np.nan)
+    out = []
+    for i in range(size):
+        y, m = divmod(first + i, 12)
+        out.append({'month': f'{1970 + y:04d}-{m + 1:02d}', 'income': round(float(income[i]), 2),
+                    'expense': round(float(expense[i]), 2), 'net': round(float(income[i] - expense[i]), 2),
+                    'expense_change': None if np.isnan(change[i]) else round(float(change[i]), 4)})
+    return out
+
+
+def percentiles(cols: TxColumns, tx_type: Optional[str] = 'expense',
+                qs: Sequence[float] = DEFAULT_PERCENTILES) -> Dict[str, float]:
+    """Transaction amount percentiles, e.g. {'p50': ..., 'p95': ...}."""
+    mask = _type_mask(cols, tx_type)
+    amounts = cols.amounts if mask is None else cols.amounts[mask]
+    if not len(amounts):
+        return {}
+    values = np.percentile(amounts, qs)
+    return {f'p{q:g}': round(float(v), 2) for q, v in zip(qs, values)}
+
+
+def summarize(cols: TxColumns, start: Optional[datetime] = None, end: Optional[datetime] = None,
+              window_days: int = 7, top: int = 10) -> Dict[str, Any]:
+    """Everything the analytics endpoint returns, for the rows in [start, end]."""
+    view = cols.window(start, end)
+    return {
+        'totals': totals(view),
+        'by_category': category_breakdown(view, 'expense', top=top),
+        'daily': daily_rolling(view, 'expense', window_days),
+        'monthly': monthly(view),
+        'percentiles': percentiles(view, 'expense'),
+    }
+
+
+async def user_analytics(user_id: ObjectId, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                         window_days: int = 7, top: int = 10) -> Dict[str, Any]:
+    return summarize(await get_columns(user_id), start, end, window_days, top)
@@ -1,10 +1,38 @@
 from passlib.context import CryptContext
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
 from datetime import datetime, timedelta
-import os, jwt
-PWD_CONTEXT = CryptContext(schemes=['bcrypt'], deprecated='auto')
+from typing import Optional, Tuple
+import asyncio, os, time, jwt
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))
+AUTH_WORKERS = int(os.getenv('AUTH_WORKERS', '2'))
+# min/max pinned to the configured cost so hashes made with other rounds are flagged for rehash
+PWD_CONTEXT = CryptContext(schemes=['bcrypt'], deprecated='auto', bcrypt__default_rounds=BCRYPT_ROUNDS,
+                           bcrypt__min_rounds=BCRYPT_ROUNDS, bcrypt__max_rounds=BCRYPT_ROUNDS)
 SECRET_KEY = os.getenv('SECRET_KEY', 'change_me_for_prod')
 ALGORITHM = 'HS256'
 ACCESS_TOKEN_EXPIRE_MINUTES = 60*24*7 # 1 week
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', '4096'))
+TOKEN_CACHE_TTL = float(os.getenv('TOKEN_CACHE_TTL', '300'))
+
+# verified token -> (payload, serve-until epoch seconds); never past the token's exp
+_token_cache: 'OrderedDict[str, tuple]' = OrderedDict()
+token_cache_stats = {'hits': 0, 'misses': 0}
+
+# bcrypt releases the GIL, so a small thread pool keeps hashing off the event loop
+_hash_executor: Optional[ThreadPoolExecutor] = None
+
+def _executor() -> ThreadPoolExecutor:
+    global _hash_executor
+    if _hash_executor is None:
+        _hash_executor = ThreadPoolExecutor(max_workers=max(1, AUTH_WORKERS), thread_name_prefix='bcrypt')
+    return _hash_executor
+
+def shutdown_hash_executor():
+    global _hash_executor
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=True)
+        _hash_executor = None
 
 def hash_password(password: str) -> str:
     return PWD_CONTEXT.hash(password)
@@ -12,6 +40,16 @@ def hash_password(password: str) -> str:
 def verify_password(plain: str, hashed: str) -> bool:
     return PWD_CONTEXT.verify(plain, hashed)
 
+async def hash_password_async(password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(_executor(), hash_password, password)
+
+async def verify_and_update_password(plain: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify off the event loop. Returns (ok, new_hash); new_hash is set when the
+    stored hash used a different bcrypt cost and should be replaced.
+    """
+    return await asyncio.get_running_loop().run_in_executor(_executor(), PWD_CONTEXT.verify_and_update, plain, hashed)
+
 def create_access_token(data: dict, expires_delta: int | None = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=(expires_delta or ACCESS_TOKEN_EXPIRE_MINUTES))
@@ -20,8 +58,29 @@ def create_access_token(data: dict, expires_delta: int | None = None):
     return encoded
 
 def decode_token(token: str):
+    """
+    Verify a JWT and return its payload, or None if invalid/expired.
+    Verified payloads are cached (LRU, TOKEN_CACHE_SIZE entries) for up to
+    TOKEN_CACHE_TTL seconds and never beyond the token's own exp claim.
+    """
+    now = time.time()
+    hit = _token_cache.get(token)
+    if hit is not None:
+        payload, valid_until = hit
+        if now < valid_until:
+            _token_cache.move_to_end(token)
+            token_cache_stats['hits'] += 1
+            return payload
+        _token_cache.pop(token, None)
+    token_cache_stats['misses'] += 1
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
     except Exception:
         return None
+    valid_until = now + TOKEN_CACHE_TTL
+    if payload.get('exp') is not None:
+        valid_until = min(valid_until, float(payload['exp']))
+    _token_cache[token] = (payload, valid_until)
+    while len(_token_cache) > TOKEN_CACHE_SIZE:
+        _token_cache.popitem(last=False)
+    return payload
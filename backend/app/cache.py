@@ -0,0 +1,133 @@
+import asyncio
+import json
+import os
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from .utils import PARSER_VERSION
+
+# --- Configuration ---
+DOC_CACHE_MEMORY_BYTES = int(os.getenv('DOC_CACHE_MEMORY_BYTES', str(32 * 1024 * 1024)))
+DOC_CACHE_DIR = os.getenv('DOC_CACHE_DIR', '.doc_cache')  # empty string disables the disk tier
+DOC_CACHE_DISK_BYTES = int(os.getenv('DOC_CACHE_DISK_BYTES', str(512 * 1024 * 1024)))
+
+
+class DocumentCache:
+    """
+    Two-tier cache for OCR / parse results keyed by a hash of the uploaded bytes
+    plus the parser version. An in-memory LRU sits in front of a directory of
+    JSON files; both tiers are bounded by total size and evict oldest first.
+    """
+
+    def __init__(self, memory_bytes: int = DOC_CACHE_MEMORY_BYTES, directory: str = DOC_CACHE_DIR,
+                 disk_bytes: int = DOC_CACHE_DISK_BYTES):
+        self.memory_bytes = memory_bytes
+        self.directory = directory
+        self.disk_bytes = disk_bytes
+        self._mem: 'OrderedDict[str, bytes]' = OrderedDict()
+        self._mem_size = 0
+        self._disk_size: Optional[int] = None
+        self.counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+
+    @staticmethod
+    def key(namespace: str, sha256_hex: str) -> str:
+        """Cache key for an upload given the hex sha256 of its bytes."""
+        return f'{namespace}-v{PARSER_VERSION}-{sha256_hex}'
+
+    # -----------------------
+    # Memory tier
+    # -----------------------
+    def _mem_put(self, key: str, blob: bytes):
+        if len(blob) > self.memory_bytes:
+            return
+        old = self._mem.pop(key, None)
+        if old is not None:
+            self._mem_size -= len(old)
+        self._mem[key] = blob
+        self._mem_size += len(blob)
+        while self._mem_size > self.memory_bytes:
+            _, evicted = self._mem.popitem(last=False)
+            self._mem_size -= len(evicted)
+            self.counters['evictions'] += 1
+
+    # -----------------------
+    # Disk tier (blocking; called through asyncio.to_thread)
+    # -----------------------
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.json')
+
+    def _disk_get(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), 'rb') as f:
+                blob = f.read()
+            os.utime(self._path(key))  # refresh recency for eviction
+            return blob
+        except OSError:
+            return None
+
+    def _disk_put(self, key: str, blob: bytes):
+        os.makedirs(self.directory, exist_ok=True)
+        if self._disk_size is None:
+            self._disk_size = sum(e.stat().st_size for e in os.scandir(self.directory) if e.is_file())
+        tmp = self._path(key) + f'.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(blob)
+        os.replace(tmp, self._path(key))
+        self._disk_size += len(blob)
+        if self._disk_size > self.disk_bytes:
+            self._disk_evict()
+
+    def _disk_evict(self):
+        entries = []
+        for e in os.scandir(self.directory):
+            if e.is_file() and e.name.endswith('.json'):
+                st = e.stat()
+                entries.append((st.st_mtime, st.st_size, e.path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        # trim to 90% so every write near the limit does not trigger a full scan
+        target = int(self.disk_bytes * 0.9)
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                self.counters['evictions'] += 1
+            except OSError:
+                pass
+        self._disk_size = total
+
+    # -----------------------
+    # Public API
+    # -----------------------
+    async def get(self, key: str) -> Optional[Any]:
+        blob = self._mem.get(key)
+        if blob is not None:
+            self._mem.move_to_end(key)
+            self.counters['memory_hits'] += 1
+            return json.loads(blob)
+        if self.directory:
+            blob = await asyncio.to_thread(self._disk_get, key)
+            if blob is not None:
+                self._mem_put(key, blob)
+                self.counters['disk_hits'] += 1
+                return json.loads(blob)
+        self.counters['misses'] += 1
+        return None
+
+    async def set(self, key: str, value: Any):
+        blob = json.dumps(value, default=str).encode('utf-8')
+        self._mem_put(key, blob)
+        if self.directory:
+            try:
+                await asyncio.to_thread(self._disk_put, key, blob)
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, 'memory_entries': len(self._mem), 'memory_bytes': self._mem_size,
+                'disk_bytes': self._disk_size}
+
+
+doc_cache = DocumentCache()
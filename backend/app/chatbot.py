@@ -1,232 +1,284 @@
-# """
-# LLM summary helpers (date-free):
-# - Sends the user's prompt and ALL transactions to the LLM.
-# - The LLM is instructed to infer any date range or time window from the prompt.
-# - No server-side date parsing or filtering.
-# - Includes a compacting step to keep payload size under control.
-# - Falls back to a deterministic metrics-only summary if the OpenAI SDK/key is missing.
-
-# Requires: pip install openai
-# Env var: OPENAI_API_KEY
-# """
-
-# from __future__ import annotations
-# from typing import List, Dict, Any, Optional
-# import os, json
-# from datetime import datetime
-# from decimal import Decimal
-
-# # top of file
-# import os
-# from typing import Optional
-# from openai import OpenAI
-
-# # OPTIONAL: load from .env (pip install python-dotenv)
-# try:
-#     from dotenv import load_dotenv  # type: ignore
-#     load_dotenv()
-# except Exception:
-#     pass
-
-# def _make_openai_client() -> Optional[OpenAI]:
-#     key = os.getenv("OPENAI_API_KEY")
-#     if not key:
-#         print("OPENAI_API_KEY is not set; using fallback summary")
-#         return None
-#     try:
-#         # Explicitly pass the key (avoids odd env inheritance issues)
-#         client = OpenAI(api_key=key)
-#         return client
-#     except Exception as e:
-#         print(f"OpenAI client init failed: {e!r}")
-#         return None
-
-# _openai_client: Optional[OpenAI] = _make_openai_client()
-
-
-
-# # -----------------------------
-# # Metrics helpers (date-agnostic)
-# # -----------------------------
-
-# def compute_metrics(transactions: List[Dict[str, Any]]) -> Dict[str, Any]:
-#     """Compute quick aggregates across ALL transactions (no date logic)."""
-#     income = 0.0
-#     expense = 0.0
-#     by_category: Dict[str, float] = {}
-
-#     for tx in transactions:
-#         typ = (tx.get("type") or "").lower()
-#         amt = float(tx.get("amount") or 0)
-#         cat = tx.get("category") or "Uncategorized"
-#         by_category[cat] = by_category.get(cat, 0.0) + (amt if typ == "income" else -amt)
-#         if typ == "income":
-#             income += amt
-#         elif typ == "expense":
-#             expense += amt
-
-#     top_spend = sorted(
-#         ((c, -v) for c, v in by_category.items() if v < 0), key=lambda x: x[1], reverse=True
-#     )[:5]
-
-#     return {
-#         "counts": {
-#             "total": len(transactions),
-#             "income": sum(1 for t in transactions if (t.get("type") or "").lower() == "income"),
-#             "expense": sum(1 for t in transactions if (t.get("type") or "").lower() == "expense"),
-#         },
-#         "totals": {
-#             "income": round(income, 2),
-#             "expense": round(expense, 2),
-#             "net": round(income - expense, 2),
-#         },
-#         "top_expense_categories": [{"category": c, "amount": a} for c, a in top_spend],
-#     }
-
-# # -----------------------------
-# # Compact rows for LLM
-# # -----------------------------
-
-# def _to_iso_str(value) -> str:
-#     """Return value as a short ISO-ish string (or empty)."""
-#     if value is None:
-#         return ""
-#     if isinstance(value, datetime):
-#         return value.isoformat()
-#     return str(value)
-
-# def _to_float(value) -> float:
-#     try:
-#         if isinstance(value, Decimal):
-#             return float(value)
-#         return float(value)
-#     except Exception:
-#         return 0.0
-
-# def _category_name(cat) -> str:
-#     if isinstance(cat, dict):
-#         return cat.get("name") or cat.get("label") or "Uncategorized"
-#     if isinstance(cat, str):
-#         return cat or "Uncategorized"
-#     return "Uncategorized"
-
-# def _compact_tx_list(transactions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-#     """
-#     Keep only the fields the LLM needs and keep payload size small.
-#     Sort by date ascending. Truncate if extremely large.
-#     """
-#     def to_row(tx):
-#         raw_date = tx.get("date") or tx.get("created_at") or tx.get("timestamp")
-#         date_text = _to_iso_str(raw_date)
-#         if date_text:
-#             date_text = date_text[:25]  # keep it compact
-
-#         return {
-#             "date": date_text,                              # ISO-ish string
-#             "type": (tx.get("type") or "").lower(),         # income | expense
-#             "amount": _to_float(tx.get("amount")),          # number
-#             "category": _category_name(tx.get("category")), # string
-#             "note": tx.get("note") or "",
-#         }
-
-#     rows = [to_row(t) for t in transactions]
-
-#     # Sort by date text (ISO sorts lexicographically fine enough here)
-#     try:
-#         rows.sort(key=lambda r: r["date"])
-#     except Exception:
-#         pass
-
-#     # Safety cap (tune as needed)
-#     MAX_ROWS = 5000
-#     if len(rows) > MAX_ROWS:
-#         rows = rows[-MAX_ROWS:]
-
-#     return rows
-
-# # -----------------------------
-# # Fallback (no LLM)
-# # -----------------------------
-
-# def _fallback_summary(metrics: Dict[str, Any]) -> str:
-#     t = metrics.get("totals", {})
-#     cats = metrics.get("top_expense_categories", [])
-#     lines = [
-#         "# Transactions summary",
-#         f"**Income:** {t.get('income', 0):,.2f}",
-#         f"**Expenses:** {t.get('expense', 0):,.2f}",
-#         f"**Net:** {t.get('net', 0):,.2f}",
-#         "\n**Top expense categories:**",
-#     ]
-#     if cats:
-#         for c in cats:
-#             lines.append(f"- {c['category']}: {c['amount']:,.2f}")
-#     else:
-#         lines.append("- (no expense categories)")
-#     return "\n".join(lines)
-
-# # -----------------------------
-# # Main entry: prompt + ALL tx → LLM
-# # -----------------------------
-
-# DEFAULT_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-
-# def summarize_with_llm_on_raw(user_prompt: str, transactions: List[Dict[str, Any]]) -> Dict[str, Any]:
-#     """
-#     Send ALL transactions (compacted) + the user prompt to the LLM.
-#     The LLM will parse any date window from the prompt and filter internally.
-#     Server does not parse or pass dates.
-#     """
-#     rows = _compact_tx_list(transactions)
-
-#     if not _openai_client:
-#         print("OpenAI client not configured; falling back to metrics-only summary")
-#         # Fallback: compute metrics over ALL rows (no date filtering)
-#         metrics = compute_metrics(transactions)
-#         md = _fallback_summary(metrics)
-#         return {"summary_text": md, "metrics": metrics}
-
-#     system_instructions = (
-#         "You are a personal finance analyst.\n"
-#         "You will receive the user's request and a JSON array of transactions.\n"
-#         "First, parse any time window from the user's prompt (e.g., 'from 1 Aug to 31 Aug', 'last month', 'this week').\n"
-#         "Then FILTER the transactions to that window and produce a concise Markdown summary:\n"
-#         "- Totals: income, expenses, net\n"
-#         "- 3–5 bullet insights (top categories, unusual spikes, large single expenses, recurring items)\n"
-#         "- A short takeaway\n"
-#         "If the prompt does not specify a time range clearly, infer the most reasonable one (e.g., current month) and state it.\n"
-#         "Keep under 180 words. Be factual—do not invent numbers."
-#     )
-
-#     content = {
-#         "user_request": user_prompt,
-#         "transactions": rows,
-#         "schema": {
-#             "date": "ISO string",
-#             "type": "'income' | 'expense'",
-#             "amount": "number",
-#             "category": "string",
-#             "note": "string",
-#         },
-#     }
-
-#     try:
-#         resp = _openai_client.responses.create(
-#             model=DEFAULT_MODEL,
-#             instructions=system_instructions,
-#             input=[{"role": "user", "content": json.dumps(content)}],
-#         )
-#         print("OpenAI response:", resp)
-
-#         md = getattr(resp, "output_text", "").strip()
-#         if not md:
-#             metrics = compute_metrics(transactions)
-#             md = _fallback_summary(metrics)
-#             return {"summary_text": md, "metrics": metrics}
-
-#         # We don’t recompute server-side, since the model owns the date window.
-#         return {"summary_text": md, "metrics": None}
-#     except Exception:
-#         metrics = compute_metrics(transactions)
-#         md = _fallback_summary(metrics)
-#         return {"summary_text": md, "metrics": metrics}
+"""
+Transaction summaries for /api/llm/summary.
+
+- The time window is resolved on the server from the prompt ("last month",
+  "from 1 Aug to 31 Aug", "last 30 days", ...; default: this month).
+- Totals, category breakdown and largest expenses for that window come from
+  Mongo aggregations (the daily rollups plus one sorted, limited find).
+- Only that compact digest goes to the summarizer. The default summarizer is the
+  deterministic, offline _fallback_summary; SUMMARY_BACKEND=openai uses the
+  OpenAI SDK when it is installed and OPENAI_API_KEY is set.
+- Results are cached per (user, window, data version), so repeat views skip both
+  the aggregation and the model call.
+"""
+
+from __future__ import annotations
+import asyncio
+import calendar
+import json
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from bson import ObjectId
+
+from . import crud
+from .utils import find_date
+
+log = logging.getLogger(__name__)
+
+# --- Configuration ---
+SUMMARY_BACKEND = os.getenv("SUMMARY_BACKEND", "fallback")  # fallback | openai
+DEFAULT_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+SUMMARY_TIMEOUT = float(os.getenv("SUMMARY_TIMEOUT", "30"))
+SUMMARY_CACHE_TTL = float(os.getenv("SUMMARY_CACHE_TTL", "600"))
+SUMMARY_CACHE_SIZE = 512
+TOP_N = 5
+
+Summarizer = Callable[[Dict[str, Any]], Awaitable[str]]
+
+
+# -----------------------------
+# Time window
+# -----------------------------
+
+_MONTH_NAMES = {name.lower(): i for i, name in enumerate(calendar.month_name) if name}
+_MONTH_NAMES.update({name.lower(): i for i, name in enumerate(calendar.month_abbr) if name})
+_RANGE_RE = re.compile(r"\b(?:from|between)\s+(.+?)\s+(?:to|and|until|till|through|-)\s+(.+?)(?=$|[,;?!]|\.\s)")
+_LAST_N_RE = re.compile(r"\b(?:last|past|previous)\s+(\d{1,4})\s+(day|week|month)s?\b")
+_MONTH_RE = re.compile(r"\b(" + "|".join(sorted(_MONTH_NAMES, key=len, reverse=True)) + r")\b(?:\s+((?:19|20)\d{2}))?")
+
+
+def _start_of_day(dt: datetime) -> datetime:
+    return datetime(dt.year, dt.month, dt.day)
+
+
+def _end_of_day(dt: datetime) -> datetime:
+    return _start_of_day(dt) + timedelta(days=1, microseconds=-1)
+
+
+def _month_bounds(year: int, month: int) -> Tuple[datetime, datetime]:
+    last = calendar.monthrange(year, month)[1]
+    return datetime(year, month, 1), _end_of_day(datetime(year, month, last))
+
+
+def _shift_month(year: int, month: int, delta: int) -> Tuple[int, int]:
+    y, m = divmod(year * 12 + (month - 1) + delta, 12)
+    return y, m + 1
+
+
+def resolve_window(prompt: str, now: Optional[datetime] = None) -> Tuple[datetime, datetime, str]:
+    """
+    Date window a prompt asks about, as (start, end inclusive, label).
+    Explicit ranges win, then relative phrases, then a month name; default is this month.
+    """
+    now = now or datetime.utcnow()
+    today = _start_of_day(now)
+    p = (prompt or "").lower()
+
+    m = _RANGE_RE.search(p)
+    if m:
+        start = find_date(m.group(1), dayfirst=True, default_year=now.year)
+        end = find_date(m.group(2), dayfirst=True, default_year=now.year)
+        if start and end:
+            if end < start:
+                start, end = end, start
+            return _start_of_day(start), _end_of_day(end), f"{start:%Y-%m-%d} to {end:%Y-%m-%d}"
+
+    m = _LAST_N_RE.search(p)
+    if m:
+        n, unit = int(m.group(1)), m.group(2)
+        days = n * {"day": 1, "week": 7, "month": 30}[unit]
+        return today - timedelta(days=days - 1), _end_of_day(now), f"last {n} {unit}{'s' if n != 1 else ''}"
+
+    if "yesterday" in p:
+        y = today - timedelta(days=1)
+        return y, _end_of_day(y), "yesterday"
+    if "today" in p:
+        return today, _end_of_day(now), "today"
+    if "last week" in p or "previous week" in p:
+        start = today - timedelta(days=today.weekday() + 7)
+        return start, _end_of_day(start + timedelta(days=6)), "last week"
+    if "this week" in p:
+        return today - timedelta(days=today.weekday()), _end_of_day(now), "this week"
+    if "last month" in p or "previous month" in p:
+        y, mo = _shift_month(now.year, now.month, -1)
+        start, end = _month_bounds(y, mo)
+        return start, end, "last month"
+    if "last year" in p or "previous year" in p:
+        return datetime(now.year - 1, 1, 1), _end_of_day(datetime(now.year - 1, 12, 31)), "last year"
+    if "this year" in p or "year to date" in p or "ytd" in p:
+        return datetime(now.year, 1, 1), _end_of_day(now), "this year"
+
+    m = _MONTH_RE.search(p)
+    if m and (m.group(1) != "may" or m.group(2)):  # a bare "may" is usually the verb
+        month = _MONTH_NAMES[m.group(1)]
+        year = int(m.group(2)) if m.group(2) else (now.year if month <= now.month else now.year - 1)
+        start, end = _month_bounds(year, month)
+        return start, end, f"{start:%B %Y}"
+
+    start, _ = _month_bounds(now.year, now.month)
+    return start, _end_of_day(now), "this month"
+
+
+# -----------------------------
+# Digest (Mongo aggregation push-down)
+# -----------------------------
+
+async def build_digest(user_id: ObjectId, start: datetime, end: datetime, label: str,
+                       tx_type: Optional[str] = None) -> Dict[str, Any]:
+    """Compact metrics for the window: totals from the rollups, plus the largest expenses."""
+    category_type = tx_type or "expense"
+    summary, top = await asyncio.gather(
+        crud.dashboard_summary(user_id, start, end, category_type),
+        crud.top_transactions(user_id, start, end, "expense", limit=TOP_N),
+    )
+    t = summary["totals"]
+    return {
+        "window": {"start": start.strftime("%Y-%m-%d"), "end": end.strftime("%Y-%m-%d"), "label": label},
+        "counts": {"total": t["count"], "income": t["income_count"], "expense": t["expense_count"]},
+        "totals": {"income": round(t["income"], 2), "expense": round(t["expense"], 2), "net": round(t["net"], 2)},
+        "category_type": category_type,
+        "top_categories": [{"category": c["category"], "amount": round(c["total"], 2)}
+                           for c in summary["by_category"][:TOP_N]],
+        "top_expenses": [{"date": tx["date"].strftime("%Y-%m-%d") if isinstance(tx.get("date"), datetime) else None,
+                          "amount": round(float(tx.get("amount") or 0), 2),
+                          "category": tx.get("category") or "Uncategorized",
+                          "note": (tx.get("note") or "")[:80]} for tx in top],
+    }
+
+
+# -----------------------------
+# Summarizers
+# -----------------------------
+
+def _fallback_summary(metrics: Dict[str, Any]) -> str:
+    t = metrics.get("totals", {})
+    w = metrics.get("window", {})
+    cats = metrics.get("top_categories", [])
+    top = metrics.get("top_expenses", [])
+    lines = [
+        f"# Transactions summary ({w.get('label', '')}: {w.get('start', '')} to {w.get('end', '')})",
+        f"**Income:** {t.get('income', 0):,.2f}",
+        f"**Expenses:** {t.get('expense', 0):,.2f}",
+        f"**Net:** {t.get('net', 0):,.2f}",
+        f"\n**Top {metrics.get('category_type', 'expense')} categories:**",
+    ]
+    if cats:
+        for c in cats:
+            lines.append(f"- {c['category']}: {c['amount']:,.2f}")
+    else:
+        lines.append(f"- (no {metrics.get('category_type', 'expense')} categories)")
+    if top:
+        lines.append("\n**Largest expenses:**")
+        for tx in top:
+            note = f" ({tx['note']})" if tx.get("note") else ""
+            lines.append(f"- {tx['date'] or ''} {tx['category']}: {tx['amount']:,.2f}{note}")
+    return "\n".join(lines)
+
+
+async def fallback_summarizer(digest: Dict[str, Any]) -> str:
+    return _fallback_summary(digest)
+
+
+_SYSTEM_INSTRUCTIONS = (
+    "You are a personal finance analyst.\n"
+    "You will receive a JSON digest of one user's transactions for a date window that has already been applied: "
+    "totals, counts, top categories and the largest expenses.\n"
+    "Produce a concise Markdown summary:\n"
+    "- Totals: income, expenses, net (state the window)\n"
+    "- 3–5 bullet insights (top categories, large single expenses, balance of income vs spending)\n"
+    "- A short takeaway\n"
+    "Keep under 180 words. Use only numbers from the digest—do not invent any."
+)
+
+
+def _make_openai_summarizer() -> Optional[Summarizer]:
+    key = os.getenv("OPENAI_API_KEY")
+    if not key:
+        log.debug("OPENAI_API_KEY is not set; using fallback summary")
+        return None
+    try:
+        from openai import OpenAI  # optional dependency
+        client = OpenAI(api_key=key)
+    except Exception as e:
+        log.debug("OpenAI client init failed: %r", e)
+        return None
+
+    async def summarize(digest: Dict[str, Any]) -> str:
+        resp = await asyncio.wait_for(asyncio.to_thread(
+            client.responses.create, model=DEFAULT_MODEL, instructions=_SYSTEM_INSTRUCTIONS,
+            input=[{"role": "user", "content": json.dumps(digest)}],
+        ), timeout=SUMMARY_TIMEOUT)
+        return (getattr(resp, "output_text", "") or "").strip()
+
+    return summarize
+
+
+# name -> factory returning a summarizer, or None if it cannot be used here
+SUMMARIZERS: Dict[str, Callable[[], Optional[Summarizer]]] = {
+    "fallback": lambda: fallback_summarizer,
+    "openai": _make_openai_summarizer,
+}
+_summarizer: Optional[Tuple[str, Summarizer]] = None
+
+
+def get_summarizer() -> Tuple[str, Summarizer]:
+    """The configured (name, summarizer); the fallback if SUMMARY_BACKEND cannot be used."""
+    global _summarizer
+    if _summarizer is None:
+        factory = SUMMARIZERS.get(SUMMARY_BACKEND)
+        fn = factory() if factory else None
+        _summarizer = (SUMMARY_BACKEND, fn) if fn else ("fallback", fallback_summarizer)
+    return _summarizer
+
+
+def set_summarizer(name: str, fn: Summarizer):
+    """Plug in a summarizer (any async callable digest -> markdown) and drop cached summaries."""
+    global _summarizer
+    _summarizer = (name, fn)
+    _summary_cache.clear()
+
+
+# -----------------------------
+# Entry point + cache
+# -----------------------------
+
+_summary_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+
+async def summarize_window(user_id: ObjectId, prompt: str, tx_type: Optional[str] = None,
+                           now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Resolve the prompt's window, build the digest and summarize it.
+    Returns {summary_text, metrics, window, source, cached}.
+    """
+    start, end, label = resolve_window(prompt, now)
+    name, summarizer = get_summarizer()
+    key = (str(user_id), start, end, tx_type, name)
+    version = crud.data_version(user_id)
+    hit = _summary_cache.get(key)
+    if hit and hit[0] == version and time.monotonic() - hit[1] < SUMMARY_CACHE_TTL:
+        _summary_cache.move_to_end(key)
+        return {**hit[2], "cached": True}
+
+    digest = await build_digest(user_id, start, end, label, tx_type)
+    source = name
+    try:
+        text = await summarizer(digest)
+    except Exception as e:
+        log.debug("Summarizer %r failed: %r; using fallback summary", name, e)
+        text = ""
+    if not text:
+        text, source = _fallback_summary(digest), "fallback"
+    result = {"summary_text": text, "metrics": digest, "window": digest["window"], "source": source}
+    if source == name:  # a model failure is not cached, so the next view retries
+        _summary_cache[key] = (version, time.monotonic(), result)
+        _summary_cache.move_to_end(key)
+        while len(_summary_cache) > SUMMARY_CACHE_SIZE:
+            _summary_cache.popitem(last=False)
+    return {**result, "cached": False}
@@ -1,20 +1,39 @@
 # backend/app/crud.py
-from typing import Optional, List, Dict, Any
-from datetime import datetime
+from typing import Optional, List, Dict, Any, Tuple
+from collections import OrderedDict
+from datetime import datetime, timezone
+import base64, hashlib, json, time
 from bson import ObjectId
-import motor.motor_asyncio
+from pymongo import ReturnDocument, InsertOne, UpdateOne, DeleteOne, DeleteMany
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 import os
 
-# --- Configuration ---
-MONGO_URI = os.environ.get('MONGO_URI', 'mongodb://localhost:27017')
-DB_NAME = os.environ.get('MONGO_DB', 'pfa_db')
-
-client = motor.motor_asyncio.AsyncIOMotorClient(MONGO_URI)
-db = client[DB_NAME]
+from .db import get_db
 
 USERS_COL = 'users'
 TRAN_COL = 'transactions'
 CAT_COL = 'categories'
+ROLLUP_COL = 'tx_rollups'
+
+BULK_CHUNK_SIZE = int(os.environ.get('BULK_CHUNK_SIZE', '1000'))
+CATEGORY_CACHE_TTL = float(os.environ.get('CATEGORY_CACHE_TTL', '60'))
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '2000'))
+COUNT_CACHE_TTL = float(os.environ.get('COUNT_CACHE_TTL', '30'))
+COUNT_CACHE_SIZE = 1024
+
+# per-user write counter; bumped on every transaction write so derived results
+# (cached counts etc.) can tell when they are stale
+_data_versions: Dict[str, int] = {}
+_count_cache: 'OrderedDict[tuple, tuple]' = OrderedDict()
+
+
+def data_version(user_id: ObjectId) -> int:
+    return _data_versions.get(str(user_id), 0)
+
+
+def bump_data_version(user_id: ObjectId):
+    key = str(user_id)
+    _data_versions[key] = _data_versions.get(key, 0) + 1
 
 # -----------------------
 # User helpers
@@ -22,28 +41,32 @@ CAT_COL = 'categories'
 async def create_user(user_doc: Dict[str, Any]) -> Dict[str, Any]:
     """
     Insert user_doc (must include 'email' and 'password' hashed) and return the inserted document.
+    If the email is already registered (unique index), the existing user is returned instead.
     """
-    # ensure email uniqueness
-    existing = await db[USERS_COL].find_one({'email': user_doc.get('email')})
-    if existing:
-        # return existing to caller (or raise in route)
-        return existing
-    res = await db[USERS_COL].insert_one(user_doc)
-    created = await db[USERS_COL].find_one({'_id': res.inserted_id})
+    created = dict(user_doc)
+    try:
+        res = await get_db()[USERS_COL].insert_one(created)
+    except DuplicateKeyError:
+        return await get_db()[USERS_COL].find_one({'email': user_doc.get('email')})
+    created['_id'] = res.inserted_id
     return created
 
 
 async def get_user_by_email(email: str) -> Optional[Dict[str, Any]]:
     if not email:
         return None
-    doc = await db[USERS_COL].find_one({'email': email})
+    doc = await get_db()[USERS_COL].find_one({'email': email})
     return doc
 
 
+async def update_user_password(user_id: ObjectId, hashed: str) -> None:
+    await get_db()[USERS_COL].update_one({'_id': ObjectId(user_id)}, {'$set': {'password': hashed}})
+
+
 async def get_user_by_id(user_id: ObjectId) -> Optional[Dict[str, Any]]:
     if not user_id:
         return None
-    return await db[USERS_COL].find_one({'_id': ObjectId(user_id)})
+    return await get_db()[USERS_COL].find_one({'_id': ObjectId(user_id)})
 
 
 # -----------------------
@@ -59,83 +82,308 @@ async def create_category(cat_doc: Dict[str, Any]) -> Dict[str, Any]:
     if not name or not typ:
         raise ValueError('Category must have name and type')
 
-    existing = await db[CAT_COL].find_one({'name': name, 'type': typ})
-    if existing:
-        return existing
-
-    insert_doc = {
-        'name': name,
-        'type': typ,
-        'icon': cat_doc.get('icon', ''),
-        'created_at': datetime.utcnow()
-    }
-    res = await db[CAT_COL].insert_one(insert_doc)
-    created = await db[CAT_COL].find_one({'_id': res.inserted_id})
+    # one upsert round-trip: inserts when missing, returns the stored doc either way
+    created = await get_db()[CAT_COL].find_one_and_update(
+        {'name': name, 'type': typ},
+        {'$setOnInsert': {'icon': cat_doc.get('icon', ''), 'created_at': datetime.utcnow()}},
+        upsert=True, return_document=ReturnDocument.AFTER)
+    invalidate_category_catalog()
     return created
 
 
-async def list_categories() -> List[Dict[str, Any]]:
-    cursor = db[CAT_COL].find({})
+async def seed_categories(defaults: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Idempotently ensure every (name, type) in defaults exists, using one bulk_write
+    of upserts. Returns [{name, type, id}] for all of them.
+    """
+    now = datetime.utcnow()
+    ops = [UpdateOne({'name': c['name'], 'type': c['type']},
+                     {'$setOnInsert': {'icon': c.get('icon', ''), 'created_at': now}}, upsert=True)
+           for c in defaults]
+    if ops:
+        await get_db()[CAT_COL].bulk_write(ops, ordered=False)
+    invalidate_category_catalog()
+    items, _ = await get_category_catalog()
+    ids = {(c['name'], c['type']): c['id'] for c in items}
+    return [{'name': c['name'], 'type': c['type'], 'id': ids.get((c['name'], c['type']), '')} for c in defaults]
+
+
+# categories are global and rarely written: keep the whole list in memory with an ETag.
+# Writes through this process invalidate it; the TTL bounds staleness from other workers.
+_category_catalog: Optional[Tuple[List[Dict[str, Any]], str, float]] = None
+
+
+def invalidate_category_catalog():
+    global _category_catalog
+    _category_catalog = None
+
+
+async def get_category_catalog() -> Tuple[List[Dict[str, Any]], str]:
+    """Return (categories, etag), loading from the database only when the cache is empty or expired."""
+    global _category_catalog
+    if _category_catalog and time.monotonic() - _category_catalog[2] < CATEGORY_CACHE_TTL:
+        return _category_catalog[0], _category_catalog[1]
     out = []
-    async for d in cursor:
+    async for d in get_db()[CAT_COL].find({}).sort([('type', 1), ('name', 1)]):
         d['id'] = str(d['_id'])
         d.pop('_id', None)
         out.append(d)
-    return out
+    etag = hashlib.sha1(json.dumps(out, default=str, sort_keys=True).encode()).hexdigest()
+    _category_catalog = (out, etag, time.monotonic())
+    return out, etag
+
+
+async def list_categories() -> List[Dict[str, Any]]:
+    items, _ = await get_category_catalog()
+    return items
+
+
+# -----------------------
+# Rollups: per (user, day, type, category) totals kept in step with transaction writes
+# -----------------------
+def utc_naive(dt: datetime) -> datetime:
+    """dt as naive UTC, the form Mongo stores and returns; naive values are taken as UTC already."""
+    return dt.astimezone(timezone.utc).replace(tzinfo=None) if dt.tzinfo is not None else dt
+
+
+def _day(dt: datetime) -> datetime:
+    """UTC calendar day of dt, as rebuild_rollups computes it from the stored (UTC) value."""
+    dt = utc_naive(dt)
+    return datetime(dt.year, dt.month, dt.day)
+
+
+def _add_rollup_delta(deltas: Dict[tuple, List[float]], doc: Dict[str, Any], sign: int):
+    """Accumulate doc's contribution (sign=+1 added, -1 removed) into deltas."""
+    if not doc or not isinstance(doc.get('date'), datetime):
+        return
+    key = (_day(doc['date']), doc.get('type'), doc.get('category'))
+    acc = deltas.setdefault(key, [0.0, 0])
+    acc[0] += sign * float(doc.get('amount') or 0)
+    acc[1] += sign
+
+
+async def _apply_rollup_deltas(user_id: ObjectId, deltas: Dict[tuple, List[float]]):
+    """Write accumulated deltas in one bulk_write; buckets that drop to zero rows are removed."""
+    ops = []
+    shrinking = False
+    for (day, typ, cat), (total, count) in deltas.items():
+        if not count and not total:
+            continue
+        shrinking = shrinking or count < 0
+        ops.append(UpdateOne({'user_id': user_id, 'type': typ, 'day': day, 'category': cat},
+                             {'$inc': {'total': total, 'count': count}}, upsert=True))
+    if not ops:
+        return
+    if shrinking:
+        ops.append(DeleteMany({'user_id': user_id, 'count': {'$lte': 0}}))
+    await get_db()[ROLLUP_COL].bulk_write(ops, ordered=True)
+
+
+async def rebuild_rollups(user_id: Optional[ObjectId] = None):
+    """
+    Recompute rollups from the transactions collection, for one user or everyone.
+    Used for backfill and repair; writes made while it runs may need another rebuild.
+    """
+    match = {'user_id': ObjectId(user_id)} if user_id else {}
+    await get_db()[ROLLUP_COL].delete_many(match)
+    pipeline = [
+        {'$match': {**match, 'date': {'$type': 'date'}}},
+        {'$group': {
+            '_id': {
+                'user_id': '$user_id', 'type': '$type', 'category': '$category',
+                'day': {'$dateFromParts': {'year': {'$year': '$date'}, 'month': {'$month': '$date'},
+                                           'day': {'$dayOfMonth': '$date'}}},
+            },
+            'total': {'$sum': '$amount'}, 'count': {'$sum': 1},
+        }},
+        {'$project': {'_id': 0, 'user_id': '$_id.user_id', 'type': '$_id.type', 'category': '$_id.category',
+                      'day': '$_id.day', 'total': 1, 'count': 1}},
+        {'$merge': {'into': ROLLUP_COL, 'on': ['user_id', 'type', 'day', 'category'],
+                    'whenMatched': 'replace', 'whenNotMatched': 'insert'}},
+    ]
+    async for _ in get_db()[TRAN_COL].aggregate(pipeline):
+        pass
+
+
+async def ensure_rollups():
+    """
+    Backfill rollups on first start after upgrading: the dashboard endpoints read only
+    tx_rollups, so an empty rollup collection next to dated transactions is rebuilt.
+    """
+    db = get_db()
+    if await db[ROLLUP_COL].find_one({}, {'_id': 1}):
+        return
+    if await db[TRAN_COL].find_one({'date': {'$type': 'date'}}, {'_id': 1}):
+        await rebuild_rollups()
 
 
 # -----------------------
 # Transaction helpers
 # -----------------------
+def _normalize_tx_doc(user_id: ObjectId, tx_doc: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+    """
+    Build the stored form of a transaction: user_id attached, date coerced to a
+    datetime (falls back to now), defaults for category/type and amount as float.
+    Raises ValueError if amount is not numeric.
+    """
+    insert_doc = tx_doc.copy()
+    insert_doc['user_id'] = user_id
+    # ensure date is a datetime (caller may pass datetime already)
+    date = insert_doc.get('date')
+    if isinstance(date, str) and date:
+        try:
+            insert_doc['date'] = datetime.fromisoformat(date)
+        except Exception:
+            insert_doc['date'] = now
+    elif not date:
+        insert_doc['date'] = now
+
+    insert_doc.setdefault('category', 'uncategorized')
+    insert_doc.setdefault('type', 'expense')
+    try:
+        insert_doc['amount'] = float(insert_doc.get('amount') or 0)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid amount: {insert_doc.get('amount')!r}")
+    insert_doc['created_at'] = now
+    return insert_doc
+
+
 async def create_transaction(user_id: ObjectId, tx_doc: Dict[str, Any]) -> Dict[str, Any]:
     """
     tx_doc expected keys: amount, date (datetime), type ('expense'|'income'), category, description/note
     Adds user_id and inserts into transactions collection.
     """
-    insert_doc = tx_doc.copy()
-    insert_doc['user_id'] = ObjectId(user_id)
-    # ensure date is a datetime (caller may pass datetime already)
-    if 'date' in insert_doc:
-        if isinstance(insert_doc['date'], str) and insert_doc['date']:
+    insert_doc = _normalize_tx_doc(ObjectId(user_id), tx_doc, datetime.utcnow())
+    res = await get_db()[TRAN_COL].insert_one(insert_doc)
+    bump_data_version(user_id)
+    deltas: Dict[tuple, List[float]] = {}
+    _add_rollup_delta(deltas, insert_doc, 1)
+    await _apply_rollup_deltas(insert_doc['user_id'], deltas)
+    # the stored document is exactly insert_doc; no need to read it back
+    return _tx_out({**insert_doc, '_id': res.inserted_id})
+
+
+async def _account_landed(chunk: List[tuple], inserted: List[Dict[str, Any]], deltas: Dict[tuple, List[float]]):
+    """After a failed insert_many, add the chunk's rows that were written anyway to inserted / deltas."""
+    try:
+        cursor = get_db()[TRAN_COL].find({'_id': {'$in': [doc['_id'] for _, doc in chunk]}}, {'_id': 1})
+        landed = {d['_id'] async for d in cursor}
+    except Exception:
+        return  # still unreachable; scripts.rebuild_rollups repairs the rollups for these rows
+    for i, doc in chunk:
+        if doc['_id'] in landed:
+            inserted.append({'index': i, 'id': str(doc['_id']), 'amount': doc['amount']})
+            _add_rollup_delta(deltas, doc, 1)
+
+
+async def create_transactions_bulk(user_id: ObjectId, tx_docs: List[Dict[str, Any]],
+                                   chunk_size: int = BULK_CHUNK_SIZE) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Insert many transactions for one user. Rows are normalized in one pass and
+    written with unordered insert_many in chunks of chunk_size.
+    A bad row never aborts the batch; it is reported in 'errors' by its input index.
+    Any other write failure propagates; rows committed before it (earlier chunks,
+    and whatever of the failing chunk landed) stay, and the rollups and data
+    version reflect them.
+    Returns { inserted: [{index, id, amount}], errors: [{index, error}] }.
+    """
+    uid = ObjectId(user_id)
+    now = datetime.utcnow()
+    inserted: List[Dict[str, Any]] = []
+    errors: List[Dict[str, Any]] = []
+
+    pending: List[tuple] = []  # (input index, doc)
+    for i, d in enumerate(tx_docs):
+        try:
+            doc = _normalize_tx_doc(uid, d, now)
+        except ValueError as e:
+            errors.append({'index': i, 'error': str(e)})
+            continue
+        doc['_id'] = ObjectId()
+        pending.append((i, doc))
+
+    deltas: Dict[tuple, List[float]] = {}
+    try:
+        for start in range(0, len(pending), max(1, chunk_size)):
+            chunk = pending[start:start + chunk_size]
+            failed: Dict[int, str] = {}
             try:
-                insert_doc['date'] = datetime.fromisoformat(insert_doc['date'])
+                await get_db()[TRAN_COL].insert_many([doc for _, doc in chunk], ordered=False)
+            except BulkWriteError as e:
+                for we in e.details.get('writeErrors', []):
+                    failed[we['index']] = we.get('errmsg', 'write failed')
             except Exception:
-                insert_doc['date'] = datetime.utcnow()
-        elif not insert_doc['date']:
-            insert_doc['date'] = datetime.utcnow()
-    else:
-        insert_doc['date'] = datetime.utcnow()
-
-    insert_doc.setdefault('category', insert_doc.get('category', 'uncategorized'))
-    insert_doc.setdefault('type', insert_doc.get('type', 'expense'))
-    insert_doc.setdefault('amount', float(insert_doc.get('amount', 0) or 0))
-    insert_doc['created_at'] = datetime.utcnow()
-    res = await db[TRAN_COL].insert_one(insert_doc)
-    saved = await db[TRAN_COL].find_one({'_id': res.inserted_id})
-    # normalize id and remove user_id for client
-    saved['id'] = str(saved['_id'])
-    saved.pop('_id', None)
-    saved.pop('user_id', None)
-    return saved
-
-
-async def get_transactions(user_id: ObjectId, start: Optional[datetime] = None, end: Optional[datetime] = None,
-                           skip: int = 0, limit: int = 10, tx_type: Optional[str] = None) -> List[Dict[str, Any]]:
+                # network error / timeout: part of the chunk may have landed; count what did, then give up
+                await _account_landed(chunk, inserted, deltas)
+                raise
+            for pos, (i, doc) in enumerate(chunk):
+                if pos in failed:
+                    errors.append({'index': i, 'error': failed[pos]})
+                else:
+                    inserted.append({'index': i, 'id': str(doc['_id']), 'amount': doc['amount']})
+                    _add_rollup_delta(deltas, doc, 1)
+    finally:
+        # rows committed by earlier chunks stay committed even if a later chunk fails
+        if inserted:
+            bump_data_version(uid)
+            await _apply_rollup_deltas(uid, deltas)
+    errors.sort(key=lambda e: e['index'])
+    return {'inserted': inserted, 'errors': errors}
+
+
+def tx_query(user_id: ObjectId, start: Optional[datetime] = None, end: Optional[datetime] = None,
+             tx_type: Optional[str] = None) -> Dict[str, Any]:
     """
-    Return list of transactions for user, optionally filtered by date range and tx_type.
-    Sorted by date DESC (newest first) unless required otherwise.
+    Filter shared by the listing, count and aggregation queries. Field order
+    (user_id, type, date) matches the compound indexes in TX_INDEXES. Bounds are
+    kept as naive UTC so they compare with stored dates and decoded cursors.
     """
-    query = {'user_id': ObjectId(user_id)}
+    query: Dict[str, Any] = {'user_id': ObjectId(user_id)}
+    if tx_type:
+        query['type'] = tx_type
     if start or end:
         query['date'] = {}
         if start:
-            query['date']['$gte'] = start
+            query['date']['$gte'] = utc_naive(start)
         if end:
-            query['date']['$lte'] = end
-    if tx_type:
-        query['type'] = tx_type
+            query['date']['$lte'] = utc_naive(end)
+    return query
+
+
+def encode_cursor(date: datetime, tx_id: str) -> str:
+    """Opaque continuation token for keyset pagination: the (date, _id) of the last row served."""
+    raw = json.dumps({'d': date.isoformat(), 'i': str(tx_id)}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token: str) -> Tuple[datetime, ObjectId]:
+    """Inverse of encode_cursor. Raises ValueError on a malformed token."""
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        return datetime.fromisoformat(raw['d']), ObjectId(raw['i'])
+    except Exception:
+        raise ValueError('Invalid cursor')
+
 
-    cursor = db[TRAN_COL].find(query).sort('date', -1).skip(max(0, skip)).limit(max(0, limit))
+async def get_transactions(user_id: ObjectId, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                           skip: int = 0, limit: int = 10, tx_type: Optional[str] = None,
+                           after: Optional[Tuple[datetime, ObjectId]] = None) -> List[Dict[str, Any]]:
+    """
+    Return list of transactions for user, optionally filtered by date range and tx_type.
+    Sorted by date DESC, then _id DESC (newest first) unless required otherwise.
+    `after` is a decoded cursor (date, _id): when given, rows strictly after it in sort
+    order are returned by seeking on the compound index instead of skipping.
+    """
+    query = tx_query(user_id, start, end, tx_type)
+    if after:
+        after_date, after_id = utc_naive(after[0]), after[1]
+        date_q = query.setdefault('date', {})
+        if '$lte' not in date_q or date_q['$lte'] > after_date:
+            date_q['$lte'] = after_date
+        # rows sharing the cursor's date are ordered by _id; drop those at or before the cursor
+        query['$nor'] = [{'date': after_date, '_id': {'$gte': after_id}}]
+        skip = 0
+    cursor = get_db()[TRAN_COL].find(query).sort([('date', -1), ('_id', -1)]).skip(max(0, skip)).limit(max(0, limit))
     out = []
     async for d in cursor:
         d['id'] = str(d['_id'])
@@ -145,86 +393,270 @@ async def get_transactions(user_id: ObjectId, start: Optional[datetime] = None,
     return out
 
 
+async def iter_transactions(user_id: ObjectId, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                            tx_type: Optional[str] = None, batch_size: int = EXPORT_BATCH_SIZE):
+    """
+    Async generator over every matching transaction (newest first), fetched from the
+    server in batches so memory stays flat regardless of history size.
+    """
+    query = tx_query(user_id, start, end, tx_type)
+    cursor = get_db()[TRAN_COL].find(query, {'user_id': 0}).sort([('date', -1), ('_id', -1)]).batch_size(batch_size)
+    async for d in cursor:
+        d['id'] = str(d.pop('_id'))
+        yield d
+
+
 async def count_transactions(user_id: ObjectId, start: Optional[datetime] = None, end: Optional[datetime] = None,
                              tx_type: Optional[str] = None) -> int:
-    query = {'user_id': ObjectId(user_id)}
-    if start or end:
-        query['date'] = {}
-        if start:
-            query['date']['$gte'] = start
-        if end:
-            query['date']['$lte'] = end
-    if tx_type:
-        query['type'] = tx_type
-    return await db[TRAN_COL].count_documents(query)
+    """
+    Count matching transactions. Results are cached per filter until the user's
+    next write (or COUNT_CACHE_TTL seconds, for writes made by other workers).
+    """
+    key = (str(user_id), start, end, tx_type)
+    version = data_version(user_id)
+    hit = _count_cache.get(key)
+    if hit and hit[0] == version and time.monotonic() - hit[2] < COUNT_CACHE_TTL:
+        _count_cache.move_to_end(key)
+        return hit[1]
+    query = tx_query(user_id, start, end, tx_type)
+    total = await get_db()[TRAN_COL].count_documents(query)
+    _count_cache[key] = (version, total, time.monotonic())
+    _count_cache.move_to_end(key)
+    while len(_count_cache) > COUNT_CACHE_SIZE:
+        _count_cache.popitem(last=False)
+    return total
+
+
+def _tx_out(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Client form of a stored transaction: string id, no user_id."""
+    out = {k: v for k, v in doc.items() if k not in ('_id', 'user_id')}
+    out['id'] = str(doc['_id'])
+    return out
 
 
-async def update_transaction(user_id: ObjectId, tx_id: str, update_fields: Dict[str, Any]) -> Dict[str, Any]:
+UPDATABLE_TX_FIELDS = ('amount', 'date', 'category', 'note', 'type')
+# fields that may be cleared with an explicit null; the rest keep their value
+NULLABLE_TX_FIELDS = ('category', 'note')
+TX_UPDATE_PROJECTION = {'user_id': 0}
+
+
+def _normalize_update_fields(update_fields: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Update transaction with tx_id owned by user_id. Returns updated document or raises.
-    update_fields keys: amount, date (iso), category, description, type
+    Keep the updatable keys that were actually supplied, coercing a string date
+    and a numeric amount. Raises ValueError on an invalid date or amount.
     """
-    print(update_fields)
-    if 'date' in update_fields and isinstance(update_fields['date'], str):
-        try:
-            update_fields['date'] = datetime.fromisoformat(update_fields['date'])
-        except:
-            update_fields['date'] = None
-    # convert numeric amount
-    if 'amount' in update_fields:
-        try:
-            update_fields['amount'] = float(update_fields['amount'])
-        except:
-            update_fields['amount'] = 0.0
+    fields = {}
+    for key in UPDATABLE_TX_FIELDS:
+        if key not in update_fields:
+            continue
+        value = update_fields[key]
+        if value is None and key not in NULLABLE_TX_FIELDS:
+            continue
+        if key == 'date' and isinstance(value, str):
+            try:
+                value = datetime.fromisoformat(value)
+            except ValueError:
+                raise ValueError(f'Invalid date: {value!r}')
+        elif key == 'amount':
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                raise ValueError(f'Invalid amount: {value!r}')
+        fields[key] = value
+    return fields
 
-    res = await db[TRAN_COL].update_one({'_id': ObjectId(tx_id), 'user_id': ObjectId(user_id)}, {'$set': update_fields})
-    if res.matched_count == 0:
+
+async def update_transaction(user_id: ObjectId, tx_id: str, update_fields: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Partially update transaction tx_id owned by user_id and return the updated document.
+    Only the keys present in update_fields (amount, date, category, note, type) change.
+    Raises ValueError if the transaction is not found or a field is invalid.
+    """
+    fields = _normalize_update_fields(update_fields)
+    query = {'_id': ObjectId(tx_id), 'user_id': ObjectId(user_id)}
+    col = get_db()[TRAN_COL]
+    if not fields:
+        current = await col.find_one(query, projection=TX_UPDATE_PROJECTION)
+        if current is None:
+            raise ValueError('Transaction not found or not owned by user')
+        return _tx_out(current)
+
+    # BEFORE rather than AFTER: the rollups need the old values, and the new
+    # document is just the old one with `fields` applied
+    before = await col.find_one_and_update(query, {'$set': fields}, projection=TX_UPDATE_PROJECTION,
+                                           return_document=ReturnDocument.BEFORE)
+    if before is None:
         raise ValueError('Transaction not found or not owned by user')
+    bump_data_version(user_id)
+    updated = {**before, **fields}
+    deltas: Dict[tuple, List[float]] = {}
+    _add_rollup_delta(deltas, before, -1)
+    _add_rollup_delta(deltas, updated, 1)
+    await _apply_rollup_deltas(ObjectId(user_id), deltas)
+    return _tx_out(updated)
 
-    updated = await db[TRAN_COL].find_one({'_id': ObjectId(tx_id)})
-    if not updated:
-        raise ValueError('Failed to fetch updated transaction')
-    updated['date'] = update_fields['date']
-    updated['amount'] = update_fields['amount']
-    updated['category'] = update_fields['category']
-    updated['note'] = update_fields['note']
-    updated['type'] = update_fields['type']
 
-    updated['id'] = str(updated['_id'])
-    updated.pop('_id', None)
-    updated.pop('user_id', None)
-    return updated
+async def delete_transaction(user_id: ObjectId, tx_id: str) -> bool:
+    deleted = await get_db()[TRAN_COL].find_one_and_delete({'_id': ObjectId(tx_id), 'user_id': ObjectId(user_id)})
+    if deleted is None:
+        return False
+    bump_data_version(user_id)
+    deltas: Dict[tuple, List[float]] = {}
+    _add_rollup_delta(deltas, deleted, -1)
+    await _apply_rollup_deltas(ObjectId(user_id), deltas)
+    return True
 
 
-async def delete_transaction(user_id: ObjectId, tx_id: str) -> bool:
-    res = await db[TRAN_COL].delete_one({'_id': ObjectId(tx_id), 'user_id': ObjectId(user_id)})
-    return res.deleted_count > 0
+async def apply_transaction_batch(user_id: ObjectId, ops: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Run many creates / updates / deletes for one user as a single unordered bulk_write.
+    ops items: {'index', 'op': create|update|delete, 'id' (update/delete), 'data' (create/update)};
+    data is already schema-validated. Returns one {index, op, status, id?, error?} per op,
+    status being 'ok', 'not_found' (also for an update whose document was deleted
+    concurrently; it gets no rollup delta) or 'error'. Every write is filtered on user_id, and an
+    id may appear only once per batch so before-images stay unambiguous.
+    """
+    uid = ObjectId(user_id)
+    now = datetime.utcnow()
+    results: Dict[int, Dict[str, Any]] = {}
+
+    def fail(item, status, error=None):
+        res = {'index': item['index'], 'op': item['op'], 'status': status}
+        if item.get('id'):
+            res['id'] = item['id']
+        if error:
+            res['error'] = error
+        results[item['index']] = res
+
+    # updates and deletes need the current documents for the rollup deltas: one $in read
+    seen = set()
+    targets = []
+    for item in ops:
+        if item['op'] == 'create':
+            continue
+        if not ObjectId.is_valid(item.get('id') or ''):
+            fail(item, 'error', 'Invalid id')
+        elif item['id'] in seen:
+            fail(item, 'error', 'Duplicate id in batch')
+        else:
+            seen.add(item['id'])
+            targets.append(item)
+    before_docs = {}
+    if targets:
+        cursor = get_db()[TRAN_COL].find({'_id': {'$in': [ObjectId(t['id']) for t in targets]}, 'user_id': uid})
+        async for d in cursor:
+            before_docs[str(d['_id'])] = d
+
+    writes = []   # pymongo write models, in bulk order
+    planned = []  # (item, before, after) parallel to writes
+    for item in ops:
+        if item['index'] in results:
+            continue
+        try:
+            if item['op'] == 'create':
+                doc = _normalize_tx_doc(uid, item['data'], now)
+                doc['_id'] = ObjectId()
+                item['id'] = str(doc['_id'])
+                writes.append(InsertOne(doc))
+                planned.append((item, None, doc))
+                continue
+            before = before_docs.get(item['id'])
+            if before is None:
+                fail(item, 'not_found')
+            elif item['op'] == 'update':
+                fields = _normalize_update_fields(item.get('data') or {})
+                if not fields:
+                    results[item['index']] = {'index': item['index'], 'op': 'update', 'status': 'ok', 'id': item['id']}
+                    continue
+                writes.append(UpdateOne({'_id': before['_id'], 'user_id': uid}, {'$set': fields}))
+                planned.append((item, before, {**before, **fields}))
+            else:
+                writes.append(DeleteOne({'_id': before['_id'], 'user_id': uid}))
+                planned.append((item, before, None))
+        except ValueError as e:
+            fail(item, 'error', str(e))
+
+    failed: Dict[int, str] = {}
+    matched = 0
+    if writes:
+        try:
+            matched = (await get_db()[TRAN_COL].bulk_write(writes, ordered=False)).matched_count
+        except BulkWriteError as e:
+            matched = e.details.get('nMatched', 0)
+            for we in e.details.get('writeErrors', []):
+                failed[we['index']] = we.get('errmsg', 'write failed')
+
+    # an update can miss a document deleted since the before-image read; the bulk result
+    # only counts matches, so on a shortfall the documents that are gone are the misses
+    missed = set()
+    updates = [pos for pos, (item, _, _) in enumerate(planned) if item['op'] == 'update' and pos not in failed]
+    if matched < len(updates):
+        ids = [planned[pos][1]['_id'] for pos in updates]
+        still = {d['_id'] async for d in get_db()[TRAN_COL].find({'_id': {'$in': ids}, 'user_id': uid}, {'_id': 1})}
+        missed = {pos for pos in updates if planned[pos][1]['_id'] not in still}
+
+    deltas: Dict[tuple, List[float]] = {}
+    for pos, (item, before, after) in enumerate(planned):
+        if pos in failed:
+            fail(item, 'error', failed[pos])
+            continue
+        if pos in missed:
+            fail(item, 'not_found')
+            continue
+        _add_rollup_delta(deltas, before, -1)
+        _add_rollup_delta(deltas, after, 1)
+        results[item['index']] = {'index': item['index'], 'op': item['op'], 'status': 'ok', 'id': item['id']}
+    if len(failed) + len(missed) < len(planned):
+        bump_data_version(uid)
+        await _apply_rollup_deltas(uid, deltas)
+    return [results[i] for i in sorted(results)]
 
 
 # -----------------------
 # Aggregations For analysis
 # -----------------------
-async def aggregate_by_category(user_id: ObjectId, start: Optional[datetime] = None, end: Optional[datetime] = None,
-                                tx_type: Optional[str] = None) -> List[Dict[str, Any]]:
+def rollup_query(user_id: ObjectId, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                 tx_type: Optional[str] = None) -> Dict[str, Any]:
     """
-    Returns a list of { category, total } for the user and optional filters.
+    Filter on the rollup collection. Rollups are per day, so start/end select
+    whole days: every day from start's day through end's day inclusive.
     """
-    match = {'user_id': ObjectId(user_id)}
+    query: Dict[str, Any] = {'user_id': ObjectId(user_id)}
+    if tx_type:
+        query['type'] = tx_type
     if start or end:
-        match['date'] = {}
+        query['day'] = {}
         if start:
-            match['date']['$gte'] = start
+            query['day']['$gte'] = _day(start)
         if end:
-            match['date']['$lte'] = end
-    if tx_type:
-        match['type'] = tx_type
+            query['day']['$lte'] = _day(end)
+    return query
 
-    pipeline = [
+
+def category_pipeline(match: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [
         {'$match': match},
-        {'$group': {'_id': '$category', 'total': {'$sum': '$amount'}}},
+        {'$group': {'_id': '$category', 'total': {'$sum': '$total'}}},
         {'$sort': {'total': -1}}
     ]
-    cursor = db[TRAN_COL].aggregate(pipeline)
+
+
+def date_pipeline(match: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [
+        {'$match': match},
+        {'$group': {'_id': '$day', 'total': {'$sum': '$total'}}},
+        {'$sort': {'_id': 1}}
+    ]
+
+
+async def aggregate_by_category(user_id: ObjectId, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                                tx_type: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Returns a list of { category, total } for the user and optional filters.
+    Answered from the daily rollups, so cost depends on days in range, not transactions.
+    """
+    pipeline = category_pipeline(rollup_query(user_id, start, end, tx_type))
+    cursor = get_db()[ROLLUP_COL].aggregate(pipeline)
     out = []
     async for d in cursor:
         out.append({'category': d['_id'] or 'unknown', 'total': d.get('total', 0)})
@@ -235,45 +667,95 @@ async def aggregate_by_date(user_id: ObjectId, start: Optional[datetime] = None,
                             tx_type: Optional[str] = None) -> List[Dict[str, Any]]:
     """
     Returns a list of { date, total } (date as YYYY-MM-DD) for the user and optional filters.
+    Answered from the daily rollups.
     """
-    match = {'user_id': ObjectId(user_id)}
-    if start or end:
-        match['date'] = {}
-        if start:
-            match['date']['$gte'] = start
-        if end:
-            match['date']['$lte'] = end
-    if tx_type:
-        match['type'] = tx_type
-
-    pipeline = [
-        {'$match': match},
-        {'$project': {'amount': 1, 'date': 1, 'day': {'$dateToString': {'format': '%Y-%m-%d', 'date': '$date'}}}},
-        {'$group': {'_id': '$day', 'total': {'$sum': '$amount'}}},
-        {'$sort': {'_id': 1}}
-    ]
-    cursor = db[TRAN_COL].aggregate(pipeline)
+    pipeline = date_pipeline(rollup_query(user_id, start, end, tx_type))
+    cursor = get_db()[ROLLUP_COL].aggregate(pipeline)
     out = []
     async for d in cursor:
-        out.append({'date': d['_id'], 'total': d.get('total', 0)})
+        out.append({'date': d['_id'].strftime('%Y-%m-%d'), 'total': d.get('total', 0)})
     return out
 
 
+def dashboard_pipeline(user_id: ObjectId, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                       tx_type: Optional[str] = None) -> List[Dict[str, Any]]:
+    type_match = {'type': tx_type} if tx_type else {}
+    return [
+        {'$match': rollup_query(user_id, start, end)},
+        {'$facet': {
+            'by_category': category_pipeline(type_match),
+            'by_date': date_pipeline(type_match),
+            'totals': [{'$group': {'_id': '$type', 'total': {'$sum': '$total'}, 'count': {'$sum': '$count'}}}],
+        }},
+    ]
+
+
+async def dashboard_summary(user_id: ObjectId, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                            tx_type: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Everything the dashboard shows in one aggregation over the rollups:
+    category totals and daily series for tx_type (all types if None), plus
+    income / expense / net totals for the same date range.
+    """
+    pipeline = dashboard_pipeline(user_id, start, end, tx_type)
+    res = await get_db()[ROLLUP_COL].aggregate(pipeline).to_list(length=1)
+    facets = res[0] if res else {}
+    by_type = {d['_id']: d for d in facets.get('totals', [])}
+    income = by_type.get('income', {}).get('total', 0)
+    expense = by_type.get('expense', {}).get('total', 0)
+    return {
+        'by_category': [{'category': d['_id'] or 'unknown', 'total': d.get('total', 0)} for d in facets.get('by_category', [])],
+        'by_date': [{'date': d['_id'].strftime('%Y-%m-%d'), 'total': d.get('total', 0)} for d in facets.get('by_date', [])],
+        'totals': {
+            'income': income,
+            'expense': expense,
+            'net': income - expense,
+            'count': sum(d.get('count', 0) for d in by_type.values()),
+            'income_count': by_type.get('income', {}).get('count', 0),
+            'expense_count': by_type.get('expense', {}).get('count', 0),
+        },
+    }
+
+
+TOP_SORT = [('amount', -1)]
+
+
+async def top_transactions(user_id: ObjectId, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                           tx_type: str = 'expense', limit: int = 5) -> List[Dict[str, Any]]:
+    """
+    The largest transactions of tx_type in the range: [{id, date, amount, category, note}],
+    biggest first. Walks the (user_id, type, amount, date) index in amount order and
+    stops after `limit` rows inside the range, so nothing is sorted in memory.
+    """
+    cursor = get_db()[TRAN_COL].find(tx_query(user_id, start, end, tx_type),
+                                     {'date': 1, 'amount': 1, 'category': 1, 'note': 1}).sort(TOP_SORT).limit(limit)
+    return [_tx_out(d) async for d in cursor]
+
+
 # -----------------------
 # Utility: ensure indexes
 # -----------------------
+# Every transaction query filters on user_id (+ type) and a date range and sorts by
+# (date desc, _id desc); the trailing _id also serves keyset pagination seeks.
+# top_transactions sorts by amount instead: equality, sort, then the date range.
+TX_INDEXES = [
+    [('user_id', 1), ('date', -1), ('_id', -1)],
+    [('user_id', 1), ('type', 1), ('date', -1), ('_id', -1)],
+    [('user_id', 1), ('type', 1), ('amount', -1), ('date', -1)],
+]
+# indexes created by earlier versions; superseded by TX_INDEXES
+LEGACY_TX_INDEXES = ['user_id_1', 'date_-1', 'type_1', 'user_id_1_date_-1', 'user_id_1_type_1_date_-1']
+
+
 async def ensure_indexes():
     # create useful indexes for performance
-    await db[TRAN_COL].create_index([('user_id', 1)])
-    await db[TRAN_COL].create_index([('date', -1)])
-    await db[TRAN_COL].create_index([('type', 1)])
-    await db[USERS_COL].create_index([('email', 1)], unique=True)
-    await db[CAT_COL].create_index([('name', 1), ('type', 1)], unique=True)
-
-
-# call ensure indexes at import time (fire-and-forget)
-import asyncio
-try:
-    asyncio.get_event_loop().create_task(ensure_indexes())
-except Exception:
-    pass
+    for keys in TX_INDEXES:
+        await get_db()[TRAN_COL].create_index(keys)
+    existing = await get_db()[TRAN_COL].index_information()
+    for name in LEGACY_TX_INDEXES:
+        if name in existing:
+            await get_db()[TRAN_COL].drop_index(name)
+    # also the $merge key used by rebuild_rollups
+    await get_db()[ROLLUP_COL].create_index([('user_id', 1), ('type', 1), ('day', 1), ('category', 1)], unique=True)
+    await get_db()[USERS_COL].create_index([('email', 1)], unique=True)
+    await get_db()[CAT_COL].create_index([('name', 1), ('type', 1)], unique=True)
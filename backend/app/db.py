@@ -1,16 +1,93 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
 import os
+from typing import Optional
 from dotenv import load_dotenv
+from .metrics import mongo_commands
 load_dotenv()
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
-DB_NAME = os.getenv("DB_NAME", "pfa_db")
-client: AsyncIOMotorClient | None = None
+# MONGO_DB is the name crud.py used to read; kept as a fallback
+DB_NAME = os.getenv("DB_NAME") or os.getenv("MONGO_DB") or "pfa_db"
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "30000"))
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "")  # e.g. "zstd,snappy,zlib"
+
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """Tracks open and checked-out connections so /health can report pool utilization."""
+
+    def __init__(self):
+        self.open = 0
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.checkout_failures = 0
+
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_cleared(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_ready(self, event): pass
+    def connection_check_out_started(self, event): pass
+
+    def connection_created(self, event):
+        self.open += 1
+
+    def connection_closed(self, event):
+        self.open -= 1
+
+    def connection_check_out_failed(self, event):
+        self.checkout_failures += 1
+
+    def connection_checked_out(self, event):
+        self.in_use += 1
+        self.peak_in_use = max(self.peak_in_use, self.in_use)
+
+    def connection_checked_in(self, event):
+        self.in_use -= 1
+
+
+pool_stats = PoolStats()
+client: Optional[AsyncIOMotorClient] = None
 
 def get_client():
+    """The process-wide Motor client (one connection pool). Created on first use."""
     global client
     if client is None:
-        client = AsyncIOMotorClient(MONGO_URI)
+        options = dict(
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+            serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+            event_listeners=[pool_stats, mongo_commands],
+        )
+        if MONGO_COMPRESSORS:
+            options['compressors'] = MONGO_COMPRESSORS
+        client = AsyncIOMotorClient(MONGO_URI, **options)
     return client
 
 def get_db():
     return get_client()[DB_NAME]
+
+async def connect():
+    """Create the client and make sure the server is reachable (raises if not)."""
+    await get_client().admin.command('ping')
+
+def close():
+    global client
+    if client is not None:
+        client.close()
+        client = None
+
+def pool_utilization() -> dict:
+    return {
+        'max_pool_size': MONGO_MAX_POOL_SIZE,
+        'open': pool_stats.open,
+        'in_use': pool_stats.in_use,
+        'peak_in_use': pool_stats.peak_in_use,
+        'utilization': round(pool_stats.in_use / MONGO_MAX_POOL_SIZE, 3) if MONGO_MAX_POOL_SIZE else None,
+        'checkout_failures': pool_stats.checkout_failures,
+    }
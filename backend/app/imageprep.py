@@ -0,0 +1,187 @@
+"""
+Image preparation before Tesseract.
+
+Phone photos of receipts arrive at 12+ megapixels, slightly rotated, on a
+table top; Tesseract's time grows with pixel count while its accuracy peaks
+when text lines are a few tens of pixels tall. prepare_for_ocr():
+
+  1. applies the EXIF orientation and converts to grayscale
+  2. on a small working copy: finds the paper (a closing fills the text in,
+     so it stands out from a darker table top), estimates skew from the row
+     profiles of the ink on it, and measures the typical text line height
+  3. downsamples the full image so lines are OCR_TEXT_HEIGHT pixels tall
+     (never upsamples; OCR_MAX_PIXELS caps it if no lines are found)
+  4. rotates it and crops to the inked part of the paper, with a small margin
+  5. binarizes with Otsu's threshold
+
+It is opt-in (OCR_PREPROCESS=1) and applies to photo uploads only; rasterized
+PDF pages are already clean and upright.
+
+tesseract_config(fast=True) restricts the page segmentation mode to one
+uniform block and the output to digits, separators and currency signs: enough
+for numeric amounts and dates, and it skips layout analysis for short
+receipts. Words (including "TOTAL" and month names) are not read in that mode.
+"""
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageOps
+
+# --- Configuration ---
+OCR_PREPROCESS = os.getenv('OCR_PREPROCESS', '0') == '1'  # opt-in until bench.bench_ocr shows no accuracy loss
+OCR_TEXT_HEIGHT = int(os.getenv('OCR_TEXT_HEIGHT', '32'))  # target text line height, pixels
+OCR_MAX_PIXELS = int(os.getenv('OCR_MAX_PIXELS', str(4_000_000)))
+OCR_MAX_SKEW = float(os.getenv('OCR_MAX_SKEW', '8'))  # degrees searched either way
+OCR_FAST_PSM = int(os.getenv('OCR_FAST_PSM', '6'))
+OCR_FAST_WHITELIST = os.getenv('OCR_FAST_WHITELIST', '0123456789.,:/-+$€£₹')
+
+WORK_SIDE = 800     # longest side of the working copy used for the estimates
+SKEW_SIDE = 500     # and of the (smaller) copy used for the skew search
+MIN_SKEW = 0.3      # smaller angles are left alone
+CROP_MARGIN = 0.02  # of the cropped side, kept around the ink
+PAPER_CLOSE = 7     # working-copy pixels of text gap the paper mask closes over
+
+
+def tesseract_config(fast: bool = False) -> str:
+    if not fast:
+        return ''
+    return f'--psm {OCR_FAST_PSM} -c tessedit_char_whitelist={OCR_FAST_WHITELIST}'
+
+
+def otsu_threshold(gray: np.ndarray) -> int:
+    """Otsu's global threshold for a uint8 image: maximizes the between-class variance."""
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    total = hist.sum()
+    if not total:
+        return 128
+    levels = np.arange(256)
+    weight_bg = np.cumsum(hist)
+    weight_fg = total - weight_bg
+    cum_mean = np.cumsum(hist * levels)
+    mean_bg = cum_mean / np.maximum(weight_bg, 1)
+    mean_fg = (cum_mean[-1] - cum_mean) / np.maximum(weight_fg, 1)
+    between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+    return int(np.argmax(between))
+
+
+def _resized(im: Image.Image, side: int) -> Tuple[Image.Image, float]:
+    scale = min(1.0, side / max(im.size))
+    if scale == 1.0:
+        return im, 1.0
+    return im.resize((max(1, round(im.width * scale)), max(1, round(im.height * scale))), Image.BILINEAR), scale
+
+
+def _profile_score(ink: Image.Image, angle: float) -> float:
+    rows = np.asarray(ink.rotate(angle, resample=Image.NEAREST, expand=False), dtype=np.float32).sum(axis=1)
+    return float(np.var(rows))
+
+
+def estimate_skew(ink: np.ndarray) -> float:
+    """Rotation (degrees, counter-clockwise) that makes text lines horizontal: sharpest row profile wins."""
+    small, _ = _resized(Image.fromarray(ink.astype(np.uint8) * 255, mode='L'), SKEW_SIDE)
+    best = max(np.arange(-OCR_MAX_SKEW, OCR_MAX_SKEW + 1e-6, 1.0), key=lambda a: _profile_score(small, a))
+    fine = np.arange(best - 0.8, best + 0.8 + 1e-6, 0.2)
+    return float(max(fine, key=lambda a: _profile_score(small, a)))
+
+
+def _runs(mask: np.ndarray):
+    """(start, stop) of each run of True in a 1-D mask."""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return list(zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)))
+
+
+def estimate_line_height(ink: np.ndarray) -> Optional[float]:
+    """Median height (pixels) of the horizontal bands that contain ink, or None if there are too few."""
+    rows = ink.mean(axis=1)
+    nonzero = rows[rows > 0]
+    if not len(nonzero):
+        return None
+    heights = [b - a for a, b in _runs(rows > max(0.005, 0.1 * float(np.median(nonzero)))) if b - a >= 2]
+    return float(np.median(heights)) if len(heights) >= 3 else None
+
+
+def _longest_run(mask: np.ndarray) -> Optional[Tuple[int, int]]:
+    runs = _runs(mask)
+    return max(runs, key=lambda r: r[1] - r[0]) if runs else None
+
+
+def _dilate(mask: np.ndarray, k: int) -> np.ndarray:
+    """Binary dilation with a (2k+1)-pixel square, as two separable passes of shifts."""
+    out = mask.copy()
+    for d in range(1, k + 1):
+        out[d:] |= mask[:-d]
+        out[:-d] |= mask[d:]
+    rows = out.copy()
+    for d in range(1, k + 1):
+        out[:, d:] |= rows[:, :-d]
+        out[:, :-d] |= rows[:, d:]
+    return out
+
+
+def paper_and_ink(gray: np.ndarray, threshold: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Masks of the paper (text filled in by a closing) and of the ink on it; the background is neither."""
+    bright = gray >= threshold
+    paper = ~_dilate(~_dilate(bright, PAPER_CLOSE), PAPER_CLOSE)
+    return paper, paper & ~bright
+
+
+def content_box(paper: np.ndarray, ink: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
+    """(left, top, right, bottom) of the inked part of the paper, or None if nothing is inked."""
+    top, bottom, left, right = 0, paper.shape[0], 0, paper.shape[1]
+    if paper.mean() < 0.85:  # a darker background shows: keep to the largest bright band each way
+        row_share, col_share = paper.mean(axis=1), paper.mean(axis=0)
+        rows = _longest_run(row_share > 0.5 * row_share.max())
+        cols = _longest_run(col_share > 0.5 * col_share.max())
+        if rows and cols:
+            top, bottom, left, right = rows[0], rows[1], cols[0], cols[1]
+    inside = ink[top:bottom, left:right]
+    ink_rows = np.flatnonzero(inside.mean(axis=1) > 0.003)
+    ink_cols = np.flatnonzero(inside.mean(axis=0) > 0.003)
+    if not len(ink_rows) or not len(ink_cols):
+        return None
+    t, b = top + ink_rows[0], top + ink_rows[-1] + 1
+    l, r = left + ink_cols[0], left + ink_cols[-1] + 1
+    my, mx = int((b - t) * CROP_MARGIN) + 2, int((r - l) * CROP_MARGIN) + 2
+    return max(left, l - mx), max(top, t - my), min(right, r + mx), min(bottom, b + my)
+
+
+def _border_level(a: np.ndarray) -> int:
+    """Median gray level along the edges: what rotation should fill the corners with."""
+    return int(np.median(np.concatenate((a[0], a[-1], a[:, 0], a[:, -1]))))
+
+
+def prepare_for_ocr(im: Image.Image, text_height: int = OCR_TEXT_HEIGHT) -> Image.Image:
+    """Straightened, downsampled, binarized and cropped grayscale copy of im, ready for Tesseract."""
+    gray = ImageOps.exif_transpose(im).convert('L')
+    work, work_scale = _resized(gray, WORK_SIDE)
+    work_arr = np.asarray(work)
+    threshold = otsu_threshold(work_arr)
+    fill = _border_level(work_arr)
+
+    paper, ink = paper_and_ink(work_arr, threshold)
+    angle = estimate_skew(ink)
+    if abs(angle) < MIN_SKEW:
+        angle = 0.0
+    if angle:
+        work_arr = np.asarray(work.rotate(angle, resample=Image.BILINEAR, expand=True, fillcolor=fill))
+        paper, ink = paper_and_ink(work_arr, threshold)
+    l, t, r, b = content_box(paper, ink) or (0, 0, work_arr.shape[1], work_arr.shape[0])
+    line = estimate_line_height(ink[t:b, l:r])
+
+    # the full image is scaled to the target line height first, so the rotation and crop run on fewer pixels
+    if line:
+        scale = min(1.0, text_height / (line / work_scale))
+    else:
+        crop_share = (r - l) * (b - t) / (work_arr.shape[0] * work_arr.shape[1])
+        scale = min(1.0, (OCR_MAX_PIXELS / (gray.width * gray.height * crop_share)) ** 0.5)
+    if scale < 1.0:
+        gray = gray.resize((max(1, round(gray.width * scale)), max(1, round(gray.height * scale))), Image.LANCZOS)
+    if angle:
+        gray = gray.rotate(angle, resample=Image.BILINEAR, expand=True, fillcolor=fill)
+    fx, fy = gray.width / work_arr.shape[1], gray.height / work_arr.shape[0]
+    gray = gray.crop((int(l * fx), int(t * fy), min(gray.width, int(np.ceil(r * fx))),
+                      min(gray.height, int(np.ceil(b * fy)))))
+
+    arr = np.asarray(gray)
+    return Image.fromarray(np.where(arr >= otsu_threshold(arr), 255, 0).astype(np.uint8), mode='L')
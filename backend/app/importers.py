@@ -0,0 +1,251 @@
+"""
+Streaming CSV / OFX statement import.
+
+Rows are read lazily from the uploaded file, mapped to transactions through a
+column profile, validated with TransactionCreate and written in chunked bulk
+inserts, so memory stays bounded however large the file is.
+"""
+import asyncio
+import codecs
+import csv
+import io
+import itertools
+import json
+import os
+import re
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from bson import ObjectId
+from dateutil import parser as dateparser
+from pydantic import ValidationError
+
+from . import crud
+from .schemas import TransactionCreate
+from .utils import parse_amount
+
+IMPORT_PROFILES_FILE = os.getenv('IMPORT_PROFILES_FILE', '')
+MAX_REPORTED_ERRORS = 100
+
+# Column profiles: each key lists header names (case-insensitive) that may hold that field.
+# amount_sign: 'negative_expense' -> negative amounts are expenses (most bank exports),
+#              'positive_expense' -> positive amounts are expenses (some card exports).
+DEFAULT_PROFILES: Dict[str, Dict[str, Any]] = {
+    'generic': {
+        'date': ['date', 'transaction date', 'txn date', 'posting date', 'posted date', 'value date'],
+        'amount': ['amount', 'transaction amount'],
+        'debit': ['debit', 'debit amount', 'withdrawal', 'withdrawals', 'withdrawal amt', 'paid out'],
+        'credit': ['credit', 'credit amount', 'deposit', 'deposits', 'deposit amt', 'paid in'],
+        'description': ['description', 'narration', 'particulars', 'details', 'memo', 'payee', 'name', 'remarks'],
+        'category': ['category'],
+        'type': ['type', 'transaction type', 'dr/cr', 'cr/dr'],
+        'date_format': None,
+        'dayfirst': False,
+        'amount_sign': 'negative_expense',
+        'default_category': 'import',
+    },
+}
+DEFAULT_PROFILES['dayfirst'] = {**DEFAULT_PROFILES['generic'], 'dayfirst': True}
+
+
+def load_profiles() -> Dict[str, Dict[str, Any]]:
+    """Built-in profiles, extended/overridden by IMPORT_PROFILES_FILE (JSON: {name: {...}})."""
+    profiles = dict(DEFAULT_PROFILES)
+    if IMPORT_PROFILES_FILE:
+        with open(IMPORT_PROFILES_FILE) as f:
+            for name, prof in json.load(f).items():
+                profiles[name] = {**DEFAULT_PROFILES['generic'], **prof}
+    return profiles
+
+
+PROFILES = load_profiles()
+
+class ColumnMapper:
+    """Resolves a profile against a header row once, then maps each data row to a transaction dict."""
+
+    def __init__(self, header: List[str], profile: Dict[str, Any]):
+        self.profile = profile
+        names = [h.strip().lower() for h in header]
+        self.cols: Dict[str, Optional[int]] = {}
+        for field in ('date', 'amount', 'debit', 'credit', 'description', 'category', 'type'):
+            self.cols[field] = next((names.index(c) for c in profile.get(field, []) if c in names), None)
+        if self.cols['date'] is None:
+            raise ValueError('No date column found for this profile')
+        if self.cols['amount'] is None and self.cols['debit'] is None and self.cols['credit'] is None:
+            raise ValueError('No amount/debit/credit column found for this profile')
+
+    def _get(self, row: List[str], field: str) -> Optional[str]:
+        i = self.cols[field]
+        return row[i] if i is not None and i < len(row) else None
+
+    def _date(self, value: Optional[str]) -> Optional[datetime]:
+        if not value or not value.strip():
+            return None
+        value = value.strip()
+        fmt = self.profile.get('date_format')
+        if fmt:
+            return datetime.strptime(value, fmt)
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return dateparser.parse(value, dayfirst=bool(self.profile.get('dayfirst')))
+
+    def map(self, row: List[str]) -> Dict[str, Any]:
+        tx_type = None
+        amount = None
+        debit = parse_amount(self._get(row, 'debit'))
+        credit = parse_amount(self._get(row, 'credit'))
+        if debit:
+            amount, tx_type = abs(debit), 'expense'
+        elif credit:
+            amount, tx_type = abs(credit), 'income'
+        else:
+            signed = parse_amount(self._get(row, 'amount'))
+            if signed is not None:
+                expense_negative = self.profile.get('amount_sign', 'negative_expense') == 'negative_expense'
+                tx_type = 'expense' if (signed < 0) == expense_negative else 'income'
+                amount = abs(signed)
+        declared = (self._get(row, 'type') or '').strip().lower()
+        if declared in ('income', 'credit', 'cr', 'deposit'):
+            tx_type = 'income'
+        elif declared in ('expense', 'debit', 'dr', 'withdrawal'):
+            tx_type = 'expense'
+        return {
+            'type': tx_type,
+            'amount': amount,
+            'category': (self._get(row, 'category') or '').strip() or self.profile.get('default_category'),
+            'note': (self._get(row, 'description') or '').strip(),
+            'date': self._date(self._get(row, 'date')),
+        }
+
+
+# -----------------------
+# Row sources (blocking; consumed in a worker thread)
+# -----------------------
+def iter_csv(fileobj, profile: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', errors='replace', newline='')
+    reader = csv.reader(text)
+    header = next((r for r in reader if any(c.strip() for c in r)), None)
+    if header is None:
+        return
+    mapper = ColumnMapper(header, profile)
+    for row in reader:
+        if not any(c.strip() for c in row):
+            continue
+        try:
+            yield mapper.map(row)
+        except (ValueError, OverflowError) as e:
+            yield {'_error': str(e)}
+
+
+_OFX_TAG_RE = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+
+
+def _ofx_date(value: str) -> Optional[datetime]:
+    digits = re.match(r'\d+', value or '')
+    if not digits or len(digits.group()) < 8:
+        return None
+    d = digits.group()
+    return datetime.strptime(d[:14].ljust(14, '0'), '%Y%m%d%H%M%S')
+
+
+def iter_ofx(fileobj, profile: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Incremental OFX (SGML 1.x or XML 2.x) reader yielding one dict per <STMTTRN>."""
+    decoder = codecs.getincrementaldecoder('latin-1')()
+    pending = ''
+    current: Optional[Dict[str, str]] = None
+    while True:
+        chunk = fileobj.read(64 * 1024)
+        pending += decoder.decode(chunk or b'', final=not chunk)
+        # keep an unterminated trailing tag for the next chunk
+        cut = pending.rfind('<') if chunk else -1
+        if cut < 0:
+            cut = len(pending)
+        text, pending = pending[:cut], pending[cut:]
+        for closing, tag, value in _OFX_TAG_RE.findall(text):
+            tag = tag.upper()
+            if tag == 'STMTTRN':
+                if closing and current is not None:
+                    yield _ofx_to_tx(current, profile)
+                    current = None
+                elif not closing:
+                    current = {}
+            elif current is not None and not closing:
+                current[tag] = value.strip()
+        if not chunk:
+            break
+
+
+def _ofx_to_tx(t: Dict[str, str], profile: Dict[str, Any]) -> Dict[str, Any]:
+    amount = parse_amount(t.get('TRNAMT'))
+    note = ' '.join(v for v in (t.get('NAME'), t.get('MEMO')) if v)
+    return {
+        'type': None if amount is None else ('expense' if amount < 0 else 'income'),
+        'amount': None if amount is None else abs(amount),
+        'category': profile.get('default_category'),
+        'note': note,
+        'date': _ofx_date(t.get('DTPOSTED', '')),
+    }
+
+
+SOURCES = {'csv': iter_csv, 'ofx': iter_ofx}
+
+
+def _next_batch(rows: Iterator[Dict[str, Any]], size: int, offset: int):
+    """
+    Pull up to size rows and validate them. Returns (docs, doc_rows, errors, rows read);
+    doc_rows[i] is the 1-based data row number of docs[i].
+    """
+    docs, doc_rows, errors, n = [], [], [], 0
+    for raw in itertools.islice(rows, size):
+        n += 1
+        row_no = offset + n
+        if '_error' in raw:
+            errors.append({'row': row_no, 'error': raw['_error']})
+            continue
+        try:
+            docs.append(TransactionCreate(**raw).dict())
+            doc_rows.append(row_no)
+        except ValidationError as e:
+            errors.append({'row': row_no, 'error': '; '.join(
+                f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())})
+    return docs, doc_rows, errors, n
+
+
+async def import_transactions(user_id: ObjectId, fileobj, fmt: str, profile: Dict[str, Any],
+                              chunk_size: int = crud.BULK_CHUNK_SIZE) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Import rows from fileobj (csv|ofx) chunk by chunk, yielding a progress dict after
+    each chunk and a final one with done=True. At most MAX_REPORTED_ERRORS error
+    details are kept; the error count is always exact.
+    """
+    rows = SOURCES[fmt](fileobj, profile)
+    processed = inserted = error_count = 0
+    error_samples: List[Dict[str, Any]] = []
+
+    def note_errors(errs):
+        nonlocal error_count
+        error_count += len(errs)
+        room = MAX_REPORTED_ERRORS - len(error_samples)
+        if room > 0:
+            error_samples.extend(errs[:room])
+
+    while True:
+        try:
+            # reading + parsing + validation are CPU/IO bound; keep them off the event loop
+            docs, doc_rows, errors, n = await asyncio.to_thread(_next_batch, rows, chunk_size, processed)
+        except (ValueError, csv.Error) as e:
+            note_errors([{'row': processed + 1, 'error': str(e)}])
+            break
+        if n == 0:
+            break
+        note_errors(errors)
+        if docs:
+            result = await crud.create_transactions_bulk(user_id, docs, chunk_size=chunk_size)
+            inserted += len(result['inserted'])
+            note_errors([{'row': doc_rows[e['index']], 'error': e['error']} for e in result['errors']])
+        processed += n
+        yield {'processed': processed, 'inserted': inserted, 'errors': error_count}
+
+    yield {'done': True, 'processed': processed, 'inserted': inserted, 'errors': error_count,
+           'error_samples': error_samples}
@@ -1,20 +1,51 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import Response
 from .routes import router
 from fastapi.middleware.cors import CORSMiddleware
-from .db import get_client
-app = FastAPI(title='Personal Finance Assistant API')
-app.include_router(router, prefix='/api')
-app.add_middleware(CORSMiddleware, allow_origins=['*'], allow_credentials=True, allow_methods=['*'], allow_headers=['*'])
+from . import db
+from .crud import ensure_indexes, ensure_rollups
+from .workers import shutdown_pool
+from .auth import shutdown_hash_executor
+from .uploads import UploadLimitMiddleware
+from . import metrics
+
 
-@app.on_event('startup')
-async def startup_db_client():
-    client = get_client()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # one Mongo client (and connection pool) for the whole process; indexes (and,
+    # after an upgrade, the dashboard rollups) are in place before the first request
     try:
-        await client.admin.command('ping')
+        await db.connect()
         print('✅ Connected to MongoDB successfully')
+        await ensure_indexes()
+        await ensure_rollups()
     except Exception as e:
         print('❌ Could not connect to MongoDB:', e)
-        
+        db.close()
+        raise
+    try:
+        yield
+    finally:
+        shutdown_pool()
+        shutdown_hash_executor()
+        db.close()
+
+
+app = FastAPI(title='Personal Finance Assistant API', lifespan=lifespan)
+app.include_router(router, prefix='/api')
+app.add_middleware(UploadLimitMiddleware)
+app.add_middleware(CORSMiddleware, allow_origins=['*'], allow_credentials=True, allow_methods=['*'], allow_headers=['*'])
+app.add_middleware(metrics.MetricsMiddleware)  # outermost, so timings include the other middleware
+
 @app.get('/')
 async def root():
     return {'status':'ok', 'message':'Personal Finance Assistant API'}
+
+@app.get('/health')
+async def health():
+    return {'status': 'ok', 'mongo_pool': db.pool_utilization()}
+
+@app.get('/metrics', include_in_schema=False)
+async def prometheus_metrics():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
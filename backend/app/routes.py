@@ -1,17 +1,27 @@
-from fastapi import APIRouter, UploadFile, File, Query, Depends, HTTPException, status
+from fastapi import APIRouter, UploadFile, File, Query, Depends, HTTPException, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from .schemas import UserCreate, Token, TransactionCreate, OCRResult, CategoryCreate
-from .crud import create_user, get_user_by_email, create_transaction, get_transactions, aggregate_by_category, aggregate_by_date, count_transactions, create_category, list_categories
-from .utils import ocr_image_bytes, auto_parse_transactions, parse_pdf_table,parse_pos_receipt
-from .auth import hash_password, verify_password, create_access_token, decode_token
-from .crud import update_transaction as update_transaction_crud, delete_transaction as delete_transaction_crud, get_user_by_id
+from fastapi.responses import StreamingResponse, JSONResponse, Response
+from fastapi.encoders import jsonable_encoder
+from pydantic import ValidationError
+from .schemas import UserCreate, Token, TransactionCreate, OCRResult, CategoryCreate, TransactionUpdate, TransactionBatch, SummaryRequest
+from .crud import create_user, get_user_by_email, create_transaction, create_transactions_bulk, get_transactions, aggregate_by_category, aggregate_by_date, count_transactions, create_category, get_category_catalog, seed_categories as seed_categories_crud
+from .utils import extract_document_text, auto_parse_transactions, parse_statement, parse_pos_receipt, parse_fast_receipt, DocumentError
+from .workers import run_in_pool, WorkerTimeout
+from .cache import doc_cache
+from .metrics import timed_stage
+from .analytics import user_analytics
+from .chatbot import summarize_window
+from .importers import import_transactions, PROFILES
+from .uploads import spool_upload
+from .auth import hash_password_async, verify_and_update_password, create_access_token, decode_token
+from .crud import update_transaction as update_transaction_crud, delete_transaction as delete_transaction_crud, get_user_by_id, encode_cursor, decode_cursor, dashboard_summary, update_user_password, iter_transactions, apply_transaction_batch
 from datetime import datetime
 # from datetime import timedelta
 from bson import ObjectId
 from typing import Optional
 router = APIRouter()
 security = HTTPBearer()
-import re
+import re, io, csv, json, zlib
 
 
 
@@ -45,8 +55,8 @@ DEFAULT_EXPENSE_CATEGORIES = [
 @router.post('/auth/register', response_model=dict)
 async def register(payload: UserCreate):
     existing = await get_user_by_email(payload.email)
-    email = payload.get('email')
-    password = payload.get('password')
+    email = payload.email
+    password = payload.password
 
     if existing:
         raise HTTPException(status_code=400, detail='Email already registered')
@@ -61,7 +71,7 @@ async def register(payload: UserCreate):
         raise HTTPException(status_code=400, detail='Password must be at least 8 characters and include 1 uppercase, 1 lowercase, 1 digit and 1 special character.')
 
 
-    user = {'email': email, 'password': hash_password(password)}
+    user = {'email': email, 'password': await hash_password_async(password)}
     created = await create_user(user)
     created.pop('password', None)
     created_id = str(created['_id'])
@@ -72,8 +82,14 @@ async def register(payload: UserCreate):
 @router.post('/auth/login', response_model=Token)
 async def login(payload: UserCreate):
     user = await get_user_by_email(payload.email)
-    if not user or not verify_password(payload.password, user.get('password')):
+    if not user:
         raise HTTPException(status_code=401, detail='Invalid credentials')
+    ok, new_hash = await verify_and_update_password(payload.password, user.get('password'))
+    if not ok:
+        raise HTTPException(status_code=401, detail='Invalid credentials')
+    if new_hash:
+        # stored hash used an outdated bcrypt cost; upgrade it transparently
+        await update_user_password(user['_id'], new_hash)
     token = create_access_token({'user_id': str(user['_id']), 'email': user['email']})
     return {'access_token': token}
 
@@ -99,11 +115,17 @@ async def add_category(payload: CategoryCreate, user_id = Depends(get_current_us
     return {'id': str(created.get('_id') or created.get('id')), 'name': created['name'], 'type': created['type'], 'icon': created.get('icon')}
 
 @router.get('/categories')
-async def get_categories():
+async def get_categories(request: Request):
     """
     Return global categories (no user filtering).
+    Served from an in-process cache with an ETag; If-None-Match gets a 304.
     """
-    return await list_categories()
+    items, etag = await get_category_catalog()
+    etag = f'"{etag}"'
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    if request.headers.get('if-none-match') == etag:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(jsonable_encoder(items), headers=headers)
 
 
 @router.post('/transactions', status_code=201)
@@ -121,19 +143,115 @@ async def add_transaction(payload: TransactionCreate, user_id = Depends(get_curr
     saved = await create_transaction(ObjectId(user_id), doc)
     return saved
 
+@router.post('/transactions/batch')
+async def batch_transactions(payload: TransactionBatch, user_id = Depends(get_current_user)):
+    """
+    Create / update / delete many transactions in one request, written with a single
+    bulk_write. Each operation is validated on its own (TransactionCreate / TransactionUpdate);
+    a bad operation gets an error result and does not stop the rest. A body with more
+    than BATCH_MAX_OPS operations fails schema validation (422).
+    """
+    ops, results = [], []
+    for i, o in enumerate(payload.operations):
+        try:
+            if o.op == 'create':
+                data = TransactionCreate(**(o.data or {})).dict()
+            elif o.op == 'update':
+                data = TransactionUpdate(**(o.data or {})).dict(exclude_unset=True)
+            else:
+                data = None
+        except ValidationError as e:
+            results.append({'index': i, 'op': o.op, 'status': 'error', 'error': '; '.join(
+                f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())})
+            continue
+        ops.append({'index': i, 'op': o.op, 'id': o.id, 'data': data})
+    results.extend(await apply_transaction_batch(ObjectId(user_id), ops))
+    results.sort(key=lambda r: r['index'])
+    ok = sum(1 for r in results if r['status'] == 'ok')
+    return {'ok': ok, 'failed': len(results) - ok, 'results': results}
+
 @router.get('/transactions')
-async def list_transactions(start: str | None = Query(None), end: str | None = Query(None), page:int=1, page_size:int=10, tx_type: str | None = None, user_id = Depends(get_current_user)):
+async def list_transactions(start: str | None = Query(None), end: str | None = Query(None), page:int=1, page_size:int=10, tx_type: str | None = None,
+                            cursor: str | None = Query(None), with_total: bool = True, user_id = Depends(get_current_user)):
+    """
+    Page through transactions, newest first. Either by page number, or (faster for
+    deep pages) by passing the previous response's next_cursor as `cursor`.
+    Set with_total=false to skip counting.
+    """
     start_dt = datetime.fromisoformat(start) if start else None
     end_dt = datetime.fromisoformat(end) if end else None
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
     skip = (page - 1) * page_size
-    items = await get_transactions(ObjectId(user_id), start=start_dt, end=end_dt, skip=skip, limit=page_size, tx_type=tx_type)
-    total = await count_transactions(ObjectId(user_id), start=start_dt, end=end_dt, tx_type=tx_type)
-    return {'page': page, 'page_size': page_size, 'total': total, 'items': items}
+    items = await get_transactions(ObjectId(user_id), start=start_dt, end=end_dt, skip=skip, limit=page_size, tx_type=tx_type, after=after)
+    total = await count_transactions(ObjectId(user_id), start=start_dt, end=end_dt, tx_type=tx_type) if with_total else None
+    # keyset continuation needs a datetime sort key; rows with a missing or string date (older data)
+    # sort after every dated row, so past them clients page by number instead
+    last = items[-1] if len(items) == page_size and page_size > 0 else None
+    next_cursor = encode_cursor(last['date'], last['id']) if last and isinstance(last['date'], datetime) else None
+    return {'page': page, 'page_size': page_size, 'total': total, 'items': items, 'next_cursor': next_cursor}
+
+EXPORT_FIELDS = ['id', 'date', 'type', 'amount', 'category', 'note']
+EXPORT_FLUSH_BYTES = 64 * 1024
+
+async def _export_stream(rows, fmt: str, gzip: bool):
+    """Serialize rows as CSV or NDJSON in ~64KB chunks, optionally gzip-compressed on the fly."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None
+    buf = io.StringIO()
+    writer = csv.writer(buf) if fmt == 'csv' else None
+    if writer:
+        writer.writerow(EXPORT_FIELDS)
+
+    def drain():
+        data = buf.getvalue().encode('utf-8')
+        buf.seek(0)
+        buf.truncate()
+        return compressor.compress(data) if compressor else data
+
+    async for d in rows:
+        date = d.get('date')
+        date = date.isoformat() if isinstance(date, datetime) else date
+        if writer:
+            writer.writerow([d.get('id'), date, d.get('type'), d.get('amount'), d.get('category'), d.get('note')])
+        else:
+            buf.write(json.dumps({k: (date if k == 'date' else d.get(k)) for k in EXPORT_FIELDS}, default=str) + '\n')
+        if buf.tell() >= EXPORT_FLUSH_BYTES:
+            chunk = drain()
+            if chunk:
+                yield chunk
+    tail = drain()
+    if compressor:
+        tail += compressor.flush()
+    if tail:
+        yield tail
+
+@router.get('/transactions/export')
+async def export_transactions(start: str | None = Query(None), end: str | None = Query(None), tx_type: str | None = None,
+                              format: str = Query('csv', pattern='^(csv|ndjson)$'), gzip: bool = False,
+                              user_id = Depends(get_current_user)):
+    """
+    Stream all matching transactions as CSV or NDJSON straight from the database cursor.
+    gzip=true compresses the stream (Content-Encoding: gzip).
+    """
+    start_dt = datetime.fromisoformat(start) if start else None
+    end_dt = datetime.fromisoformat(end) if end else None
+    rows = iter_transactions(ObjectId(user_id), start=start_dt, end=end_dt, tx_type=tx_type)
+    media_type = 'text/csv' if format == 'csv' else 'application/x-ndjson'
+    headers = {'Content-Disposition': f'attachment; filename="transactions.{format}"'}
+    if gzip:
+        headers['Content-Encoding'] = 'gzip'
+    return StreamingResponse(_export_stream(rows, format, gzip), media_type=media_type, headers=headers)
 
 @router.put('/transactions/{tx_id}')
-async def update_transaction(tx_id: str, payload: dict, user_id = Depends(get_current_user)):
+@router.patch('/transactions/{tx_id}')
+async def update_transaction(tx_id: str, payload: TransactionUpdate, user_id = Depends(get_current_user)):
+    # partial update: only the fields the client sent are changed
     try:
-        updated = await update_transaction_crud(ObjectId(user_id), tx_id, payload)  # see note below about function name
+        updated = await update_transaction_crud(ObjectId(user_id), tx_id, payload.dict(exclude_unset=True))
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     return updated
@@ -158,37 +276,112 @@ async def agg_date(start: str | None = None, end: str | None = None, tx_type: st
     end_dt = datetime.fromisoformat(end) if end else None
     return await aggregate_by_date(ObjectId(user_id), start=start_dt, end=end_dt, tx_type=tx_type)
 
+@router.get('/dashboard')
+async def dashboard(start: str | None = None, end: str | None = None, tx_type: str | None = None, user_id = Depends(get_current_user)):
+    """
+    Category totals, daily series (both for tx_type) and income/expense/net totals
+    for the date range, in one request and one database round-trip.
+    """
+    start_dt = datetime.fromisoformat(start) if start else None
+    end_dt = datetime.fromisoformat(end) if end else None
+    return await dashboard_summary(ObjectId(user_id), start=start_dt, end=end_dt, tx_type=tx_type)
+
+@router.get('/analytics')
+async def analytics(start: str | None = None, end: str | None = None, window: int = Query(7, ge=1, le=365),
+                    top: int = Query(10, ge=1, le=100), user_id = Depends(get_current_user)):
+    """
+    Totals, top expense categories, daily expense series with a rolling mean, monthly
+    income/expense with month-over-month change, and expense amount percentiles.
+    Computed in-process over the user's cached column arrays.
+    """
+    start_dt = datetime.fromisoformat(start) if start else None
+    end_dt = datetime.fromisoformat(end) if end else None
+    return await user_analytics(ObjectId(user_id), start=start_dt, end=end_dt, window_days=window, top=top)
+
 @router.post('/ocr', response_model=OCRResult)
-async def ocr_upload(file: UploadFile = File(...), user_id = Depends(get_current_user), auto_create: bool = Query(False)):
-    content = await file.read()
-    text = await ocr_image_bytes(content)
-    pos_tx = parse_pos_receipt(text)
+async def ocr_upload(file: UploadFile = File(...), user_id = Depends(get_current_user), auto_create: bool = Query(False),
+                     fast: bool = Query(False)):
+    """
+    OCR a receipt image or PDF and parse its total. fast=true restricts Tesseract
+    to a single text block of digits, separators and currency signs (quicker on
+    photos); no words are read, so parse_fast_receipt takes the largest amount with
+    cents outside the date lines as the total, and the receipt's date with it.
+    """
+    upload = await spool_upload(file)
+    try:
+        cache_key = doc_cache.key('ocr-fast' if fast else 'ocr', upload.sha256)
+        cached = await doc_cache.get(cache_key)
+        if cached:
+            text, pages, pos_tx = cached['text'], cached['pages'], cached['parsed']
+        else:
+            try:
+                with timed_stage('document_text'):
+                    text, pages = await extract_document_text(upload.source, fast=fast)
+                with timed_stage('receipt_parse'):
+                    pos_tx = await run_in_pool(parse_fast_receipt if fast else parse_pos_receipt, text)
+            except WorkerTimeout:
+                raise HTTPException(status_code=504, detail='OCR timed out')
+            except DocumentError as e:
+                raise HTTPException(status_code=422, detail=str(e))
+            # only clean, non-empty results are cached; a failed page or blank read is retried next upload
+            if text.strip() and not any(p['source'] == 'failed' for p in pages):
+                await doc_cache.set(cache_key, {'text': text, 'pages': pages, 'parsed': pos_tx})
+    finally:
+        upload.cleanup()
     parsed = [pos_tx] if pos_tx else []
 
     created = []
     if auto_create and parsed:
-        for p in parsed:
-            doc = p.copy()
-            if isinstance(doc.get('date'), str):
-                try:
-                    doc['date'] = datetime.fromisoformat(doc['date'])
-                except:
-                    doc['date'] = None
-            saved = await create_transaction(ObjectId(user_id), doc)
-            created.append({'id': str(saved['_id']), 'amount': saved['amount']})
-    return {'text': text, 'parsed_transactions': created or parsed}
+        result = await create_transactions_bulk(ObjectId(user_id), parsed)
+        created = [{'id': r['id'], 'amount': r['amount']} for r in result['inserted']]
+    return {'text': text, 'parsed_transactions': created or parsed, 'pages': pages}
 
 @router.post('/upload/history')
 async def upload_history(file: UploadFile = File(...), user_id = Depends(get_current_user), auto_create: bool = Query(False)):
-    content = await file.read()
-    rows = parse_pdf_table(content)
+    upload = await spool_upload(file)
+    try:
+        cache_key = doc_cache.key('table', upload.sha256)
+        rows = await doc_cache.get(cache_key)
+        if rows is None:
+            try:
+                rows = await parse_statement(upload.source)
+            except WorkerTimeout:
+                raise HTTPException(status_code=504, detail='Statement parsing timed out')
+            except DocumentError as e:
+                raise HTTPException(status_code=422, detail=str(e))
+            if rows:
+                await doc_cache.set(cache_key, rows)
+    finally:
+        upload.cleanup()
     created = []
+    errors = []
     if auto_create and rows:
-        for r in rows:
-            doc = {'type':'expense','amount': r.get('amount') or 0.0, 'category':'history','note': r.get('note',''), 'date': r.get('date')}
-            saved = await create_transaction(ObjectId(user_id), doc)
-            created.append({'id': str(saved['_id']), 'amount': saved['amount']})
-    return {'rows': rows, 'created': created}
+        docs = [{'type': r.get('type') or 'expense','amount': r.get('amount') or 0.0, 'category':'history','note': r.get('note',''), 'date': r.get('date')} for r in rows]
+        result = await create_transactions_bulk(ObjectId(user_id), docs)
+        created = [{'id': r['id'], 'amount': r['amount']} for r in result['inserted']]
+        errors = result['errors']
+    return {'rows': rows, 'created': created, 'errors': errors}
+
+@router.post('/upload/import')
+async def upload_import(file: UploadFile = File(...), user_id = Depends(get_current_user),
+                        format: str | None = Query(None, pattern='^(csv|ofx)$'), profile: str = Query('generic')):
+    """
+    Bulk import a CSV or OFX bank export. The file is parsed incrementally and written
+    in chunks; the response streams NDJSON progress lines and ends with a summary
+    ({"done": true, processed, inserted, errors, error_samples}).
+    """
+    if profile not in PROFILES:
+        raise HTTPException(status_code=400, detail=f'Unknown import profile: {profile}')
+    fmt = format
+    if not fmt:
+        name = (file.filename or '').lower()
+        fmt = 'ofx' if name.endswith(('.ofx', '.qfx')) else 'csv'
+
+    async def progress():
+        async for event in import_transactions(ObjectId(user_id), file.file, fmt, PROFILES[profile]):
+            yield json.dumps(event) + '\n'
+
+    return StreamingResponse(progress(), media_type='application/x-ndjson')
 
 @router.post("/seed/categories", status_code=201)
 async def seed_categories():
@@ -198,45 +391,14 @@ async def seed_categories():
     Protected endpoint: requires a valid JWT (use admin/user token).
     """
     defaults = DEFAULT_INCOME_CATEGORIES + DEFAULT_EXPENSE_CATEGORIES
-    created = []
-    for c in defaults:
-        res = await create_category(c)
-
-        cid = str(res.get('_id') or res.get('id') or '')
-        created.append({'name': c['name'], 'type': c['type'], 'id': cid})
+    created = await seed_categories_crud(defaults)
     return {"status": "ok", "seeded": created}
 
-
-# from pydantic import BaseModel
-# from typing import Optional
-# from datetime import datetime
-# from fastapi import Depends, HTTPException
-# from .crud import get_transactions  # already defined in your CRUD
-# from bson import ObjectId
-
-# from pydantic import BaseModel
-# from typing import Optional
-# from fastapi import Depends, HTTPException
-# from bson import ObjectId
-
-# # NEW import
-# from .chatbot import summarize_with_llm_on_raw
-
-# class SummaryRequest(BaseModel):
-#     prompt: str
-#     tx_type: Optional[str] = None  # optional: "income" | "expense"
-
-# @router.post("/llm/summary")
-# async def llm_summary(payload: SummaryRequest, user_id = Depends(get_current_user)):
-#     tx_type = payload.tx_type if payload.tx_type in ("income", "expense") else None
-
-#     items = await get_transactions(
-#         ObjectId(user_id),
-#         start=None,
-#         end=None,
-#         skip=0,
-#         limit=100000,
-#         tx_type=tx_type,
-#     )
-
-#     return summarize_with_llm_on_raw(payload.prompt, items)
+@router.post("/llm/summary")
+async def llm_summary(payload: SummaryRequest, user_id = Depends(get_current_user)):
+    """
+    Summary of the user's transactions for the window the prompt asks about
+    ("last month", "from 1 Aug to 31 Aug", ...; default: this month). Only
+    aggregated metrics are sent to the summarizer; see app/chatbot.py.
+    """
+    return await summarize_window(ObjectId(user_id), payload.prompt, payload.tx_type)
@@ -1,6 +1,9 @@
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, Field, EmailStr, field_validator
 from typing import Optional, List
 from datetime import datetime
+import os
+
+BATCH_MAX_OPS = int(os.environ.get('BATCH_MAX_OPS', '5000'))  # operations per /transactions/batch request
 
 class UserCreate(BaseModel):
     email: EmailStr
@@ -25,9 +28,41 @@ class TransactionCreate(BaseModel):
     note: Optional[str] = None
     date: Optional[datetime] = None
 
+class TransactionUpdate(BaseModel):
+    # every field optional: only the keys the client sends are changed
+    type: Optional[str] = Field(None, pattern="^(income|expense)$")
+    amount: Optional[float] = None
+    category: Optional[str] = None
+    note: Optional[str] = None
+    date: Optional[datetime] = None
+
+    @field_validator("date", mode="before")
+    @classmethod
+    def date_only(cls, v):
+        # the edit form sends plain YYYY-MM-DD
+        if isinstance(v, str) and v:
+            try:
+                return datetime.fromisoformat(v)
+            except ValueError:
+                pass
+        return v
+
+class TransactionBatchOp(BaseModel):
+    op: str = Field(..., pattern="^(create|update|delete)$")
+    id: Optional[str] = None     # update / delete
+    data: Optional[dict] = None  # create: TransactionCreate fields, update: TransactionUpdate fields
+
+class TransactionBatch(BaseModel):
+    operations: List[TransactionBatchOp] = Field(..., max_length=BATCH_MAX_OPS)
+
 class TransactionOut(TransactionCreate):
     id: str
 
+class SummaryRequest(BaseModel):
+    prompt: str = Field("", max_length=2000)  # e.g. "summary for last month"; only selects the window
+    tx_type: Optional[str] = Field(None, pattern="^(income|expense)$")
+
 class OCRResult(BaseModel):
     text: str
     parsed_transactions: Optional[List[dict]] = None
+    pages: Optional[List[dict]] = None  # per-page {page, source: text|ocr|failed, ms}
@@ -0,0 +1,127 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+from typing import Optional, Union
+
+from fastapi import HTTPException, UploadFile
+
+# --- Configuration ---
+MAX_UPLOAD_BYTES = int(os.getenv('MAX_UPLOAD_BYTES', str(50 * 1024 * 1024)))
+MAX_IMPORT_BYTES = int(os.getenv('MAX_IMPORT_BYTES', str(500 * 1024 * 1024)))  # CSV/OFX bulk import
+UPLOAD_SPOOL_BYTES = int(os.getenv('UPLOAD_SPOOL_BYTES', str(1024 * 1024)))  # larger uploads go to a temp file
+UPLOAD_TMP_DIR = os.getenv('UPLOAD_TMP_DIR') or None
+
+READ_CHUNK = 1024 * 1024
+LARGE_UPLOAD_PATHS = ('/api/upload/import',)
+
+
+def _too_large(limit: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f'Upload exceeds the {limit // (1024 * 1024)} MB limit')
+
+
+class UploadLimitMiddleware:
+    """
+    Enforce the request body limit for multipart uploads while the body streams in:
+    rejects up front on Content-Length, and stops reading once the limit is crossed
+    for chunked bodies. Other request types are left alone.
+    """
+
+    def __init__(self, app, max_bytes: int = MAX_UPLOAD_BYTES, large_max_bytes: int = MAX_IMPORT_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.large_max_bytes = large_max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        headers = dict(scope.get('headers') or [])
+        if not headers.get(b'content-type', b'').startswith(b'multipart/'):
+            return await self.app(scope, receive, send)
+
+        limit = self.large_max_bytes if scope.get('path', '').startswith(LARGE_UPLOAD_PATHS) else self.max_bytes
+        declared = headers.get(b'content-length')
+        if declared and declared.isdigit() and int(declared) > limit:
+            await self._reject(send, limit)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > limit:
+                    raise _too_large(limit)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    @staticmethod
+    async def _reject(send, limit: int):
+        body = ('{"detail":"Upload exceeds the %d MB limit"}' % (limit // (1024 * 1024))).encode()
+        await send({'type': 'http.response.start', 'status': 413,
+                    'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]})
+        await send({'type': 'http.response.body', 'body': body})
+
+
+class SpooledUpload:
+    """
+    An uploaded file copied out of the request exactly once: small files are kept
+    as bytes, larger ones live in a temp file and are handed to parsers by path.
+    `source` is what the utils parsers accept; `sha256` is computed while copying.
+    """
+
+    def __init__(self, data: Optional[bytes], path: Optional[str], size: int, sha256: str):
+        self.data = data
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+
+    @property
+    def source(self) -> Union[bytes, str]:
+        return self.data if self.data is not None else self.path
+
+    def cleanup(self):
+        if self.path:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            self.path = None
+
+
+async def spool_upload(file: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES,
+                       spool_bytes: int = UPLOAD_SPOOL_BYTES) -> SpooledUpload:
+    """Copy an UploadFile in chunks, enforcing max_bytes (HTTP 413) and spilling to disk past spool_bytes."""
+    digest = hashlib.sha256()
+    parts = []
+    size = 0
+    tmp = None
+    try:
+        while True:
+            chunk = await file.read(READ_CHUNK)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise _too_large(max_bytes)
+            digest.update(chunk)
+            if tmp is None and size > spool_bytes:
+                tmp = tempfile.NamedTemporaryFile(prefix='pfa-upload-', dir=UPLOAD_TMP_DIR, delete=False)
+                await asyncio.to_thread(tmp.writelines, parts)
+                parts = []
+            if tmp is not None:
+                await asyncio.to_thread(tmp.write, chunk)
+            else:
+                parts.append(chunk)
+    except BaseException:
+        if tmp is not None:
+            tmp.close()
+            os.remove(tmp.name)
+        raise
+    if tmp is not None:
+        tmp.close()
+        return SpooledUpload(None, tmp.name, size, digest.hexdigest())
+    return SpooledUpload(b''.join(parts), None, size, digest.hexdigest())
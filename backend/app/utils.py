@@ -1,35 +1,177 @@
-import io, re
+import io, re, os, time, asyncio
+from bisect import bisect_right
 from PIL import Image
 import pytesseract
 import pdfplumber
-from pdf2image import convert_from_bytes
+from pdf2image import convert_from_bytes, convert_from_path
+from datetime import datetime
+from typing import List, Optional, Union
 from dateutil import parser as dateparser
+from .workers import run_in_pool, WorkerTimeout, DOC_TASK_TIMEOUT, DOC_WORKERS
+from .metrics import observe_stage, timed_stage
+from .imageprep import OCR_PREPROCESS, prepare_for_ocr, tesseract_config
 AMOUNT_RE = re.compile(r'(?:(?:Rs\.|INR|USD|EUR|Rs|₹)?\s?\b)([0-9]+(?:[.,][0-9]{2})?)')
+# money written with cents only ("643.66", "1240,50"); bare integers are years, ids, quantities
+MONEY_RE = re.compile(r'(?<![\d,])(?<!\d\.)([0-9]+[.,][0-9]{2})(?!\d)')
+_THOUSANDS_RE = re.compile(r'(?<=\d),(?=\d{3}(?!\d))')
 
-async def ocr_image_bytes(file_bytes: bytes) -> str:
-    try:
-        im = Image.open(io.BytesIO(file_bytes)).convert('RGB')
-        text = pytesseract.image_to_string(im)
-        return text
-    except Exception:
+# bump whenever OCR / parser output changes so cached results are not reused
+PARSER_VERSION = '6'
+
+OCR_DPI = int(os.getenv('OCR_DPI', '200'))
+# pages whose embedded text layer has fewer characters than this are treated as scanned
+MIN_TEXT_LAYER_CHARS = int(os.getenv('MIN_TEXT_LAYER_CHARS', '16'))
+# scanned pages of one document queued for the worker pool at a time, so a long scan
+# takes turns with other uploads instead of filling the queue
+OCR_PAGES_IN_FLIGHT = max(1, int(os.getenv('OCR_PAGES_IN_FLIGHT', str(max(1, DOC_WORKERS // 2)))))
+
+
+class DocumentError(Exception):
+    """Raised when an upload cannot be read or parsed (corrupt file, OCR / parser failure)."""
+
+
+def _elapsed_ms(t0: float) -> float:
+    return round((time.perf_counter() - t0) * 1000, 1)
+
+
+# Parsers accept either the upload's bytes or the path of a spooled temp file
+# (large uploads), so big files are never copied into worker processes.
+Source = Union[bytes, str]
+
+
+def _as_file(source: Source):
+    return io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+
+
+def is_pdf(source: Source) -> bool:
+    if isinstance(source, (bytes, bytearray)):
+        head = source[:1024]
+    else:
+        with open(source, 'rb') as f:
+            head = f.read(1024)
+    return b'%PDF' in head
+
+
+def _tesseract(image: Image.Image, fast: bool = False) -> str:
+    return pytesseract.image_to_string(image, config=tesseract_config(fast), timeout=DOC_TASK_TIMEOUT)
+
+
+def ocr_image_sync(source: Source, fast: bool = False) -> dict:
+    """OCR a single image upload, through prepare_for_ocr if OCR_PREPROCESS. Runs inside the worker pool."""
+    t0 = time.perf_counter()
+    with Image.open(_as_file(source)) as im:
+        text = _tesseract(prepare_for_ocr(im) if OCR_PREPROCESS else im.convert('RGB'), fast)
+    return {'page': 1, 'source': 'ocr', 'text': text, 'ms': _elapsed_ms(t0)}
+
+
+def pdf_text_layers(source: Source) -> list:
+    """
+    Read the embedded text layer of every PDF page. Pages without usable text
+    (scanned pages) come back with text=None so the caller can OCR just those.
+    """
+    out = []
+    with pdfplumber.open(_as_file(source)) as pdf:
+        for i, page in enumerate(pdf.pages, start=1):
+            t0 = time.perf_counter()
+            text = page.extract_text() or ''
+            if len(text.strip()) < MIN_TEXT_LAYER_CHARS:
+                text = None
+            out.append({'page': i, 'source': 'text', 'text': text, 'ms': _elapsed_ms(t0)})
+            page.flush_cache()
+    return out
+
+
+def ocr_pdf_page(source: Source, page_no: int, dpi: int = OCR_DPI, fast: bool = False) -> dict:
+    """Rasterize one PDF page (1-based) at `dpi` and OCR it. Runs inside the worker pool."""
+    t0 = time.perf_counter()
+    if isinstance(source, (bytes, bytearray)):
+        images = convert_from_bytes(source, dpi=dpi, first_page=page_no, last_page=page_no)
+    else:
+        images = convert_from_path(source, dpi=dpi, first_page=page_no, last_page=page_no)
+    text = "\n".join(_tesseract(im, fast) for im in images)
+    return {'page': page_no, 'source': 'ocr', 'text': text, 'ms': _elapsed_ms(t0)}
+
+
+async def extract_document_text(source: Source, dpi: int = OCR_DPI, fast: bool = False):
+    """
+    Extract text from an uploaded image or PDF.
+    PDFs use each page's text layer when present; only image-only pages are
+    rasterized and OCR'd, in parallel across the worker pool (at most
+    OCR_PAGES_IN_FLIGHT at a time per document). fast=True uses
+    the restricted Tesseract config (tesseract_config) for amount/date reads.
+    Returns (text, pages) where pages lists {page, source, ms} in page order;
+    scanned pages whose OCR failed are kept with source='failed'. Raises
+    DocumentError if the file cannot be read at all.
+    """
+    if not await asyncio.to_thread(is_pdf, source):
         try:
-            pages = convert_from_bytes(file_bytes)
-            text = []
-            for p in pages:
-                text.append(pytesseract.image_to_string(p))
-            return "\n".join(text)
-        except Exception:
-            try:
-                with pdfplumber.open(io.BytesIO(file_bytes)) as pdf:
-                    texts = [p.extract_text() or '' for p in pdf.pages]
-                    return "\n".join(texts)
-            except Exception:
-                return ''
-        
-def parse_amounts(text: str):
+            pages = [await run_in_pool(ocr_image_sync, source, fast)]
+        except WorkerTimeout:
+            raise
+        except Exception as e:
+            raise DocumentError(f'could not OCR image: {e}') from e
+    else:
+        try:
+            pages = await run_in_pool(pdf_text_layers, source)
+        except WorkerTimeout:
+            raise
+        except Exception as e:
+            raise DocumentError(f'could not read PDF: {e}') from e
+        scanned = [p['page'] for p in pages if p['text'] is None]
+        if scanned:
+            in_flight = asyncio.Semaphore(OCR_PAGES_IN_FLIGHT)
+
+            async def ocr_page(n: int) -> dict:
+                async with in_flight:
+                    return await run_in_pool(ocr_pdf_page, source, n, dpi, fast)
+
+            results = await asyncio.gather(*(ocr_page(n) for n in scanned), return_exceptions=True)
+            by_page = {p['page']: p for p in pages}
+            for n, res in zip(scanned, results):
+                if isinstance(res, Exception):
+                    by_page[n].update({'source': 'failed', 'text': ''})
+                else:
+                    by_page[n] = res
+            pages = [by_page[n] for n in sorted(by_page)]
+
+    for p in pages:  # timed inside the workers; recorded here, in the serving process
+        observe_stage('ocr_page' if p['source'] == 'ocr' else 'pdf_text_page', p['ms'] / 1000)
+    text = "\n".join(p['text'] or '' for p in pages)
+    return text, [{'page': p['page'], 'source': p['source'], 'ms': p['ms']} for p in pages]
+
+
+async def ocr_image_bytes(source: Source, fast: bool = False) -> str:
+    text, _ = await extract_document_text(source, fast=fast)
+    return text
+
+_NUM_RE = re.compile(r'[^0-9.\-]')
+
+
+def parse_amount(value: Optional[str]) -> Optional[float]:
+    """'1,234.50', '(12.00)', '-5', '12.00 Dr', '₹ 40' -> signed float; None if blank/unparseable."""
+    if value is None:
+        return None
+    s = value.strip()
+    if not s:
+        return None
+    negative = s.startswith('(') and s.endswith(')')
+    low = s.lower()
+    if low.endswith('dr'):
+        negative = True
+    cleaned = _NUM_RE.sub('', s)
+    if not cleaned or cleaned in ('-', '.'):
+        return None
+    try:
+        num = float(cleaned)
+    except ValueError:
+        return None
+    return -abs(num) if negative else num
+
+def parse_amounts(text: str, decimal_only: bool = False):
     amounts = []
-    for m in AMOUNT_RE.finditer(text):
-        s = m.group(1).replace(',', '')
+    for m in (MONEY_RE if decimal_only else AMOUNT_RE).finditer(text):
+        # MONEY_RE only matches a two-digit fraction, so there a comma is the decimal mark
+        s = m.group(1).replace(',', '.' if decimal_only else '')
         try:
             val = float(s)
             amounts.append(val)
@@ -38,15 +180,99 @@ def parse_amounts(text: str):
     unique = sorted(set(amounts), reverse=True)
     return unique
 
-def parse_dates(text: str):
+# -----------------------
+# Date recognition
+# -----------------------
+_MONTHS = {'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+           'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12}
+# factored by 3-letter prefix so the engine never backtracks through 20 alternatives
+_MON = (r'(?P<mon>jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?'
+        r'|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)(?![a-z])\.?')
+_TIME = r'(?:(?:T|,?\s+)(?P<H>\d{1,2}):(?P<M>\d{2})(?::(?P<S>\d{2}))?\s*(?P<ampm>[ap]\.?m\.?)?)?'
+_YEAR = r'(?P<y>(?:19|20)\d{2}|\d{2})'
+
+# tried in order; the leftmost valid match in a line wins
+DATE_PATTERNS = [re.compile(p, re.IGNORECASE) for p in (
+    # 2024-03-15, 2024/3/15, 2024.03.15 (+ time)
+    r'(?<![\d.])(?P<y>(?:19|20)\d{2})[-/.](?P<m>\d{1,2})[-/.](?P<d>\d{1,2})(?![\d])' + _TIME,
+    # 15/03/2024, 03-15-24, 15.03.2024 (+ time); day/month order resolved below
+    r'(?<![\d.])(?P<a>\d{1,2})[-/.](?P<b>\d{1,2})[-/.]' + _YEAR + r'(?![\d])' + _TIME,
+    # 15 Mar 2024, 15-Mar-24, 15th March, 2024
+    r'(?<![\d])(?P<d>\d{1,2})(?:st|nd|rd|th)?[\s\-/.]*' + _MON + r'(?:[\s\-/.,]*' + _YEAR + r'(?![\d]))?' + _TIME,
+    # Mar 15, 2024 / March 15th 2024 / Mar-15-24
+    r'(?<![a-z])' + _MON + r'[\s\-/.]*(?P<d>\d{1,2})(?:st|nd|rd|th)?(?![\d])(?:[\s\-/.,]*' + _YEAR + r'(?![\d]))?' + _TIME,
+)]
+_HAS_DIGIT_RE = re.compile(r'\d')
+# lines that plainly mention a date; only these are worth the dateutil fallback
+_DATE_HINT_RE = re.compile(r'\d{1,4}[-/.]\d{1,2}[-/.](?:\d{4}|\d{2})(?!\d)|(?<![a-z])' + _MON, re.IGNORECASE)
+
+
+def _year(value: str, default_year: int) -> int:
+    if not value:
+        return default_year
+    y = int(value)
+    return y if y >= 100 else (2000 + y if y < 70 else 1900 + y)
+
+
+def _match_to_datetime(m: 're.Match', dayfirst: bool, default_year: int):
+    g = m.groupdict()
+    if g.get('mon'):
+        month, day = _MONTHS[g['mon'][:3].lower()], int(g['d'])
+    elif g.get('a'):
+        a, b = int(g['a']), int(g['b'])
+        # unambiguous when one side cannot be a month
+        if a > 12 or (dayfirst and b <= 12):
+            day, month = a, b
+        else:
+            month, day = a, b
+    else:
+        month, day = int(g['m']), int(g['d'])
+    hour = int(g['H']) if g.get('H') else 0
+    if g.get('ampm'):
+        pm = g['ampm'].lower().startswith('p')
+        hour = hour % 12 + (12 if pm else 0)
+    return datetime(_year(g.get('y'), default_year), month, day, hour,
+                    int(g['M']) if g.get('M') else 0, int(g['S']) if g.get('S') else 0)
+
+
+def find_date(text: str, dayfirst: bool = False, default_year: Optional[int] = None) -> Optional[datetime]:
+    """
+    First date in a line of text (receipt line, table cell), or None.
+    Handles ISO, numeric d/m/y or m/d/y (dayfirst breaks ties), and named months
+    with or without a year (missing year -> default_year, the current year by default).
+    dateutil is only consulted for lines that look like dates but match no pattern.
+    """
+    if not text or not _HAS_DIGIT_RE.search(text):
+        return None
+    default_year = default_year or datetime.now().year
+    best = None
+    for pattern in DATE_PATTERNS:
+        for m in pattern.finditer(text):
+            if best is not None and m.start() >= best[0]:
+                break
+            try:
+                best = (m.start(), _match_to_datetime(m, dayfirst, default_year))
+                break
+            except ValueError:  # e.g. 31/02 or 13/13
+                continue
+    if best is not None:
+        return best[1]
+    if _DATE_HINT_RE.search(text):
+        try:
+            return dateparser.parse(text, fuzzy=True, dayfirst=dayfirst,
+                                    default=datetime(default_year, 1, 1))
+        except (ValueError, OverflowError):
+            return None
+    return None
+
+
+def parse_dates(text: str, dayfirst: bool = False):
+    """Dates found in text, at most one per line, in line order."""
     dates = []
     for line in text.splitlines():
-        try:
-            dt = dateparser.parse(line, fuzzy=True, dayfirst=False)
-            if dt:
-                dates.append(dt)
-        except Exception:
-            continue
+        dt = find_date(line, dayfirst=dayfirst)
+        if dt:
+            dates.append(dt)
     return dates
 
 def auto_parse_transactions(text: str):
@@ -57,34 +283,279 @@ def auto_parse_transactions(text: str):
         parsed.append({'type':'expense','amount':a,'category':'receipt','note':'Parsed from OCR','date': dates[0].isoformat() if dates else None})
     return parsed
 
-def parse_pdf_table(file_bytes: bytes):
+# -----------------------
+# Statement tables
+# -----------------------
+# header keywords per column role, checked in this order (so 'Dr/Cr' is a type
+# column, not a debit column, and 'Withdrawal Amt' is a debit, not an amount)
+COLUMN_HEADERS = (
+    ('type', ('dr/cr', 'cr/dr', 'type')),
+    ('balance', ('balance', 'bal')),
+    ('debit', ('debit', 'debits', 'withdrawal', 'withdrawals', 'paid out', 'dr')),
+    ('credit', ('credit', 'credits', 'deposit', 'deposits', 'paid in', 'cr')),
+    ('date', ('date', 'dt')),
+    ('amount', ('amount', 'amt')),
+    ('description', ('description', 'narration', 'particulars', 'details', 'remarks', 'memo', 'payee')),
+)
+TABLE_SAMPLE_ROWS = 20
+MIN_STATEMENT_PAGES_PER_TASK = 5  # smaller statements are not worth splitting across workers
+# a cell that is just a money amount ('1,234.50', '(12.00)', '₹ 40.00 Dr'); reference
+# numbers and narrations with digits in them do not qualify
+_MONEY_CELL_RE = re.compile(r'^\(?[-+]?\s*(?:rs\.?|inr|usd|eur|[₹$€£])?\s*[-+]?[\d,]*\d\.\d{1,2}\)?\s*(?:dr|cr)?\.?$',
+                            re.IGNORECASE)
+_HEADER_CLEAN_RE = re.compile(r'[^a-z0-9/]+')
+
+
+def _header_role(cell: Optional[str]) -> Optional[str]:
+    text = ' ' + _HEADER_CLEAN_RE.sub(' ', (cell or '').lower()).strip() + ' '
+    for role, words in COLUMN_HEADERS:
+        if any(' ' + w + ' ' in text for w in words):
+            return role
+    return None
+
+
+def _is_header_row(row: list) -> bool:
+    cells = [c for c in row if c and c.strip()]
+    return (bool(cells) and any(_header_role(c) for c in cells)
+            and not any(_MONEY_CELL_RE.match(c.strip()) or find_date(c) for c in cells))
+
+
+def _share(cells: list, test) -> float:
+    filled = [c for c in cells if c and c.strip()]
+    return sum(1 for c in filled if test(c)) / len(filled) if filled else 0.0
+
+
+def classify_columns(header: Optional[list], sample: list) -> dict:
+    """
+    Map column roles (date, debit, credit, amount, balance, type, description) to
+    column indexes, from the header where it names them and otherwise from the
+    values in a sample of rows.
+    """
+    width = max([len(header or [])] + [len(r) for r in sample])
+    roles: dict = {}
+    for i, cell in enumerate(header or []):
+        role = _header_role(cell)
+        if role and role not in roles:
+            roles[role] = i
+    taken = set(roles.values())
+    text_cols = []
+    for i in range(width):
+        if i in taken:
+            continue
+        cells = [r[i] if i < len(r) else None for r in sample]
+        if 'date' not in roles and _share(cells, find_date) >= 0.6:
+            roles['date'] = i
+        elif _share(cells, lambda c: _MONEY_CELL_RE.match(c.strip())) >= 0.6:
+            if not {'amount', 'debit', 'credit'} & roles.keys():
+                roles['amount'] = i
+            elif 'balance' not in roles:
+                roles['balance'] = i
+        else:
+            text_cols.append((sum(len(c or '') for c in cells), i))
+    if 'description' not in roles and text_cols:
+        roles['description'] = max(text_cols)[1]
+    return roles
+
+
+def _infer_dayfirst(cells: list) -> Optional[bool]:
+    """
+    Column-wide day/month order: a numeric date with a first part > 12 means day-first,
+    a second part > 12 month-first. None if every date in the column is ambiguous.
+    """
+    numeric = DATE_PATTERNS[1]
+    for c in cells:
+        m = c and numeric.search(c)
+        if m:
+            if int(m['a']) > 12:
+                return True
+            if int(m['b']) > 12:
+                return False
+    return None
+
+
+def _tx_type(declared: Optional[str]) -> Optional[str]:
+    d = (declared or '').strip().lower()
+    if d in ('dr', 'debit', 'd', 'withdrawal'):
+        return 'expense'
+    if d in ('cr', 'credit', 'c', 'deposit'):
+        return 'income'
+    return None
+
+
+def _convert_table(body: list, roles: dict, state: dict) -> list:
+    """
+    Convert a table body column by column, then assemble rows. state carries the
+    previous row, running balance and date order across pages of the same statement.
+    """
+    def column(role):
+        i = roles.get(role)
+        return [r[i] if i is not None and i < len(r) else None for r in body]
+
+    date_cells = column('date')
+    dayfirst = _infer_dayfirst(date_cells)
+    if dayfirst is None:
+        # a page of ambiguous dates follows what earlier pages showed
+        dayfirst = state.get('dayfirst', False)
+    else:
+        state['dayfirst'] = dayfirst
+    dates = [find_date(c, dayfirst=dayfirst) if c else None for c in date_cells]
+    debits = [parse_amount(c) for c in column('debit')]
+    credits = [parse_amount(c) for c in column('credit')]
+    amounts = [parse_amount(c) for c in column('amount')]
+    balances = [parse_amount(c) for c in column('balance')]
+    declared = [_tx_type(c) for c in column('type')]
+    notes = [' '.join(c.split()) if c else '' for c in column('description')]
+    # a single amount column with negatives is signed; without, the sign comes from
+    # the type column or the running balance
+    signed = any(a is not None and a < 0 for a in amounts)
+
+    rows = []
+    for date, debit, credit, amount, balance, typ, note in zip(dates, debits, credits, amounts, balances, declared, notes):
+        if debit:
+            amount, typ = abs(debit), 'expense'
+        elif credit:
+            amount, typ = abs(credit), 'income'
+        elif amount is not None:
+            if typ is None:
+                if signed:
+                    typ = 'expense' if amount < 0 else 'income'
+                elif balance is not None and state.get('balance') is not None:
+                    typ = 'expense' if balance < state['balance'] else 'income'
+                else:
+                    typ = 'expense'
+            amount = abs(amount)
+        if balance is not None:
+            state['balance'] = balance
+        if not amount:
+            # wrapped narration: a line with text only continues the previous row
+            if note and date is None and state.get('last') is not None:
+                state['last']['note'] = (state['last']['note'] + ' ' + note).strip()
+            continue
+        row = {'amount': amount, 'date': date.isoformat() if date else None, 'note': note, 'type': typ}
+        rows.append(row)
+        state['last'] = row
+    return rows
+
+
+def rows_from_tables(tables: list) -> list:
+    """
+    Transactions from the tables of a statement, in order. Columns are classified once
+    and reused while later pages repeat the same header (or carry none at all).
+    """
     rows = []
+    layout = None  # (normalized header, roles, width)
+    state: dict = {}
+    for table in tables:
+        table = [r for r in table if r and any(c and c.strip() for c in r)]
+        if not table:
+            continue
+        if _is_header_row(table[0]):
+            key = tuple(' '.join((c or '').lower().split()) for c in table[0])
+            body = table[1:]
+            if layout is None or layout[0] != key:
+                layout = (key, classify_columns(table[0], body[:TABLE_SAMPLE_ROWS]), len(table[0]))
+        elif layout is None or len(table[0]) != layout[2]:
+            body = table
+            layout = ((), classify_columns(None, body[:TABLE_SAMPLE_ROWS]), len(table[0]))
+        else:
+            body = table
+        # some exports repeat the header inside the table body as well
+        body = [r for r in body if tuple(' '.join((c or '').lower().split()) for c in r) != layout[0]]
+        rows.extend(_convert_table(body, layout[1], state))
+    return rows
+
+
+def _cell_text(chars: list) -> str:
+    """Characters of one cell -> text, lines top to bottom, a space where words are apart."""
+    chars.sort(key=lambda c: (c['top'], c['x0']))
+    lines, line = [], [chars[0]]
+    for ch in chars[1:]:
+        if ch['top'] - line[0]['top'] > 3:
+            lines.append(line)
+            line = [ch]
+        else:
+            line.append(ch)
+    lines.append(line)
+    out = []
+    for line in lines:
+        line.sort(key=lambda c: c['x0'])
+        text = line[0]['text']
+        for prev, ch in zip(line, line[1:]):
+            if ch['x0'] - prev['x1'] > 1.5 and ch['text'] != ' ' and prev['text'] != ' ':
+                text += ' '
+            text += ch['text']
+        out.append(text.strip())
+    return '\n'.join(out)
+
+
+def page_table(page) -> Optional[list]:
+    """
+    The largest ruled table on a pdfplumber page as rows of cell strings, like
+    page.extract_table(), but each character is placed into its cell with one
+    bisect instead of every cell scanning every character on the page.
+    """
+    tables = page.find_tables()
+    if not tables:
+        return None
+    table = max(tables, key=lambda t: len(t.cells))
+    xs = sorted({x for c in table.cells for x in (c[0], c[2])})
+    ys = sorted({y for c in table.cells for y in (c[1], c[3])})
+    grid: dict = {}
+    for ch in page.chars:
+        cx, cy = (ch['x0'] + ch['x1']) / 2, (ch['top'] + ch['bottom']) / 2
+        if xs[0] <= cx < xs[-1] and ys[0] <= cy < ys[-1]:
+            grid.setdefault((bisect_right(ys, cy) - 1, bisect_right(xs, cx) - 1), []).append(ch)
+    rows = []
+    for r in range(len(ys) - 1):
+        row = [_cell_text(grid[(r, c)]) if (r, c) in grid else '' for c in range(len(xs) - 1)]
+        if any(row):
+            rows.append(row)
+    return rows
+
+
+def pdf_page_count(source: Source) -> int:
+    with pdfplumber.open(_as_file(source)) as pdf:
+        return len(pdf.pages)
+
+
+def extract_pdf_tables(source: Source, first: int = 0, last: Optional[int] = None) -> list:
+    """The main table on each page in [first, last) of a PDF, as lists of cell strings."""
+    tables = []
+    with pdfplumber.open(_as_file(source)) as pdf:
+        for page in pdf.pages[first:last]:
+            table = page_table(page)
+            if table:
+                tables.append(table)
+            page.flush_cache()
+    return tables
+
+
+def parse_pdf_table(source: Source):
+    """Statement PDF -> [{amount, date, note, type}]. Runs inside the document worker pool."""
     try:
-        with pdfplumber.open(io.BytesIO(file_bytes)) as pdf:
-            for page in pdf.pages:
-                table = page.extract_table()
-                if not table:
-                    continue
-                headers = table[0]
-                for r in table[1:]:
-                    row = dict(zip(headers, r))
-                    amount = None; date=None; desc=''
-                    for v in r:
-                        if not v: continue
-                        am = re.search(r'([0-9]+[.,][0-9]{2})', v)
-                        if am and amount is None:
-                            amount = float(am.group(1).replace(',',''))
-                        try:
-                            dt = dateparser.parse(v, fuzzy=True)
-                            if date is None:
-                                date = dt.isoformat()
-                        except Exception:
-                            pass
-                        desc += (v+' ')
-                    rows.append({'amount': amount, 'date': date, 'note': desc.strip()})
+        return rows_from_tables(extract_pdf_tables(source))
     except Exception:
-        pass
-    return rows
+        return []
+
+
+async def parse_statement(source: Source, workers: int = DOC_WORKERS):
+    """
+    parse_pdf_table for large statements: page ranges are extracted in parallel
+    across the worker pool, then the tables are classified and converted in order.
+    Raises DocumentError if the PDF cannot be parsed.
+    """
+    try:
+        with timed_stage('statement_extract'):
+            count = await run_in_pool(pdf_page_count, source)
+            step = max(MIN_STATEMENT_PAGES_PER_TASK, -(-count // max(1, workers)))
+            parts = await asyncio.gather(*(run_in_pool(extract_pdf_tables, source, first, first + step)
+                                           for first in range(0, count, step)))
+        with timed_stage('statement_convert'):
+            return await run_in_pool(rows_from_tables, [t for part in parts for t in part])
+    except WorkerTimeout:
+        raise
+    except Exception as e:
+        raise DocumentError(f'could not parse statement: {e}') from e
 
 
 def parse_pos_receipt(text: str):
@@ -128,3 +599,44 @@ def parse_pos_receipt(text: str):
         "note": "POS receipt auto",
         "date": None
     }
+
+
+def _fast_total(amounts: List[float]) -> float:
+    """
+    The receipt total from its money amounts in print order. Usually the largest,
+    unless the largest is the sum of two others of which one is printed after it:
+    then it is cash tendered (total before it, change after) or a pre-discount sum
+    (discount and net total after it), and the total is the earlier / last addend.
+    """
+    top = max(amounts)
+    k = amounts.index(top)
+    for i, a in enumerate(amounts):
+        for j in range(i + 1, len(amounts)):
+            b = amounts[j]
+            if i != k and j != k and j > k and a > 0 and b > 0 and abs(a + b - top) < 0.005:
+                return a if i < k else b
+    return top
+
+
+def parse_fast_receipt(text: str):
+    """
+    Total and date from fast-mode OCR text (tesseract_config(fast=True): digits,
+    separators and currency signs only). No words survive that whitelist, so there
+    is no "total" line to find and no largest-number fallback over years and ids:
+    the total comes from the amounts with cents on lines that hold no date
+    (_fast_total), and the date is the first one found. Dates written with month
+    names cannot be read in this mode. Returns a dict like parse_pos_receipt, or None.
+    """
+    if not text:
+        return None
+    amounts, date = [], None
+    for line in text.splitlines():
+        found = find_date(line)
+        if found:
+            date = date or found
+            continue
+        amounts.extend(parse_amounts(_THOUSANDS_RE.sub('', line), decimal_only=True))
+    if not amounts:
+        return None
+    return {'amount': _fast_total(amounts), 'type': 'expense', 'category': 'Misc', 'note': 'POS receipt auto',
+            'date': date}
@@ -0,0 +1,87 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, Callable, Optional
+
+# --- Configuration ---
+DOC_WORKERS = int(os.getenv('DOC_WORKERS', str(min(4, os.cpu_count() or 1))))
+DOC_TASK_TIMEOUT = float(os.getenv('DOC_TASK_TIMEOUT', '60'))
+
+_pool: Optional[ProcessPoolExecutor] = None
+# one slot per worker process: a task is only handed to the pool once a worker is free
+_slots: Optional[asyncio.Semaphore] = None
+_slots_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+class WorkerTimeout(Exception):
+    """Raised when a document task does not finish within its timeout."""
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """
+    Return the shared process pool used for CPU-bound document work
+    (OCR, PDF rasterizing/parsing). Created lazily with a bounded worker count.
+    """
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=max(1, DOC_WORKERS))
+    return _pool
+
+
+def _get_slots() -> asyncio.Semaphore:
+    global _slots, _slots_loop
+    loop = asyncio.get_running_loop()
+    if _slots is None or _slots_loop is not loop:
+        _slots, _slots_loop = asyncio.Semaphore(max(1, DOC_WORKERS)), loop
+    return _slots
+
+
+def _kill(pool: ProcessPoolExecutor):
+    """Terminate a pool's worker processes, including any stuck in a task, and stop handing it work."""
+    global _pool
+    if _pool is pool:
+        _pool = None
+    for proc in list((getattr(pool, '_processes', None) or {}).values()):
+        proc.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def run_in_pool(fn: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+    """
+    Run fn(*args, **kwargs) in the document worker pool without blocking the event loop.
+    fn must be a module-level (picklable) function. Raises WorkerTimeout if the task
+    runs longer than `timeout` seconds (defaults to DOC_TASK_TIMEOUT).
+
+    Callers wait here, in FIFO order, until a worker is free and only then submit, so
+    the timeout measures running time, not time queued behind other tasks. A worker
+    cannot be interrupted mid-task, so a timed-out task's pool is killed at once
+    (freeing the CPU and the worker) and replaced; tasks that were running next to it
+    are resubmitted to the new pool. Only one pool exists at a time.
+    """
+    async with _get_slots():
+        retried = False
+        while True:
+            pool = get_pool()
+            fut = asyncio.get_running_loop().run_in_executor(pool, partial(fn, *args, **kwargs))
+            try:
+                return await asyncio.wait_for(fut, timeout=timeout or DOC_TASK_TIMEOUT)
+            except asyncio.TimeoutError:
+                _kill(pool)
+                raise WorkerTimeout(f'{getattr(fn, "__name__", "task")} timed out')
+            except BrokenProcessPool:
+                # killed over another task's timeout, or a worker crashed: run once more on a fresh pool
+                _kill(pool)
+                if retried:
+                    raise
+                retried = True
+
+
+def shutdown_pool(wait: bool = True):
+    """Stop the worker pool; pending tasks that have not started are cancelled."""
+    global _pool, _slots, _slots_loop
+    if _pool is not None:
+        _pool.shutdown(wait=wait, cancel_futures=True)
+        _pool = None
+    _slots = _slots_loop = None
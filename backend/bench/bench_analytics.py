@@ -0,0 +1,102 @@
+"""
+Analytics engine: vectorized metrics over TxColumns vs a pure-Python loop over dicts.
+
+    cd backend
+    python -m bench.bench_analytics [--sizes 10000 100000 1000000] [--repeat 5]
+
+For each size, synthetic transactions (3 years, 40 categories, 20% income) are
+built as the dicts Mongo would return. Reported per size:
+  build   - ColumnBuilder over the dicts (the one-off cost of a cache miss, minus I/O)
+  numpy   - analytics.summarize() on the cached columns (every cache hit)
+  window  - summarize() over a 30-day window (binary-search slice)
+  python  - the same totals / categories / daily / monthly / percentiles in plain Python
+No database needed.
+"""
+import argparse
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from app.analytics import ColumnBuilder, summarize
+
+
+def make_docs(n: int, seed: int = 1):
+    rnd = random.Random(seed)
+    start = datetime(2022, 1, 1)
+    span = 3 * 365 * 86400
+    cats = [f'category-{i}' for i in range(40)]
+    docs = []
+    for _ in range(n):
+        income = rnd.random() < 0.2
+        docs.append({'date': start + timedelta(seconds=rnd.randrange(span)),
+                     'amount': round(rnd.uniform(100, 50000) if income else rnd.lognormvariate(5, 1), 2),
+                     'type': 'income' if income else 'expense', 'category': rnd.choice(cats)})
+    return docs
+
+
+def python_summary(docs, window_days: int = 7):
+    """What a dict-at-a-time implementation of summarize() does."""
+    income = expense = 0.0
+    by_cat = defaultdict(float)
+    daily = defaultdict(float)
+    months = defaultdict(lambda: [0.0, 0.0])
+    expenses = []
+    for d in docs:
+        amt = d['amount']
+        if d['type'] == 'income':
+            income += amt
+            months[d['date'].strftime('%Y-%m')][0] += amt
+        else:
+            expense += amt
+            by_cat[d['category']] += amt
+            daily[d['date'].date()] += amt
+            months[d['date'].strftime('%Y-%m')][1] += amt
+            expenses.append(amt)
+    top = sorted(by_cat.items(), key=lambda kv: -kv[1])[:10]
+    days = sorted(daily)
+    series, run = [], []
+    day = days[0]
+    while day <= days[-1]:
+        run.append(daily.get(day, 0.0))
+        series.append(sum(run[-window_days:]) / min(len(run), window_days))
+        day += timedelta(days=1)
+    expenses.sort()
+    pcts = {q: expenses[min(len(expenses) - 1, int(q / 100 * len(expenses)))] for q in (50, 75, 90, 95, 99)}
+    return income, expense, top, series, dict(months), pcts
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(sizes, repeat: int):
+    print(f'{"rows":>9} {"build (s)":>10} {"numpy (ms)":>11} {"window (ms)":>12} {"python (ms)":>12} {"speedup":>8}')
+    for n in sizes:
+        docs = make_docs(n)
+        t0 = time.perf_counter()
+        builder = ColumnBuilder()
+        for d in docs:
+            builder.add(d)
+        cols = builder.build()
+        build = time.perf_counter() - t0
+        last = datetime.utcfromtimestamp(int(cols.dates[-1]))
+        # bound as defaults so the del below (freeing this size before the next) leaves no free names
+        vec = best_of(lambda cols=cols: summarize(cols), repeat)
+        win = best_of(lambda cols=cols: summarize(cols, start=last - timedelta(days=30), end=last), repeat)
+        py = best_of(lambda docs=docs: python_summary(docs), max(1, repeat // 2))
+        print(f'{n:9d} {build:10.3f} {vec * 1000:11.2f} {win * 1000:12.2f} {py * 1000:12.1f} {py / vec:7.1f}x')
+        del docs, cols, builder
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    ap.add_argument('--repeat', type=int, default=5)
+    args = ap.parse_args()
+    main(args.sizes, args.repeat)
@@ -0,0 +1,53 @@
+"""
+Statement import throughput: per-row create_transaction vs create_transactions_bulk.
+
+    cd backend
+    DB_NAME=pfa_bench python -m bench.bench_bulk_insert --rows 2000
+
+Needs a running mongod. Rows are written for a throwaway user id and removed afterwards.
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from app import crud
+
+
+def make_rows(n: int):
+    base = datetime(2024, 1, 1)
+    return [{'type': 'expense', 'amount': round(random.uniform(1, 500), 2), 'category': 'history',
+             'note': f'row {i}', 'date': (base + timedelta(minutes=i)).isoformat()} for i in range(n)]
+
+
+async def main(n: int):
+    rows = make_rows(n)
+    user_id = ObjectId()
+    col = crud.get_db()[crud.TRAN_COL]
+    try:
+        t0 = time.perf_counter()
+        for r in rows:
+            await crud.create_transaction(user_id, r)
+        per_row = time.perf_counter() - t0
+        await col.delete_many({'user_id': user_id})
+
+        t0 = time.perf_counter()
+        result = await crud.create_transactions_bulk(user_id, rows)
+        bulk = time.perf_counter() - t0
+    finally:
+        await col.delete_many({'user_id': user_id})
+
+    print(f'rows: {n}')
+    print(f'per-row create_transaction : {per_row:8.3f}s  {n / per_row:10.0f} rows/sec')
+    print(f'create_transactions_bulk    : {bulk:8.3f}s  {n / bulk:10.0f} rows/sec  '
+          f'({len(result["errors"])} errors)')
+    print(f'speedup: {per_row / bulk:.1f}x')
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--rows', type=int, default=2000)
+    asyncio.run(main(ap.parse_args().rows))
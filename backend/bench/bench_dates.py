@@ -0,0 +1,75 @@
+"""
+Date extraction: utils.find_date vs the previous per-line fuzzy dateutil parse.
+
+    cd backend
+    python -m bench.bench_dates [--lines 20000] [--show-misses]
+
+Accuracy is measured against the golden corpus in bench/corpus/dates.json
+(expected date or null per OCR'd line); throughput by parsing the corpus lines
+repeated up to --lines. No database or OCR engine needed.
+"""
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+
+from dateutil import parser as dateparser
+
+from app.utils import find_date
+
+CORPUS = os.path.join(os.path.dirname(__file__), 'corpus', 'dates.json')
+
+
+def legacy_find_date(line: str, dayfirst: bool = False, default_year: int = None):
+    """What parse_dates did per line before: fuzzy dateutil on the whole line."""
+    try:
+        default = datetime(default_year, 1, 1) if default_year else None
+        return dateparser.parse(line, fuzzy=True, dayfirst=dayfirst, default=default)
+    except Exception:
+        return None
+
+
+def accuracy(fn, cases, default_year: int, show_misses: bool):
+    hits = 0
+    false_dates = 0
+    for c in cases:
+        got = fn(c['text'], dayfirst=c.get('dayfirst', False), default_year=default_year)
+        got = got.date().isoformat() if got else None
+        if got == c['expected']:
+            hits += 1
+        else:
+            false_dates += c['expected'] is None
+            if show_misses:
+                print(f'    miss: {c["text"]!r:48} expected {c["expected"]}, got {got}')
+    return hits, false_dates
+
+
+def throughput(fn, lines, default_year: int) -> float:
+    t0 = time.perf_counter()
+    for line in lines:
+        fn(line, default_year=default_year)
+    return len(lines) / (time.perf_counter() - t0)
+
+
+def main(n_lines: int, show_misses: bool):
+    with open(CORPUS) as f:
+        corpus = json.load(f)
+    cases, year = corpus['cases'], corpus['default_year']
+    texts = [c['text'] for c in cases]
+    lines = (texts * (n_lines // len(texts) + 1))[:n_lines]
+    print(f'corpus: {len(cases)} lines ({sum(c["expected"] is None for c in cases)} without a date); '
+          f'throughput over {n_lines} lines\n')
+    for name, fn in (('dateutil fuzzy (old)', legacy_find_date), ('find_date (new)', find_date)):
+        hits, false_dates = accuracy(fn, cases, year, show_misses)
+        rate = throughput(fn, lines, year)
+        print(f'{name:22} accuracy {hits:3}/{len(cases)} ({hits / len(cases):6.1%})  '
+              f'false dates {false_dates:3}  {rate:10.0f} lines/sec')
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--lines', type=int, default=20000)
+    ap.add_argument('--show-misses', action='store_true')
+    args = ap.parse_args()
+    main(args.lines, args.show_misses)
@@ -0,0 +1,75 @@
+"""
+Streaming export memory check: seed a large history and export it through the API
+while tracking peak RSS.
+
+    cd backend
+    DB_NAME=pfa_bench python -m bench.bench_export --rows 1000000 --max-rss-mb 300 [--format ndjson] [--gzip]
+
+Exits non-zero if peak RSS grows by more than --max-rss-mb during the export.
+Needs a running mongod; seeded rows are removed afterwards.
+"""
+import argparse
+import asyncio
+import random
+import resource
+import sys
+import time
+from datetime import datetime, timedelta
+
+import httpx
+from bson import ObjectId
+
+from app import auth, crud
+from app.main import app
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def seed(user_id: ObjectId, rows: int):
+    base = datetime(2015, 1, 1)
+    col = crud.get_db()[crud.TRAN_COL]
+    for start in range(0, rows, 10000):
+        docs = [{'user_id': user_id, 'type': random.choice(['expense', 'income']), 'category': 'Misc',
+                 'amount': round(random.uniform(1, 900), 2), 'note': 'seeded row',
+                 'date': base + timedelta(minutes=random.randint(0, 10 * 365 * 24 * 60)), 'created_at': base}
+                for _ in range(min(10000, rows - start))]
+        await col.insert_many(docs, ordered=False)
+
+
+async def main(args) -> int:
+    user_id = ObjectId()
+    await crud.ensure_indexes()
+    await seed(user_id, args.rows)
+    token = auth.create_access_token({'user_id': str(user_id), 'email': 'export@example.com'})
+    try:
+        rss_before = peak_rss_mb()
+        received = 0
+        t0 = time.perf_counter()
+        async with httpx.AsyncClient(app=app, base_url='http://bench', timeout=None) as client:
+            params = {'format': args.format, 'gzip': str(args.gzip).lower()}
+            async with client.stream('GET', '/api/transactions/export', params=params,
+                                     headers={'Authorization': f'Bearer {token}'}) as resp:
+                resp.raise_for_status()
+                async for chunk in resp.aiter_raw():
+                    received += len(chunk)
+        elapsed = time.perf_counter() - t0
+        growth = peak_rss_mb() - rss_before
+    finally:
+        await crud.get_db()[crud.TRAN_COL].delete_many({'user_id': user_id})
+
+    print(f'exported {args.rows} rows as {args.format}{" (gzip)" if args.gzip else ""}: '
+          f'{received / 1e6:.1f} MB in {elapsed:.1f}s ({args.rows / elapsed:.0f} rows/s)')
+    print(f'peak RSS growth during export: {growth:.1f} MB (ceiling {args.max_rss_mb} MB)')
+    return 0 if growth <= args.max_rss_mb else 1
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--rows', type=int, default=1000000)
+    ap.add_argument('--format', choices=['csv', 'ndjson'], default='csv')
+    ap.add_argument('--gzip', action='store_true')
+    ap.add_argument('--max-rss-mb', type=float, default=300)
+    sys.exit(asyncio.run(main(ap.parse_args())))
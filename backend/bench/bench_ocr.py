@@ -0,0 +1,173 @@
+"""
+OCR preprocessing: current path vs prepare_for_ocr vs prepare_for_ocr + fast Tesseract config.
+
+    cd backend
+    python -m bench.bench_ocr --synthesize bench/ocr_samples   # write synthetic phone photos once
+    python -m bench.bench_ocr --samples bench/ocr_samples [--limit 10]
+
+A sample set is a directory of images (.jpg / .jpeg / .png). Each image may
+have a sidecar <name>.json with {"total": 643.66, "date": "2024-03-15",
+"text": "..."} holding what a reader takes from it; real receipt photos can be
+dropped in alongside the synthetic ones. --synthesize renders the receipts in
+bench/corpus/receipts.json as 12-megapixel "photos": large text, rotated a few
+degrees, on a darker table-top background, with blur, noise, uneven lighting
+and JPEG compression.
+
+For each mode the table shows mean preprocessing and Tesseract time per image,
+the pixels Tesseract saw, and accuracy: parse_pos_receipt total, parse_dates
+date and character similarity to the sidecar text (difflib ratio).
+  current  - image.convert('RGB') straight into Tesseract (the old path)
+  prep     - prepare_for_ocr (grayscale, deskew, crop, downsample, Otsu)
+  fast     - prep + tesseract_config(fast=True) (psm 6, character whitelist)
+Needs the tesseract binary; --synthesize and --prep-only do not.
+"""
+import argparse
+import difflib
+import glob
+import json
+import os
+import random
+import statistics
+import time
+
+import pytesseract
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+from app.imageprep import prepare_for_ocr, tesseract_config
+from app.utils import parse_dates, parse_pos_receipt
+
+RECEIPTS = os.path.join(os.path.dirname(__file__), 'corpus', 'receipts.json')
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png')
+PHOTO_SIZE = (3024, 4032)
+
+
+def render_photo(text: str, rnd: random.Random) -> Image.Image:
+    """A receipt 'photographed' on a table: rotated, blurred, unevenly lit, noisy."""
+    font = ImageFont.load_default()
+    lines = text.splitlines()
+    width = max(font.getbbox(line)[2] for line in lines) + 24
+    paper = Image.new('L', (width, 14 * len(lines) + 24), 250)
+    draw = ImageDraw.Draw(paper)
+    for i, line in enumerate(lines):
+        draw.text((12, 12 + 14 * i), line, fill=20, font=font)
+    zoom = min(PHOTO_SIZE[0] * 0.7 / paper.width, PHOTO_SIZE[1] * 0.8 / paper.height)
+    paper = paper.resize((int(paper.width * zoom), int(paper.height * zoom)), Image.NEAREST)
+    paper = paper.filter(ImageFilter.GaussianBlur(zoom / 4))
+    paper = paper.rotate(rnd.uniform(-6, 6), resample=Image.BILINEAR, expand=True, fillcolor=0)
+    mask = paper.point(lambda v: 255 if v > 0 else 0)
+
+    photo = Image.new('L', PHOTO_SIZE, rnd.randint(60, 110))
+    photo = Image.merge('RGB', [photo.point(lambda v, k=k: min(255, v + k)) for k in (10, 5, 0)])
+    x = (PHOTO_SIZE[0] - paper.width) // 2 + rnd.randint(-80, 80)
+    y = (PHOTO_SIZE[1] - paper.height) // 2 + rnd.randint(-80, 80)
+    photo.paste(Image.merge('RGB', [paper] * 3), (x, y), mask)
+    light = Image.linear_gradient('L').resize(PHOTO_SIZE).point(lambda v: 200 + v * 55 // 255)
+    photo = Image.composite(photo, Image.new('RGB', PHOTO_SIZE, 0), light)
+    noise = Image.effect_noise(PHOTO_SIZE, 12).convert('RGB')
+    return Image.blend(photo, noise, 0.08)
+
+
+def synthesize(directory: str, seed: int = 3):
+    with open(RECEIPTS, encoding='utf-8') as f:
+        cases = json.load(f)['cases']
+    rnd = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    for i, case in enumerate(cases):
+        name = os.path.join(directory, f'receipt_{i:02d}')
+        render_photo(case['text'], rnd).save(name + '.jpg', quality=85)
+        with open(name + '.json', 'w', encoding='utf-8') as f:
+            json.dump({'total': case['total'], 'date': case['date'], 'text': case['text']}, f, ensure_ascii=False)
+    print(f'wrote {len(cases)} samples to {directory}')
+
+
+def load_samples(directory: str, limit: int):
+    samples = []
+    for path in sorted(glob.glob(os.path.join(directory, '*'))):
+        if not path.lower().endswith(IMAGE_EXTS):
+            continue
+        truth = {}
+        sidecar = os.path.splitext(path)[0] + '.json'
+        if os.path.exists(sidecar):
+            with open(sidecar, encoding='utf-8') as f:
+                truth = json.load(f)
+        samples.append((path, truth))
+    return samples[:limit] if limit else samples
+
+
+def _normalized(text: str) -> str:
+    return ' '.join(text.split()).lower()
+
+
+def run_mode(mode: str, samples):
+    prep_ms, ocr_ms, pixels = [], [], []
+    totals = dates = texts = 0
+    similarity = []
+    for path, truth in samples:
+        with Image.open(path) as im:
+            t0 = time.perf_counter()
+            image = im.convert('RGB') if mode == 'current' else prepare_for_ocr(im)
+            t1 = time.perf_counter()
+            text = pytesseract.image_to_string(image, config=tesseract_config(mode == 'fast'))
+            t2 = time.perf_counter()
+        prep_ms.append((t1 - t0) * 1000)
+        ocr_ms.append((t2 - t1) * 1000)
+        pixels.append(image.width * image.height)
+        tx = parse_pos_receipt(text)
+        found = parse_dates(text)
+        if 'total' in truth:
+            totals += bool(tx) and round(tx['amount'], 2) == truth['total']
+        if 'date' in truth:
+            dates += bool(found) and found[0].date().isoformat() == truth['date']
+        if 'text' in truth:
+            texts += 1
+            similarity.append(difflib.SequenceMatcher(None, _normalized(text), _normalized(truth['text'])).ratio())
+    n = len(samples)
+    with_total = sum(1 for _, t in samples if 'total' in t) or 1
+    with_date = sum(1 for _, t in samples if 'date' in t) or 1
+    return {
+        'prep_ms': statistics.mean(prep_ms), 'ocr_ms': statistics.mean(ocr_ms), 'mpx': statistics.mean(pixels) / 1e6,
+        'total': totals / with_total, 'date': dates / with_date,
+        'chars': statistics.mean(similarity) if similarity else None, 'n': n,
+    }
+
+
+def prep_only(samples):
+    for path, _ in samples:
+        with Image.open(path) as im:
+            t0 = time.perf_counter()
+            out = prepare_for_ocr(im)
+            ms = (time.perf_counter() - t0) * 1000
+            print(f'{os.path.basename(path):24} {im.width}x{im.height} -> {out.width}x{out.height}  {ms:6.0f} ms')
+
+
+def main(args):
+    samples = load_samples(args.samples, args.limit)
+    if not samples:
+        raise SystemExit(f'no images in {args.samples} (create some with --synthesize {args.samples})')
+    if args.prep_only:
+        prep_only(samples)
+        return
+    print(f'{len(samples)} images from {args.samples}\n')
+    print(f'{"mode":8}{"prep ms":>9}{"ocr ms":>9}{"Mpx":>7}{"total ok":>10}{"date ok":>9}{"chars":>7}')
+    results = {}
+    for mode in ('current', 'prep', 'fast'):
+        r = results[mode] = run_mode(mode, samples)
+        chars = f'{r["chars"]:7.0%}' if r['chars'] is not None else f'{"-":>7}'
+        print(f'{mode:8}{r["prep_ms"]:9.0f}{r["ocr_ms"]:9.0f}{r["mpx"]:7.2f}{r["total"]:10.0%}{r["date"]:9.0%}{chars}')
+    base = results['current']['prep_ms'] + results['current']['ocr_ms']
+    for mode in ('prep', 'fast'):
+        r = results[mode]
+        print(f'{mode}: {base / (r["prep_ms"] + r["ocr_ms"]):.1f}x faster end to end than current')
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--samples', default=os.path.join(os.path.dirname(__file__), 'ocr_samples'))
+    ap.add_argument('--synthesize', metavar='DIR', help='write synthetic receipt photos to DIR and exit')
+    ap.add_argument('--limit', type=int, default=0)
+    ap.add_argument('--prep-only', action='store_true', help='time prepare_for_ocr alone (no tesseract needed)')
+    args = ap.parse_args()
+    if args.synthesize:
+        synthesize(args.synthesize)
+    else:
+        main(args)
@@ -0,0 +1,66 @@
+"""
+Deep-page cost: skip/limit pagination vs keyset (cursor) pagination.
+
+    cd backend
+    DB_NAME=pfa_bench python -m bench.bench_pagination --rows 100000 --page-size 20
+
+Seeds one throwaway user, then times page 1 and page rows/page_size with both
+modes (median of --repeat runs). Needs a running mongod; seeded rows are removed.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from app import crud
+
+
+async def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+async def main(args):
+    user_id = ObjectId()
+    col = crud.get_db()[crud.TRAN_COL]
+    await crud.ensure_indexes()
+    base = datetime(2020, 1, 1)
+    docs = [{'user_id': user_id, 'type': 'expense', 'category': 'Misc', 'amount': 1.0, 'note': '',
+             'date': base + timedelta(minutes=random.randint(0, 3 * 365 * 24 * 60)), 'created_at': base}
+            for _ in range(args.rows)]
+    await col.insert_many(docs, ordered=False)
+    try:
+        ps = args.page_size
+        last_page = args.rows // ps
+        # cursor positioned at the end of page last_page - 1 (fetched once, not timed)
+        prev = await crud.get_transactions(user_id, skip=(last_page - 1) * ps - 1, limit=1)
+        deep_after = (prev[0]['date'], ObjectId(prev[0]['id']))
+
+        results = {
+            'offset page 1': await timed(lambda: crud.get_transactions(user_id, skip=0, limit=ps), args.repeat),
+            f'offset page {last_page}': await timed(
+                lambda: crud.get_transactions(user_id, skip=(last_page - 1) * ps, limit=ps), args.repeat),
+            'cursor page 1': await timed(lambda: crud.get_transactions(user_id, limit=ps), args.repeat),
+            f'cursor page {last_page}': await timed(
+                lambda: crud.get_transactions(user_id, limit=ps, after=deep_after), args.repeat),
+        }
+        for name, ms in results.items():
+            print(f'{name:24} {ms:8.2f} ms')
+    finally:
+        await col.delete_many({'user_id': user_id})
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--rows', type=int, default=100000)
+    ap.add_argument('--page-size', type=int, default=20)
+    ap.add_argument('--repeat', type=int, default=20)
+    asyncio.run(main(ap.parse_args()))
@@ -0,0 +1,311 @@
+"""
+Receipt / statement parsers: throughput, allocations and accuracy against a checked-in corpus.
+
+    cd backend
+    python -m bench.bench_parsers [--min-time 0.5] [--show-misses]
+    python -m bench.bench_parsers --check        # exit 1 if any accuracy fell below bench/corpus/parser_accuracy.json
+    python -m bench.bench_parsers --record       # accept the current accuracy as the new floor
+    python -m bench.bench_parsers --regenerate   # rebuild bench/corpus/documents/ with bench.pdfgen
+
+Corpus:
+  bench/corpus/receipts.json    OCR'd receipt and POS-slip text with the total,
+                                date and money amounts a reader takes from each
+  bench/corpus/documents/       small generated PDFs (text-layer receipts and
+                                multi-page statements in three column layouts)
+                                plus documents.json with their expected output
+
+Per function the table shows documents/s and input KiB/s (best of --min-time
+runs), the peak traced memory of one call and the memory blocks still
+allocated after it (what the result keeps alive), measured with tracemalloc,
+and accuracy:
+  parse_amounts            recall / precision of the printed money amounts
+  parse_dates              first date found == the receipt's date
+  auto_parse_transactions  some transaction carries the total and the date
+  parse_pos_receipt        amount == the total
+  parse_fast_receipt       amount == the total, date == the receipt's date, on the
+                           text reduced to the fast-mode OCR whitelist (month
+                           names cannot survive it, so those dates are misses)
+  parse_pdf_table          statement rows whose amount, date and type all match
+  pdf receipts             text layer -> parse_pos_receipt total and parse_dates date
+A faster parser is acceptable when --check still passes. No database or OCR engine needed.
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+from app.imageprep import OCR_FAST_WHITELIST
+from app.utils import (auto_parse_transactions, parse_amounts, parse_dates, parse_fast_receipt, parse_pdf_table,
+                       parse_pos_receipt, pdf_text_layers)
+from bench.pdfgen import statement_pdf, text_pdf
+
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), 'corpus')
+RECEIPTS = os.path.join(CORPUS_DIR, 'receipts.json')
+DOCUMENTS_DIR = os.path.join(CORPUS_DIR, 'documents')
+DOCUMENTS = os.path.join(DOCUMENTS_DIR, 'documents.json')
+ACCURACY = os.path.join(CORPUS_DIR, 'parser_accuracy.json')
+
+# receipts.json cases rendered into text-layer PDFs by --regenerate
+PDF_RECEIPTS = {'receipt_dmart.pdf': 0, 'pos_hdfc.pdf': 1, 'receipt_bombay_canteen.pdf': 8}
+STATEMENTS = {
+    'statement_split.pdf': {'layout': 'split', 'pages': 3, 'rows_per_page': 15, 'seed': 11},
+    'statement_drcr.pdf': {'layout': 'drcr', 'pages': 3, 'rows_per_page': 15, 'seed': 12},
+    'statement_signed.pdf': {'layout': 'signed', 'pages': 2, 'rows_per_page': 20, 'seed': 13},
+}
+
+
+def load(path: str):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def regenerate():
+    receipts = load(RECEIPTS)['cases']
+    os.makedirs(DOCUMENTS_DIR, exist_ok=True)
+    docs = []
+    for name, index in PDF_RECEIPTS.items():
+        case = receipts[index]
+        with open(os.path.join(DOCUMENTS_DIR, name), 'wb') as f:
+            f.write(text_pdf([case['text'].splitlines()]))
+        docs.append({'file': name, 'kind': 'receipt', 'total': case['total'], 'date': case['date']})
+    for name, spec in STATEMENTS.items():
+        pdf, expected = statement_pdf(**spec)
+        with open(os.path.join(DOCUMENTS_DIR, name), 'wb') as f:
+            f.write(pdf)
+        docs.append({'file': name, 'kind': 'statement', **spec, 'expected': expected})
+    with open(DOCUMENTS, 'w', encoding='utf-8') as f:
+        f.write('{\n "description": "Generated by python -m bench.bench_parsers --regenerate; expected output per PDF.",\n'
+                ' "documents": [\n')
+        f.write(',\n'.join('  ' + json.dumps(d) for d in docs))
+        f.write('\n ]\n}\n')
+    print(f'wrote {len(docs)} documents to {DOCUMENTS_DIR}')
+
+
+# -----------------------
+# Measurement
+# -----------------------
+def throughput(fn: Callable, inputs: List, min_time: float) -> float:
+    """Best inputs/second over passes of at least min_time in total."""
+    best = float('inf')
+    spent = 0.0
+    while spent < min_time or best == float('inf'):
+        t0 = time.perf_counter()
+        for x in inputs:
+            fn(x)
+        elapsed = time.perf_counter() - t0
+        best = min(best, elapsed)
+        spent += elapsed
+    return len(inputs) / best
+
+
+def allocations(fn: Callable, inputs: List) -> Dict[str, float]:
+    """Mean peak traced KiB per call and mean blocks still allocated after the call (held by the result)."""
+    peaks, blocks = [], []
+    gc.collect()
+    tracemalloc.start()
+    try:
+        for x in inputs:
+            tracemalloc.reset_peak()
+            before = tracemalloc.take_snapshot()
+            base, _ = tracemalloc.get_traced_memory()
+            result = fn(x)
+            _, peak = tracemalloc.get_traced_memory()
+            after = tracemalloc.take_snapshot()
+            peaks.append(max(0, peak - base) / 1024)
+            blocks.append(sum(s.count_diff for s in after.compare_to(before, 'filename')))
+            del result
+    finally:
+        tracemalloc.stop()
+    return {'peak_kib': sum(peaks) / len(peaks), 'blocks': sum(blocks) / len(blocks)}
+
+
+def _day(value) -> str:
+    if value is None:
+        return None
+    return value[:10] if isinstance(value, str) else value.date().isoformat()
+
+
+# -----------------------
+# Accuracy
+# -----------------------
+def amounts_accuracy(cases, misses):
+    found = expected = returned = 0
+    for c in cases:
+        got = set(round(a, 2) for a in parse_amounts(c['text']))
+        want = set(round(a, 2) for a in c['amounts'])
+        found += len(got & want)
+        expected += len(want)
+        returned += len(got)
+        if want - got:
+            misses.append(('parse_amounts', c['text'].splitlines()[0], f'missed {sorted(want - got)}'))
+    return {'parse_amounts.recall': found / expected, 'parse_amounts.precision': found / returned if returned else 0.0}
+
+
+def dates_accuracy(cases, misses):
+    hits = 0
+    for c in cases:
+        dates = parse_dates(c['text'])
+        got = _day(dates[0]) if dates else None
+        hits += got == c['date']
+        if got != c['date']:
+            misses.append(('parse_dates', c['text'].splitlines()[0], f'got {got}, want {c["date"]}'))
+    return {'parse_dates': hits / len(cases)}
+
+
+def auto_accuracy(cases, misses):
+    hits = 0
+    noise = 0
+    for c in cases:
+        txs = auto_parse_transactions(c['text'])
+        ok = any(round(t['amount'], 2) == c['total'] and _day(t['date']) == c['date'] for t in txs)
+        hits += ok
+        noise += max(0, len(txs) - 1)
+        if not ok:
+            misses.append(('auto_parse_transactions', c['text'].splitlines()[0], f'{len(txs)} transactions, none right'))
+    return {'auto_parse_transactions': hits / len(cases)}, noise / len(cases)
+
+
+def pos_accuracy(cases, misses):
+    hits = 0
+    for c in cases:
+        tx = parse_pos_receipt(c['text'])
+        got = round(tx['amount'], 2) if tx else None
+        hits += got == c['total']
+        if got != c['total']:
+            misses.append(('parse_pos_receipt', c['text'].splitlines()[0], f'got {got}, want {c["total"]}'))
+    return {'parse_pos_receipt': hits / len(cases)}
+
+
+def fast_text(text: str) -> str:
+    """What fast-mode OCR can return for text: only whitelisted characters survive (spacing kept)."""
+    return ''.join(ch for ch in text if ch in OCR_FAST_WHITELIST or ch.isspace())
+
+
+def fast_accuracy(cases, misses):
+    totals = dates = 0
+    for c in cases:
+        tx = parse_fast_receipt(fast_text(c['text']))
+        got = (round(tx['amount'], 2), _day(tx['date'])) if tx else (None, None)
+        totals += got[0] == c['total']
+        dates += got[1] == c['date']
+        if got != (c['total'], c['date']):
+            misses.append(('parse_fast_receipt', c['text'].splitlines()[0], f'got {got}, want {(c["total"], c["date"])}'))
+    return {'parse_fast_receipt.total': totals / len(cases), 'parse_fast_receipt.date': dates / len(cases)}
+
+
+def statement_accuracy(docs, pdfs, misses):
+    correct = total = 0
+    for d in docs:
+        rows = parse_pdf_table(pdfs[d['file']])
+        ok = sum(1 for r, e in zip(rows, d['expected'])
+                 if r['amount'] == e['amount'] and _day(r['date']) == e['date'] and r['type'] == e['type'])
+        correct += ok
+        total += len(d['expected'])
+        if ok < len(d['expected']) or len(rows) != len(d['expected']):
+            misses.append(('parse_pdf_table', d['file'], f'{ok}/{len(d["expected"])} rows right, {len(rows)} returned'))
+    return {'parse_pdf_table': correct / total}
+
+
+def pdf_receipt_text(pdf: bytes) -> str:
+    return '\n'.join(p['text'] or '' for p in pdf_text_layers(pdf))
+
+
+def pdf_receipt_accuracy(docs, pdfs, misses):
+    hits = 0
+    for d in docs:
+        text = pdf_receipt_text(pdfs[d['file']])
+        tx = parse_pos_receipt(text)
+        dates = parse_dates(text)
+        ok = bool(tx) and round(tx['amount'], 2) == d['total'] and bool(dates) and _day(dates[0]) == d['date']
+        hits += ok
+        if not ok:
+            misses.append(('pdf receipts', d['file'], f'total {tx and tx["amount"]}, date {dates and _day(dates[0])}'))
+    return {'pdf_receipts': hits / len(docs)}
+
+
+def main(args) -> int:
+    cases = load(RECEIPTS)['cases']
+    docs = load(DOCUMENTS)['documents']
+    pdfs = {}
+    for d in docs:
+        with open(os.path.join(DOCUMENTS_DIR, d['file']), 'rb') as f:
+            pdfs[d['file']] = f.read()
+    statements = [d for d in docs if d['kind'] == 'statement']
+    pdf_receipts = [d for d in docs if d['kind'] == 'receipt']
+
+    misses: list = []
+    accuracy: Dict[str, float] = {}
+    accuracy.update(amounts_accuracy(cases, misses))
+    accuracy.update(dates_accuracy(cases, misses))
+    auto, noise = auto_accuracy(cases, misses)
+    accuracy.update(auto)
+    accuracy.update(pos_accuracy(cases, misses))
+    accuracy.update(fast_accuracy(cases, misses))
+    accuracy.update(statement_accuracy(statements, pdfs, misses))
+    accuracy.update(pdf_receipt_accuracy(pdf_receipts, pdfs, misses))
+
+    texts = [c['text'] for c in cases]
+    text_kib = sum(len(t.encode()) for t in texts) / 1024
+    statement_bytes = [pdfs[d['file']] for d in statements]
+    receipt_bytes = [pdfs[d['file']] for d in pdf_receipts]
+    benches = [
+        ('parse_amounts', parse_amounts, texts, text_kib, f'{accuracy["parse_amounts.recall"]:.0%} recall, '
+                                                          f'{accuracy["parse_amounts.precision"]:.0%} precision'),
+        ('parse_dates', parse_dates, texts, text_kib, f'{accuracy["parse_dates"]:.0%}'),
+        ('auto_parse_transactions', auto_parse_transactions, texts, text_kib,
+         f'{accuracy["auto_parse_transactions"]:.0%} ({noise:.1f} extra tx/receipt)'),
+        ('parse_pos_receipt', parse_pos_receipt, texts, text_kib, f'{accuracy["parse_pos_receipt"]:.0%}'),
+        ('parse_fast_receipt', parse_fast_receipt, [fast_text(t) for t in texts], text_kib,
+         f'{accuracy["parse_fast_receipt.total"]:.0%} total, {accuracy["parse_fast_receipt.date"]:.0%} date '
+         f'(on fast-mode text)'),
+        ('parse_pdf_table', parse_pdf_table, statement_bytes, sum(map(len, statement_bytes)) / 1024,
+         f'{accuracy["parse_pdf_table"]:.0%} of rows'),
+        ('pdf receipts', lambda b: parse_pos_receipt(pdf_receipt_text(b)), receipt_bytes,
+         sum(map(len, receipt_bytes)) / 1024, f'{accuracy["pdf_receipts"]:.0%}'),
+    ]
+
+    print(f'corpus: {len(cases)} receipt texts, {len(pdf_receipts)} receipt PDFs, {len(statements)} statement PDFs '
+          f'({sum(len(d["expected"]) for d in statements)} rows)\n')
+    print(f'{"function":25}{"docs/s":>10}{"KiB/s":>10}{"peak KiB":>10}{"blocks":>8}  accuracy')
+    for name, fn, inputs, kib, acc in benches:
+        rate = throughput(fn, inputs, args.min_time)
+        alloc = allocations(fn, inputs)
+        print(f'{name:25}{rate:10.0f}{rate * kib / len(inputs):10.0f}{alloc["peak_kib"]:10.1f}{alloc["blocks"]:8.0f}  {acc}')
+
+    if args.show_misses and misses:
+        print('\nmisses:')
+        for fn, where, what in misses:
+            print(f'  {fn:25} {where[:40]:40} {what}')
+
+    if args.record:
+        with open(ACCURACY, 'w') as f:
+            json.dump({k: round(v, 4) for k, v in accuracy.items()}, f, indent=2)
+            f.write('\n')
+        print(f'\nrecorded accuracy floor in {ACCURACY}')
+    if args.check:
+        floor = load(ACCURACY)
+        # the floor is rounded to 4 places
+        worse = [f'{k}: {accuracy.get(k, 0):.4f} < {v:.4f}' for k, v in floor.items() if accuracy.get(k, 0) + 5e-5 < v]
+        print('\naccuracy check: ' + ('ok' if not worse else 'FAILED'))
+        for w in worse:
+            print(f'  {w}')
+        return 1 if worse else 0
+    return 0
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--min-time', type=float, default=0.5, help='seconds of timed passes per function')
+    ap.add_argument('--show-misses', action='store_true')
+    ap.add_argument('--check', action='store_true', help='fail if accuracy is below the recorded floor')
+    ap.add_argument('--record', action='store_true', help='record the current accuracy as the floor')
+    ap.add_argument('--regenerate', action='store_true', help='rebuild the PDF corpus and exit')
+    args = ap.parse_args()
+    if args.regenerate:
+        regenerate()
+        sys.exit(0)
+    sys.exit(main(args))
@@ -0,0 +1,124 @@
+"""
+Does OCR / PDF work stay off the event loop? /api/transactions latency, idle vs during /api/ocr uploads.
+
+    cd backend
+    DB_NAME=pfa_load python -m bench.bench_pool_isolation [--requests 300] [--uploaders 8] [--pages 40]
+
+Drives the app in-process through httpx. Phase 1 times --requests sequential
+GET /api/transactions calls with nothing else running. Phase 2 times the same
+calls while --uploaders tasks keep POSTing multi-page text-layer PDFs to
+/api/ocr (each one unique, so the document cache does not absorb them; no OCR
+engine needed, pdfplumber does the work in the document worker pool).
+
+Uploads are CPU-heavy, so if any of that work ran on the event loop every
+listing request would queue behind it. With the process pool the listing p95
+should barely move: the run fails (exit 1) if the loaded p95 exceeds the idle
+p95 by more than --tolerance and --min-delta-ms. Needs a running mongod; the
+user it registers (pool-bench@example.com) is reused across runs.
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from typing import List
+
+import httpx
+
+from app import crud
+from app.main import app
+from app.workers import DOC_WORKERS, shutdown_pool
+from bench.pdfgen import text_pdf
+
+EMAIL = 'pool-bench@example.com'
+PASSWORD = 'Passw0rd!'
+
+
+def pct(samples: List[float], p: float) -> float:
+    s = sorted(samples)
+    return s[min(len(s) - 1, int(len(s) * p / 100))] if s else 0.0
+
+
+async def login(client: httpx.AsyncClient) -> dict:
+    creds = {'email': EMAIL, 'password': PASSWORD}
+    r = await client.post('/api/auth/login', json=creds)
+    if r.status_code == 401:
+        (await client.post('/api/auth/register', json=creds)).raise_for_status()
+        r = await client.post('/api/auth/login', json=creds)
+    r.raise_for_status()
+    return {'Authorization': f'Bearer {r.json()["access_token"]}'}
+
+
+async def time_listing(client: httpx.AsyncClient, headers: dict, n: int) -> List[float]:
+    out = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        r = await client.get('/api/transactions', params={'page_size': 20}, headers=headers)
+        out.append((time.perf_counter() - t0) * 1000)
+        r.raise_for_status()
+    return out
+
+
+async def uploader(client: httpx.AsyncClient, headers: dict, worker: int, pages: int, stop: asyncio.Event,
+                   done: List[float]):
+    i = 0
+    while not stop.is_set():
+        i += 1
+        lines = [f'UPLOAD {worker}-{i} PAGE {p}' for p in range(pages)]
+        pdf = text_pdf([[line] + [f'Item {k:03d} {k * 1.25:.2f}' for k in range(45)] for line in lines])
+        t0 = time.perf_counter()
+        r = await client.post('/api/ocr', files={'file': ('receipt.pdf', pdf, 'application/pdf')}, headers=headers)
+        r.raise_for_status()
+        done.append((time.perf_counter() - t0) * 1000)
+
+
+def describe(label: str, ms: List[float]) -> str:
+    return (f'{label:26}{len(ms):6}{statistics.mean(ms):9.1f}{pct(ms, 50):9.1f}{pct(ms, 95):9.1f}'
+            f'{pct(ms, 99):9.1f}{max(ms):9.1f}')
+
+
+async def main(args) -> int:
+    await crud.ensure_indexes()
+    async with httpx.AsyncClient(app=app, base_url='http://bench', timeout=300) as client:
+        headers = await login(client)
+        await time_listing(client, headers, 20)  # warm caches and the connection pool
+        idle = await time_listing(client, headers, args.requests)
+
+        stop = asyncio.Event()
+        uploads: List[float] = []
+        tasks = [asyncio.create_task(uploader(client, headers, w, args.pages, stop, uploads))
+                 for w in range(args.uploaders)]
+        await asyncio.sleep(args.ramp)  # let the worker pool fill up
+        try:
+            loaded = await time_listing(client, headers, args.requests)
+        finally:
+            stop.set()
+            await asyncio.gather(*tasks)
+    shutdown_pool()
+
+    print(f'{args.uploaders} concurrent uploaders of {args.pages}-page PDFs, {DOC_WORKERS} document workers\n')
+    print(f'{"":26}{"n":>6}{"mean ms":>9}{"p50":>9}{"p95":>9}{"p99":>9}{"max":>9}')
+    print(describe('GET /api/transactions idle', idle))
+    print(describe('  ... during uploads', loaded))
+    if uploads:
+        print(describe('POST /api/ocr', uploads))
+    base, cur = pct(idle, 95), pct(loaded, 95)
+    if not uploads:
+        print('\nno upload finished while listing; raise --requests or lower --pages')
+        return 1
+    if cur > base * (1 + args.tolerance) and cur - base > args.min_delta_ms:
+        print(f'\nFAIL: listing p95 {base:.1f} -> {cur:.1f} ms under upload load')
+        return 1
+    print(f'\nok: listing p95 {base:.1f} -> {cur:.1f} ms under upload load')
+    return 0
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--requests', type=int, default=300, help='listing requests per phase')
+    ap.add_argument('--uploaders', type=int, default=8, help='concurrent upload loops')
+    ap.add_argument('--pages', type=int, default=40, help='pages per uploaded PDF')
+    ap.add_argument('--ramp', type=float, default=1.0, help='seconds of upload load before timing starts')
+    ap.add_argument('--tolerance', type=float, default=0.5, help='allowed relative p95 growth')
+    ap.add_argument('--min-delta-ms', type=float, default=5.0, help='ignore p95 growth smaller than this')
+    sys.exit(asyncio.run(main(ap.parse_args())))
@@ -0,0 +1,94 @@
+"""
+Database round-trips per write: counts the commands each crud write path sends.
+
+    cd backend
+    DB_NAME=pfa_bench python -m bench.bench_roundtrips [--check]
+
+Needs a running mongod. A pymongo CommandListener counts every command issued
+while one write runs. BASELINE holds the counts before the read-after-write
+re-reads were removed; --check exits non-zero unless the total is at most half
+of the baseline. Documents are written for throwaway ids and removed afterwards.
+"""
+import argparse
+import asyncio
+import sys
+from collections import Counter
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import monitoring
+
+from app import crud
+
+# commands per call before this change (insert/update followed by a find_one re-read)
+BASELINE = {
+    'create_user': 3,         # find_one (exists?) + insert_one + find_one
+    'create_category': 3,     # find_one (exists?) + insert_one + find_one
+    'create_transaction': 3,  # insert_one + rollup bulk_write + find_one
+    'update_transaction': 3,  # find_one_and_update + find_one + rollup bulk_write
+}
+
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.commands = Counter()
+
+    def started(self, event):
+        if event.command_name not in ('ping', 'hello', 'isMaster', 'endSessions'):
+            self.commands[event.command_name] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+counter = CommandCounter()
+# must be registered before the shared client is created
+monitoring.register(counter)
+
+
+async def measure(name: str, coro) -> int:
+    counter.commands.clear()
+    await coro
+    n = sum(counter.commands.values())
+    print(f'{name:20} {n:3} round-trips  (was {BASELINE[name]})  {dict(counter.commands)}')
+    return n
+
+
+async def main(check: bool) -> int:
+    db = crud.get_db()
+    user_id = ObjectId()
+    email = f'bench-{user_id}@example.com'
+    cat_name = f'bench-{user_id}'
+    try:
+        counts = {
+            'create_user': await measure('create_user', crud.create_user({'email': email, 'password': 'x'})),
+            'create_category': await measure('create_category', crud.create_category({'name': cat_name, 'type': 'expense'})),
+        }
+        tx = await crud.create_transaction(user_id, {'type': 'expense', 'amount': 1.0, 'category': 'food',
+                                                     'date': datetime(2024, 1, 1)})
+        counts['create_transaction'] = await measure('create_transaction', crud.create_transaction(
+            user_id, {'type': 'expense', 'amount': 2.0, 'category': 'food', 'date': datetime(2024, 1, 2)}))
+        counts['update_transaction'] = await measure('update_transaction', crud.update_transaction(
+            user_id, tx['id'], {'amount': 5.0}))
+    finally:
+        await db[crud.USERS_COL].delete_one({'email': email})
+        await db[crud.CAT_COL].delete_one({'name': cat_name})
+        await db[crud.TRAN_COL].delete_many({'user_id': user_id})
+        await db[crud.ROLLUP_COL].delete_many({'user_id': user_id})
+        crud.invalidate_category_catalog()
+
+    total, baseline = sum(counts.values()), sum(BASELINE.values())
+    print(f'\ntotal: {total} round-trips for {len(counts)} writes (baseline {baseline}, {baseline / total:.1f}x fewer)')
+    if check and total * 2 > baseline:
+        print('FAIL: expected at most half the baseline round-trips')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--check', action='store_true')
+    sys.exit(asyncio.run(main(ap.parse_args().check)))
@@ -0,0 +1,114 @@
+"""
+Statement PDF parsing: column-typed parse_pdf_table vs the previous per-cell parser.
+
+    cd backend
+    python -m bench.bench_statement [--pages 50] [--rows-per-page 45] [--workers 4]
+
+Generates a ruled multi-page bank statement (header repeated on each page,
+dd/mm/yy dates, separate withdrawal / deposit columns) with bench.pdfgen and
+times each stage. Accuracy counts rows whose amount, date and income/expense
+type all match what was generated; the old parser had no type, and the upload
+route filed every row as an expense. The last line runs parse_statement, which
+splits the pages across --workers processes (the speedup needs that many cores).
+No database or OCR engine needed.
+"""
+import argparse
+import asyncio
+import io
+import re
+import time
+
+import pdfplumber
+from dateutil import parser as dateparser
+
+from app import workers
+from app.utils import DocumentError, extract_pdf_tables, parse_statement, rows_from_tables
+from bench.pdfgen import statement_pdf
+
+
+def legacy_extract(pdf_bytes: bytes) -> list:
+    tables = []
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        for page in pdf.pages:
+            table = page.extract_table()
+            if table:
+                tables.append(table)
+            page.flush_cache()
+    return tables
+
+
+def legacy_rows(tables: list) -> list:
+    """The per-cell loop parse_pdf_table used to run: amount regex + fuzzy date on every cell."""
+    rows = []
+    for table in tables:
+        for r in table[1:]:
+            amount = None; date = None; desc = ''
+            for v in r:
+                if not v:
+                    continue
+                am = re.search(r'([0-9]+[.,][0-9]{2})', v)
+                if am and amount is None:
+                    amount = float(am.group(1).replace(',', ''))
+                try:
+                    dt = dateparser.parse(v, fuzzy=True)
+                    if date is None:
+                        date = dt.isoformat()
+                except Exception:
+                    pass
+                desc += (v + ' ')
+            rows.append({'amount': amount, 'date': date, 'note': desc.strip(), 'type': 'expense'})
+    return rows
+
+
+def accuracy(rows: list, expected: list) -> int:
+    return sum(1 for r, e in zip(rows, expected)
+               if r['amount'] == e['amount'] and (r['date'] or '')[:10] == e['date'] and r['type'] == e['type'])
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - t0
+
+
+def main(pages: int, rows_per_page: int, n_workers: int):
+    pdf, expected = statement_pdf(pages=pages, rows_per_page=rows_per_page)
+    print(f'statement: {pages} pages, {len(expected)} transactions, {len(pdf) / 1024:.0f} KiB\n')
+
+    old_tables, old_extract = timed(legacy_extract, pdf)
+    old_rows, old_convert = timed(legacy_rows, old_tables)
+    new_tables, new_extract = timed(extract_pdf_tables, pdf)
+    new_rows, new_convert = timed(rows_from_tables, new_tables)
+
+    old_total, new_total = old_extract + old_convert, new_extract + new_convert
+    print(f'{"":22}{"old":>10}{"new":>10}{"speedup":>10}')
+    for label, old, new in (('table extraction (s)', old_extract, new_extract),
+                            ('row conversion (s)', old_convert, new_convert),
+                            ('total (s)', old_total, new_total)):
+        print(f'{label:22}{old:10.3f}{new:10.3f}{old / new:9.1f}x')
+    print(f'{"rows returned":22}{len(old_rows):10}{len(new_rows):10}')
+    print(f'{"rows correct":22}{accuracy(old_rows, expected):10}{accuracy(new_rows, expected):10}'
+          f'   (of {len(expected)})')
+
+    workers.DOC_WORKERS = n_workers
+    try:
+        try:  # start the pool outside the timing; the truncated file itself does not parse
+            asyncio.run(parse_statement(pdf[:1024], workers=n_workers))
+        except DocumentError:
+            pass
+        t0 = time.perf_counter()
+        rows = asyncio.run(parse_statement(pdf, workers=n_workers))
+        elapsed = time.perf_counter() - t0
+    finally:
+        workers.shutdown_pool()
+    print(f'\nparse_statement, {n_workers} workers: {elapsed:.3f}s  ({old_total / elapsed:.1f}x vs old total, '
+          f'{accuracy(rows, expected)} rows correct)')
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--pages', type=int, default=50)
+    ap.add_argument('--rows-per-page', type=int, default=45)
+    ap.add_argument('--workers', type=int, default=4)
+    args = ap.parse_args()
+    main(args.pages, args.rows_per_page, args.workers)
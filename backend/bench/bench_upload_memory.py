@@ -0,0 +1,68 @@
+"""
+Peak memory per upload type for /api/ocr and /api/upload/history.
+
+    cd backend
+    python -m bench.bench_upload_memory receipt.jpg scan.pdf statement.pdf [--concurrency 4]
+
+Posts each file --concurrency times at once through the in-process app and
+reports peak RSS growth of the API process and the peak RSS of the document
+worker processes (Linux /proc). No database is needed (auto_create is off).
+"""
+import argparse
+import asyncio
+import os
+import resource
+
+import httpx
+
+from app import auth, workers
+from app.main import app
+
+
+def api_peak_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def workers_peak_mb() -> float:
+    pool = workers._pool
+    peak = 0.0
+    for pid in list(getattr(pool, '_processes', {}) or {}):
+        try:
+            with open(f'/proc/{pid}/status') as f:
+                for line in f:
+                    if line.startswith('VmHWM:'):
+                        peak = max(peak, int(line.split()[1]) / 1024)
+        except OSError:
+            pass
+    return peak
+
+
+async def main(args):
+    token = auth.create_access_token({'user_id': '0' * 24, 'email': 'bench@example.com'})
+    headers = {'Authorization': f'Bearer {token}'}
+    os.environ.setdefault('DOC_CACHE_DIR', '')
+    async with httpx.AsyncClient(app=app, base_url='http://bench', timeout=None) as client:
+        for path in args.files:
+            size_mb = os.path.getsize(path) / (1024 * 1024)
+            for endpoint in ('/api/ocr', '/api/upload/history'):
+                if endpoint.endswith('history') and not path.lower().endswith('.pdf'):
+                    continue
+                before = api_peak_mb()
+
+                async def post():
+                    with open(path, 'rb') as f:
+                        r = await client.post(endpoint, files={'file': (os.path.basename(path), f)}, headers=headers)
+                    return r.status_code
+
+                codes = await asyncio.gather(*(post() for _ in range(args.concurrency)))
+                print(f'{os.path.basename(path):28} {size_mb:7.1f} MB  {endpoint:20} x{args.concurrency}  '
+                      f'status {sorted(set(codes))}  api peak +{api_peak_mb() - before:6.1f} MB  '
+                      f'worker peak {workers_peak_mb():6.1f} MB')
+    workers.shutdown_pool()
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('files', nargs='+')
+    ap.add_argument('--concurrency', type=int, default=4)
+    asyncio.run(main(ap.parse_args()))
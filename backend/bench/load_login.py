@@ -0,0 +1,74 @@
+"""
+Login storm: login throughput and latency of an unrelated endpoint meanwhile.
+
+    cd backend
+    BCRYPT_ROUNDS=12 python -m bench.load_login --logins 200 --concurrency 20
+
+Drives the FastAPI app in-process through httpx. Registers a throwaway user,
+fires --logins logins at --concurrency while probing GET / every few ms,
+then reports logins/sec and probe p50/p99. Needs a running mongod.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+import httpx
+
+from app import crud
+from app.main import app
+
+
+def pct(samples, p):
+    s = sorted(samples)
+    return s[min(len(s) - 1, int(len(s) * p / 100))] if s else 0.0
+
+
+async def main(args):
+    email = f'load-{uuid.uuid4().hex[:8]}@example.com'
+    creds = {'email': email, 'password': 'Passw0rd!'}
+    async with httpx.AsyncClient(app=app, base_url='http://bench') as client:
+        r = await client.post('/api/auth/register', json=creds)
+        r.raise_for_status()
+        try:
+            done = asyncio.Event()
+            probe_ms = []
+
+            async def probe():
+                while not done.is_set():
+                    t0 = time.perf_counter()
+                    await client.get('/')
+                    probe_ms.append((time.perf_counter() - t0) * 1000)
+                    await asyncio.sleep(0.005)
+
+            sem = asyncio.Semaphore(args.concurrency)
+            login_ms = []
+
+            async def login():
+                async with sem:
+                    t0 = time.perf_counter()
+                    resp = await client.post('/api/auth/login', json=creds)
+                    resp.raise_for_status()
+                    login_ms.append((time.perf_counter() - t0) * 1000)
+
+            prober = asyncio.create_task(probe())
+            t0 = time.perf_counter()
+            await asyncio.gather(*(login() for _ in range(args.logins)))
+            elapsed = time.perf_counter() - t0
+            done.set()
+            await prober
+        finally:
+            await crud.get_db()[crud.USERS_COL].delete_one({'email': email})
+
+    print(f'logins: {args.logins} at concurrency {args.concurrency}')
+    print(f'login throughput: {args.logins / elapsed:.1f}/s  p50 {pct(login_ms, 50):.0f} ms  p99 {pct(login_ms, 99):.0f} ms')
+    print(f'GET / during storm: {len(probe_ms)} probes  p50 {statistics.median(probe_ms):.1f} ms  '
+          f'p99 {pct(probe_ms, 99):.1f} ms  max {max(probe_ms):.1f} ms')
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--logins', type=int, default=200)
+    ap.add_argument('--concurrency', type=int, default=20)
+    asyncio.run(main(ap.parse_args()))
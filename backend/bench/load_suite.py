@@ -0,0 +1,276 @@
+"""
+End-to-end load run against the FastAPI app, with a JSON baseline to catch regressions.
+
+    cd backend
+    DB_NAME=pfa_load python -m scripts.seed_data --users 20 --transactions 1000000
+    DB_NAME=pfa_load python -m bench.load_suite --duration 60 --concurrency 16 --out bench/results/run.json
+    DB_NAME=pfa_load python -m bench.load_suite --baseline bench/results/run.json   # compare; exit 1 on regression
+
+Drives the app in-process through httpx (no network, so numbers are server
+work plus the client). Each virtual user logs in as one of the seeded users
+(seed-NNNNN@example.com, see scripts.seed_data), then loops over a weighted
+mix: logins, first and deep pages of GET /api/transactions (cursor walk),
+both aggregate endpoints, the dashboard, creates / partial updates / deletes
+of its own transactions, and receipt uploads to POST /api/ocr (text-layer PDFs
+from bench.pdfgen, each one unique so the document cache does not hide the
+work; no OCR engine needed). Per endpoint it reports requests, errors,
+throughput and p50 / p95 / p99 latency.
+
+--out writes the results as JSON. --baseline compares against an earlier
+file: an endpoint regresses if its p95 grows by more than --tolerance (and by
+more than --min-delta-ms), its throughput falls by more than --tolerance, or
+it starts failing. Transactions created by the run are deleted at the end.
+Needs a running mongod.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import httpx
+
+from app import crud
+from app.main import app
+from bench.pdfgen import text_pdf
+from scripts.seed_data import DEFAULT_PASSWORD, EMAIL_FORMAT
+
+# scenario -> relative weight in the mix
+MIX = {
+    'login': 1,
+    'list_first_page': 20,
+    'list_deep_page': 8,
+    'aggregate_category': 10,
+    'aggregate_date': 10,
+    'dashboard': 8,
+    'create': 10,
+    'update': 8,
+    'delete': 5,
+    'ocr_upload': 3,
+}
+
+
+def pct(samples: List[float], p: float) -> float:
+    s = sorted(samples)
+    return s[min(len(s) - 1, int(len(s) * p / 100))] if s else 0.0
+
+
+class VirtualUser:
+    def __init__(self, client: httpx.AsyncClient, email: str, password: str, rnd: random.Random):
+        self.client = client
+        self.creds = {'email': email, 'password': password}
+        self.rnd = rnd
+        self.headers: Dict[str, str] = {}
+        self.created: List[str] = []
+        self.receipts = 0
+
+    async def login(self):
+        r = await self.client.post('/api/auth/login', json=self.creds)
+        if r.status_code == 200:
+            self.headers = {'Authorization': f'Bearer {r.json()["access_token"]}'}
+        return r
+
+    async def list_first_page(self):
+        return await self.client.get('/api/transactions', params={'page_size': 20}, headers=self.headers)
+
+    async def list_deep_page(self):
+        params = {'page_size': 50, 'with_total': 'false'}
+        r = None
+        for _ in range(self.rnd.randint(3, 10)):
+            r = await self.client.get('/api/transactions', params=params, headers=self.headers)
+            cursor = r.json().get('next_cursor') if r.status_code == 200 else None
+            if not cursor:
+                break
+            params['cursor'] = cursor
+        return r
+
+    def _window(self) -> Dict[str, str]:
+        days = self.rnd.choice((30, 90, 365))
+        end = datetime.utcnow()
+        return {'start': (end - timedelta(days=days)).strftime('%Y-%m-%d'), 'end': end.strftime('%Y-%m-%d')}
+
+    async def aggregate_category(self):
+        return await self.client.get('/api/aggregate/category', params={**self._window(), 'tx_type': 'expense'},
+                                     headers=self.headers)
+
+    async def aggregate_date(self):
+        return await self.client.get('/api/aggregate/date', params=self._window(), headers=self.headers)
+
+    async def dashboard(self):
+        return await self.client.get('/api/dashboard', params=self._window(), headers=self.headers)
+
+    async def create(self):
+        body = {'type': 'expense', 'amount': round(self.rnd.lognormvariate(3.2, 0.8), 2),
+                'category': self.rnd.choice(('Groceries', 'Dining', 'Transport', 'Misc')),
+                'note': 'load test', 'date': datetime.utcnow().isoformat()}
+        r = await self.client.post('/api/transactions', json=body, headers=self.headers)
+        if r.status_code == 201:
+            self.created.append(r.json()['id'])
+        return r
+
+    async def update(self):
+        if not self.created:
+            return None
+        tx_id = self.rnd.choice(self.created)
+        return await self.client.patch(f'/api/transactions/{tx_id}', json={'amount': round(self.rnd.uniform(1, 500), 2)},
+                                       headers=self.headers)
+
+    async def delete(self):
+        if not self.created:
+            return None
+        tx_id = self.created.pop(self.rnd.randrange(len(self.created)))
+        return await self.client.delete(f'/api/transactions/{tx_id}', headers=self.headers)
+
+    async def ocr_upload(self):
+        self.receipts += 1
+        pdf = text_pdf([[f'STORE #{id(self) % 10000}-{self.receipts}', 'Milk 2 x 45.00', 'Bread 40.00',
+                         f'Grand Total {self.rnd.uniform(50, 900):.2f}', datetime.utcnow().strftime('%d/%m/%Y')]])
+        return await self.client.post('/api/ocr', files={'file': ('receipt.pdf', pdf, 'application/pdf')},
+                                      headers=self.headers)
+
+
+async def run_user(vu: VirtualUser, deadline: float, samples, errors):
+    names = list(MIX)
+    weights = [MIX[n] for n in names]
+    while time.perf_counter() < deadline:
+        name = vu.rnd.choices(names, weights)[0]
+        t0 = time.perf_counter()
+        try:
+            r = await getattr(vu, name)()
+        except Exception:
+            errors[name] += 1
+            samples[name].append((time.perf_counter() - t0) * 1000)
+            continue
+        if r is None:  # nothing to update / delete yet
+            continue
+        samples[name].append((time.perf_counter() - t0) * 1000)
+        if r.status_code >= 400:
+            errors[name] += 1
+
+
+async def ensure_user(client: httpx.AsyncClient, email: str, password: str):
+    r = await client.post('/api/auth/login', json={'email': email, 'password': password})
+    if r.status_code == 401:  # not seeded; register so the run still works on an empty database
+        (await client.post('/api/auth/register', json={'email': email, 'password': password})).raise_for_status()
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def summarize(samples, errors, elapsed: float) -> Dict[str, dict]:
+    out = {}
+    for name in MIX:
+        ms = samples.get(name, [])
+        if not ms:
+            continue
+        out[name] = {'requests': len(ms), 'errors': errors.get(name, 0), 'rps': round(len(ms) / elapsed, 2),
+                     'p50_ms': round(pct(ms, 50), 2), 'p95_ms': round(pct(ms, 95), 2), 'p99_ms': round(pct(ms, 99), 2)}
+    every = [x for v in samples.values() for x in v]
+    out['_all'] = {'requests': len(every), 'errors': sum(errors.values()), 'rps': round(len(every) / elapsed, 2),
+                   'p50_ms': round(pct(every, 50), 2), 'p95_ms': round(pct(every, 95), 2),
+                   'p99_ms': round(pct(every, 99), 2)}
+    return out
+
+
+def print_table(results: Dict[str, dict]):
+    print(f'{"endpoint":20}{"requests":>10}{"errors":>8}{"req/s":>9}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}')
+    for name, r in results.items():
+        print(f'{name:20}{r["requests"]:10}{r["errors"]:8}{r["rps"]:9.1f}{r["p50_ms"]:9.1f}{r["p95_ms"]:9.1f}'
+              f'{r["p99_ms"]:9.1f}')
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float, min_delta_ms: float) -> List[str]:
+    problems = []
+    for name, base in baseline.items():
+        cur = results.get(name)
+        if cur is None:
+            continue
+        if cur['p95_ms'] > base['p95_ms'] * (1 + tolerance) and cur['p95_ms'] - base['p95_ms'] > min_delta_ms:
+            problems.append(f'{name}: p95 {base["p95_ms"]:.1f} -> {cur["p95_ms"]:.1f} ms')
+        if cur['rps'] < base['rps'] * (1 - tolerance):
+            problems.append(f'{name}: throughput {base["rps"]:.1f} -> {cur["rps"]:.1f} req/s')
+        if cur['errors'] and not base['errors']:
+            problems.append(f'{name}: {cur["errors"]} errors (baseline had none)')
+    return problems
+
+
+async def main(args) -> int:
+    await crud.ensure_indexes()
+    rnd = random.Random(args.seed)
+    samples: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    limits = httpx.Limits(max_connections=None)
+    async with httpx.AsyncClient(app=app, base_url='http://bench', timeout=120, limits=limits) as client:
+        emails = [EMAIL_FORMAT.format(i % args.users) for i in range(args.concurrency)]
+        for email in sorted(set(emails)):
+            await ensure_user(client, email, args.password)
+        vus = [VirtualUser(client, email, args.password, random.Random(rnd.random())) for email in emails]
+        await asyncio.gather(*(vu.login() for vu in vus))
+
+        if args.warmup:
+            await asyncio.gather(*(run_user(vu, time.perf_counter() + args.warmup, defaultdict(list), defaultdict(int))
+                                   for vu in vus))
+        t0 = time.perf_counter()
+        deadline = t0 + args.duration
+        await asyncio.gather(*(run_user(vu, deadline, samples, errors) for vu in vus))
+        elapsed = time.perf_counter() - t0
+
+        leftovers = [tx for vu in vus for tx in vu.created]
+        for vu in vus:
+            for tx_id in vu.created:
+                await client.delete(f'/api/transactions/{tx_id}', headers=vu.headers)
+
+    results = summarize(samples, errors, elapsed)
+    print(f'{args.concurrency} virtual users over {args.users} accounts, {elapsed:.1f}s '
+          f'({len(leftovers)} created transactions cleaned up)\n')
+    print_table(results)
+
+    report = {
+        'meta': {'timestamp': datetime.utcnow().isoformat(timespec='seconds'), 'git': git_revision(),
+                 'python': platform.python_version(), 'db': os.getenv('DB_NAME'), 'duration_s': round(elapsed, 2),
+                 'concurrency': args.concurrency, 'users': args.users, 'seed': args.seed, 'mix': MIX},
+        'endpoints': results,
+    }
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'\nwrote {args.out}')
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        problems = compare(results, baseline['endpoints'], args.tolerance, args.min_delta_ms)
+        print(f'\ncompared with {args.baseline} (git {baseline["meta"].get("git")}, tolerance {args.tolerance:.0%}):')
+        for p in problems:
+            print(f'  REGRESSION {p}')
+        if not problems:
+            print('  no regressions')
+        return 1 if problems else 0
+    return 0
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--duration', type=float, default=30, help='seconds of measured load')
+    ap.add_argument('--warmup', type=float, default=3, help='seconds of unmeasured load first')
+    ap.add_argument('--concurrency', type=int, default=8, help='virtual users')
+    ap.add_argument('--users', type=int, default=8, help='seeded accounts to spread the virtual users over')
+    ap.add_argument('--password', default=DEFAULT_PASSWORD)
+    ap.add_argument('--seed', type=int, default=1)
+    ap.add_argument('--out', default=None, help='write results JSON here')
+    ap.add_argument('--baseline', default=None, help='results JSON to compare against')
+    ap.add_argument('--tolerance', type=float, default=0.2, help='allowed relative p95 / throughput change')
+    ap.add_argument('--min-delta-ms', type=float, default=2.0, help='ignore p95 growth smaller than this')
+    sys.exit(asyncio.run(main(ap.parse_args())))
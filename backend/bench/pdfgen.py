@@ -0,0 +1,126 @@
+"""
+Minimal PDF writer for benchmark fixtures: pages of ruled tables (or plain text
+lines) in Helvetica, with a real text layer so pdfplumber can extract them.
+No third-party dependencies.
+"""
+import random
+from datetime import datetime, timedelta
+from typing import List, Optional, Sequence
+
+PAGE_W, PAGE_H = 595, 842  # A4 in points
+MARGIN = 36
+ROW_H = 16
+FONT_SIZE = 7
+
+
+def _escape(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def _table_stream(rows: Sequence[Sequence[str]], widths: Sequence[int]) -> str:
+    ops = ['0.5 w']
+    top = PAGE_H - MARGIN
+    x_edges = [MARGIN]
+    for w in widths:
+        x_edges.append(x_edges[-1] + w)
+    bottom = top - ROW_H * len(rows)
+    for i in range(len(rows) + 1):  # horizontal rules
+        y = top - ROW_H * i
+        ops.append(f'{x_edges[0]} {y} m {x_edges[-1]} {y} l S')
+    for x in x_edges:  # vertical rules
+        ops.append(f'{x} {top} m {x} {bottom} l S')
+    for i, row in enumerate(rows):
+        y = top - ROW_H * (i + 1) + 5
+        for x, cell in zip(x_edges, row):
+            if cell:
+                ops.append(f'BT /F1 {FONT_SIZE} Tf {x + 2} {y} Td ({_escape(cell)}) Tj ET')
+    return '\n'.join(ops)
+
+
+def _text_stream(lines: Sequence[str]) -> str:
+    ops = []
+    for i, line in enumerate(lines):
+        y = PAGE_H - MARGIN - 12 * (i + 1)
+        ops.append(f'BT /F1 9 Tf {MARGIN} {y} Td ({_escape(line)}) Tj ET')
+    return '\n'.join(ops)
+
+
+def build_pdf(streams: List[str]) -> bytes:
+    """Assemble one page per content stream into a PDF file."""
+    n = len(streams)
+    objects = ['<< /Type /Catalog /Pages 2 0 R >>',
+               '<< /Type /Pages /Kids [%s] /Count %d >>' % (' '.join(f'{4 + 2 * i} 0 R' for i in range(n)), n),
+               '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>']
+    for i, stream in enumerate(streams):
+        data = stream.encode('latin-1', 'replace')
+        objects.append(f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_W} {PAGE_H}] '
+                       f'/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>')
+        objects.append(f'<< /Length {len(data)} >>\nstream\n{stream}\nendstream')
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for num, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f'{num} 0 obj\n{body}\nendobj\n'.encode('latin-1', 'replace')
+    xref = len(out)
+    out += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode()
+    for off in offsets:
+        out += f'{off:010d} 00000 n \n'.encode()
+    out += f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode()
+    return bytes(out)
+
+
+def text_pdf(pages: List[List[str]]) -> bytes:
+    """A PDF with the given lines of text on each page."""
+    return build_pdf([_text_stream(lines) for lines in pages])
+
+
+STATEMENT_LAYOUTS = {
+    # debits and credits in separate columns, dd/mm/yy dates
+    'split': (['Date', 'Narration', 'Chq./Ref.No.', 'Value Dt', 'Withdrawal Amt.', 'Deposit Amt.', 'Closing Balance'],
+              [50, 170, 70, 50, 70, 70, 75]),
+    # one amount column plus a Dr/Cr column, '15 Mar 2024' dates
+    'drcr': (['Txn Date', 'Description', 'Amount', 'Dr/Cr', 'Balance'], [70, 230, 80, 40, 90]),
+    # one signed amount column (debits negative), ISO dates
+    'signed': (['Date', 'Details', 'Amount (INR)', 'Balance'], [70, 260, 90, 90]),
+}
+STATEMENT_HEADER, STATEMENT_WIDTHS = STATEMENT_LAYOUTS['split']
+_PAYEES = ['UPI-ZOMATO', 'UPI-SWIGGY', 'POS AMAZON', 'NEFT SALARY', 'ATM WDL', 'ACH ELECTRICITY',
+           'UPI-UBER', 'IMPS REFUND', 'POS BIGBASKET', 'CHQ DEP']
+
+
+def _statement_row(layout: str, day: datetime, payee: str, ref: str, amount: float, credit: bool, balance: float):
+    money = f'{amount:,.2f}'
+    if layout == 'drcr':
+        return [day.strftime('%d %b %Y'), payee, money, 'Cr' if credit else 'Dr', f'{balance:,.2f}']
+    if layout == 'signed':
+        return [day.strftime('%Y-%m-%d'), payee, money if credit else f'-{money}', f'{balance:,.2f}']
+    date = day.strftime('%d/%m/%y')
+    return [date, payee, ref, date, '' if credit else money, money if credit else '', f'{balance:,.2f}']
+
+
+def statement_pdf(pages: int = 50, rows_per_page: int = 45, seed: int = 7,
+                  start: Optional[datetime] = None, layout: str = 'split'):
+    """
+    A bank statement whose header repeats on every page, in one of
+    STATEMENT_LAYOUTS (default 'split': dd/mm/yy dates, debits / credits in
+    separate columns). Returns (pdf bytes, expected rows) where expected rows
+    are {amount, date (YYYY-MM-DD), type}.
+    """
+    header, widths = STATEMENT_LAYOUTS[layout]
+    rnd = random.Random(seed)
+    day = start or datetime(2023, 4, 1)
+    balance = 25000.0
+    streams, expected = [], []
+    for _ in range(pages):
+        rows = [header]
+        for _ in range(rows_per_page):
+            day += timedelta(hours=rnd.randint(3, 30))
+            credit = rnd.random() < 0.2
+            amount = round(rnd.uniform(50, 20000 if credit else 3000), 2)
+            balance += amount if credit else -amount
+            rows.append(_statement_row(layout, day, f'{rnd.choice(_PAYEES)}-{rnd.randint(1000, 99999)}',
+                                       f'{rnd.randint(0, 10**9):010d}', amount, credit, balance))
+            expected.append({'amount': amount, 'date': day.strftime('%Y-%m-%d'),
+                             'type': 'income' if credit else 'expense'})
+        streams.append(_table_stream(rows, widths))
+    return build_pdf(streams), expected
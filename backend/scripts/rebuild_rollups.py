@@ -0,0 +1,24 @@
+"""
+Rebuild the per-day transaction rollups (tx_rollups) from the transactions collection.
+
+    cd backend
+    python -m scripts.rebuild_rollups            # every user
+    python -m scripts.rebuild_rollups --user ID  # one user
+"""
+import argparse
+import asyncio
+
+from app import crud
+
+
+async def main(user_id):
+    await crud.ensure_indexes()
+    await crud.rebuild_rollups(user_id)
+    scope = {'user_id': crud.ObjectId(user_id)} if user_id else {}
+    print(f'rollup buckets: {await crud.get_db()[crud.ROLLUP_COL].count_documents(scope)}')
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--user', default=None, help='user id to rebuild (default: all users)')
+    asyncio.run(main(ap.parse_args().user))
@@ -0,0 +1,216 @@
+"""
+Seed a local MongoDB with synthetic users, categories and transactions.
+
+    cd backend
+    DB_NAME=pfa_load python -m scripts.seed_data --users 50 --transactions 1000000
+    DB_NAME=pfa_load python -m scripts.seed_data --reset          # remove seeded users and their data
+
+Users are seed-00000@example.com, seed-00001@example.com, ... all with
+--password, so bench.load_suite can log in as them. Volume per user is skewed
+(a few heavy users, a long tail), and each user gets a monthly salary, rent
+and utilities plus day-to-day expenses whose category mix, amounts
+(log-normal per category), weekday / weekend and seasonal pattern look like
+a real account. Rows are written with unordered insert_many in batches from
+--concurrency writers, then the dashboard rollups are rebuilt per user.
+Tens of millions of rows are fine; generation, not Mongo, is usually the limit.
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List
+
+from bson import ObjectId
+
+from app import crud
+from app.auth import hash_password
+from app.routes import DEFAULT_EXPENSE_CATEGORIES, DEFAULT_INCOME_CATEGORIES
+
+EMAIL_FORMAT = 'seed-{:05d}@example.com'
+EMAIL_PATTERN = r'^seed-\d+@example\.com$'
+DEFAULT_PASSWORD = 'Passw0rd!'
+
+# category -> (relative frequency, log-normal mu, sigma) for day-to-day expenses
+EXPENSE_MIX = {
+    'Groceries': (24, 3.6, 0.7),
+    'Transport': (20, 2.6, 0.8),
+    'Dining': (18, 3.2, 0.6),
+    'Misc': (14, 3.0, 1.0),
+    'Entertainment': (9, 3.4, 0.8),
+    'Health': (5, 3.8, 1.0),
+    'Education': (3, 4.5, 1.0),
+    'Utilities': (2, 3.5, 0.5),
+}
+WEEKEND_BOOST = {'Dining': 1.8, 'Entertainment': 2.0, 'Groceries': 1.3}
+SEASONAL = {11: 1.15, 12: 1.35, 1: 0.9}  # month -> spending multiplier
+NOTES = {
+    'Groceries': ['BigBasket', 'DMart', 'Local market', 'Reliance Fresh'],
+    'Transport': ['Uber', 'Ola', 'Metro card', 'Fuel'],
+    'Dining': ['Zomato', 'Swiggy', 'Cafe', 'Restaurant'],
+    'Misc': ['Amazon', 'Flipkart', 'Stationery', 'Gift'],
+    'Entertainment': ['Netflix', 'Movie tickets', 'Concert', 'Spotify'],
+    'Health': ['Pharmacy', 'Clinic', 'Lab test'],
+    'Education': ['Course fee', 'Books', 'Exam fee'],
+    'Utilities': ['Mobile recharge', 'Internet', 'Water bill'],
+}
+
+
+def user_volumes(total: int, users: int, rnd: random.Random) -> List[int]:
+    """Split total rows across users with a heavy-tailed (Pareto) share each."""
+    weights = [rnd.paretovariate(1.5) for _ in range(users)]
+    scale = total / sum(weights)
+    counts = [int(w * scale) for w in weights]
+    counts[0] += total - sum(counts)
+    return counts
+
+
+def _recurring(user_id: ObjectId, start: datetime, end: datetime, rnd: random.Random, now: datetime) -> Iterator[dict]:
+    salary = round(rnd.uniform(30_000, 250_000), -2)
+    rent = round(salary * rnd.uniform(0.15, 0.35), -2)
+    electricity = rnd.uniform(800, 4000)
+    month = datetime(start.year, start.month, 1)
+    while month <= end:
+        for day, tx_type, category, amount, note in (
+            (1, 'income', 'Salary', salary, 'Monthly salary'),
+            (5, 'expense', 'Rent', rent, 'House rent'),
+            (12, 'expense', 'Utilities', round(electricity * rnd.uniform(0.7, 1.4), 2), 'Electricity bill'),
+        ):
+            date = month.replace(day=day, hour=rnd.randint(8, 20), minute=rnd.randint(0, 59))
+            if start <= date <= end:
+                yield {'user_id': user_id, 'type': tx_type, 'amount': amount, 'category': category,
+                       'note': note, 'date': date, 'created_at': now}
+        month = (month + timedelta(days=32)).replace(day=1)
+
+
+def _daily(user_id: ObjectId, count: int, start: datetime, end: datetime, rnd: random.Random,
+           now: datetime) -> Iterator[dict]:
+    cats = list(EXPENSE_MIX)
+    freqs = [EXPENSE_MIX[c][0] for c in cats]
+    extra_income = [c['name'] for c in DEFAULT_INCOME_CATEGORIES if c['name'] != 'Salary']
+    span = (end - start).total_seconds()
+    for _ in range(count):
+        if rnd.random() < 0.04:
+            date = start + timedelta(seconds=rnd.random() * span)
+            yield {'user_id': user_id, 'type': 'income', 'amount': round(rnd.lognormvariate(8.5, 1.0), 2),
+                   'category': rnd.choice(extra_income), 'note': 'Credit', 'date': date, 'created_at': now}
+            continue
+        category = rnd.choices(cats, freqs)[0]
+        # rejection-sample the date so weekends and the holiday season carry more of the spend
+        while True:
+            date = start + timedelta(seconds=rnd.random() * span)
+            weight = SEASONAL.get(date.month, 1.0) * (WEEKEND_BOOST.get(category, 1.0) if date.weekday() >= 5 else 1.0)
+            if rnd.random() * 2.7 < weight:
+                break
+        hour = min(23, max(6, int(rnd.gauss(15, 4))))
+        date = date.replace(hour=hour)
+        _, mu, sigma = EXPENSE_MIX[category]
+        yield {'user_id': user_id, 'type': 'expense', 'amount': round(rnd.lognormvariate(mu, sigma), 2),
+               'category': category, 'note': rnd.choice(NOTES[category]), 'date': date, 'created_at': now}
+
+
+def user_rows(user_id: ObjectId, count: int, years: float, seed: int) -> Iterator[dict]:
+    rnd = random.Random(seed)
+    now = datetime.utcnow()
+    end = now.replace(microsecond=0)
+    start = end - timedelta(days=int(365 * years))
+    recurring = list(_recurring(user_id, start, end, rnd, now))[:count]
+    yield from recurring
+    yield from _daily(user_id, count - len(recurring), start, end, rnd, now)
+
+
+def batches(rows: Iterator[dict], size: int) -> Iterator[List[dict]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def seed_users(n: int, password: str) -> List[ObjectId]:
+    hashed = hash_password(password)  # one bcrypt hash shared by every seeded user
+    ids = []
+    for i in range(n):
+        user = await crud.create_user({'email': EMAIL_FORMAT.format(i), 'password': hashed})
+        ids.append(user['_id'])
+    return ids
+
+
+async def insert_rows(user_id: ObjectId, count: int, args, seed: int, progress: Dict[str, int]):
+    col = crud.get_db()[crud.TRAN_COL]
+    queue: asyncio.Queue = asyncio.Queue(maxsize=args.concurrency * 2)
+
+    async def writer():
+        while True:
+            batch = await queue.get()
+            if batch is None:
+                return
+            await col.insert_many(batch, ordered=False)
+            progress['rows'] += len(batch)
+
+    writers = [asyncio.create_task(writer()) for _ in range(args.concurrency)]
+    try:
+        for batch in batches(user_rows(user_id, count, args.years, seed), args.batch_size):
+            await queue.put(batch)
+        for _ in writers:
+            await queue.put(None)
+        await asyncio.gather(*writers)
+    except BaseException:
+        for w in writers:
+            w.cancel()
+        raise
+
+
+async def reset():
+    db = crud.get_db()
+    ids = [u['_id'] async for u in db[crud.USERS_COL].find({'email': {'$regex': EMAIL_PATTERN}}, {'_id': 1})]
+    if ids:
+        await db[crud.TRAN_COL].delete_many({'user_id': {'$in': ids}})
+        await db[crud.ROLLUP_COL].delete_many({'user_id': {'$in': ids}})
+        await db[crud.USERS_COL].delete_many({'_id': {'$in': ids}})
+    print(f'removed {len(ids)} seeded users and their transactions')
+
+
+async def main(args):
+    if args.reset:
+        await reset()
+        return
+    await crud.ensure_indexes()
+    await crud.seed_categories(DEFAULT_INCOME_CATEGORIES + DEFAULT_EXPENSE_CATEGORIES)
+    rnd = random.Random(args.seed)
+    user_ids = await seed_users(args.users, args.password)
+    volumes = user_volumes(args.transactions, args.users, rnd)
+    progress = {'rows': 0}
+    t0 = time.perf_counter()
+    last_report = t0
+    for i, (user_id, count) in enumerate(zip(user_ids, volumes)):
+        await insert_rows(user_id, count, args, args.seed * 100_003 + i, progress)
+        await crud.rebuild_rollups(user_id)
+        now = time.perf_counter()
+        if now - last_report > 5 or i == len(user_ids) - 1:
+            last_report = now
+            print(f'{i + 1}/{len(user_ids)} users, {progress["rows"]:,} rows, '
+                  f'{progress["rows"] / (now - t0):,.0f} rows/s')
+    heaviest = max(volumes) if volumes else 0
+    print(f'seeded {args.users} users ({EMAIL_FORMAT.format(0)} ... password {args.password!r}), '
+          f'{progress["rows"]:,} transactions in {time.perf_counter() - t0:.1f}s; '
+          f'heaviest user {heaviest:,} rows, median {sorted(volumes)[len(volumes) // 2] if volumes else 0:,}')
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--users', type=int, default=20)
+    ap.add_argument('--transactions', type=int, default=200_000, help='total rows across all users')
+    ap.add_argument('--years', type=float, default=3.0, help='history length ending today')
+    ap.add_argument('--batch-size', type=int, default=5000)
+    ap.add_argument('--concurrency', type=int, default=4, help='concurrent insert_many writers')
+    ap.add_argument('--password', default=DEFAULT_PASSWORD)
+    ap.add_argument('--seed', type=int, default=42)
+    ap.add_argument('--reset', action='store_true', help='delete previously seeded users and their data, then exit')
+    args = ap.parse_args()
+    if args.users < 1 or args.transactions < 0:
+        ap.error('--users must be >= 1 and --transactions >= 0')
+    asyncio.run(main(args))
@@ -0,0 +1,121 @@
+"""
+Check that every crud query shape is served by an index.
+
+Seeds a scratch database on a local mongod, runs ensure_indexes, then runs
+explain() on each query the API issues (listing, count, category and daily
+aggregations, the dashboard $facet and the largest-transactions lookup; with
+and without date range and type filters). Exits non-zero
+if any winning plan contains a COLLSCAN or an in-memory SORT stage.
+
+    cd backend
+    python -m scripts.verify_indexes [--db pfa_index_check] [--rows 5000] [--keep]
+"""
+import argparse
+import asyncio
+import random
+import sys
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from app import crud
+from app import db as app_db
+
+BAD_STAGES = {'COLLSCAN', 'SORT'}
+LIST_SORT = [('date', -1), ('_id', -1)]
+
+
+def plan_stages(node) -> list:
+    """Collect every 'stage' name in an explain tree (classic and SBE layouts)."""
+    found = []
+    if isinstance(node, dict):
+        if isinstance(node.get('stage'), str):
+            found.append(node['stage'])
+        for key, value in node.items():
+            if key in ('rejectedPlans', 'allPlansExecution'):
+                continue
+            found.extend(plan_stages(value))
+    elif isinstance(node, list):
+        for item in node:
+            found.extend(plan_stages(item))
+    return found
+
+
+async def seed(db, users: int, rows: int):
+    base = datetime(2023, 1, 1)
+    user_ids = [ObjectId() for _ in range(users)]
+    cats = ['Groceries', 'Transport', 'Dining', 'Rent', 'Salary', 'Misc']
+    docs = []
+    for uid in user_ids:
+        for _ in range(rows):
+            docs.append({'user_id': uid, 'type': random.choice(['expense', 'expense', 'income']),
+                         'category': random.choice(cats), 'amount': round(random.uniform(1, 900), 2),
+                         'date': base + timedelta(minutes=random.randint(0, 730 * 24 * 60)),
+                         'note': '', 'created_at': base})
+    await db[crud.TRAN_COL].insert_many(docs, ordered=False)
+    return user_ids
+
+
+def query_shapes(user_id: ObjectId):
+    start, end = datetime(2023, 3, 1), datetime(2023, 6, 30)
+    filters = {
+        'all': (None, None, None),
+        'range': (start, end, None),
+        'type': (None, None, 'expense'),
+        'range+type': (start, end, 'expense'),
+    }
+    for label, (s, e, t) in filters.items():
+        match = crud.tx_query(user_id, s, e, t)
+        rollups = crud.rollup_query(user_id, s, e, t)
+        yield f'get_transactions[{label}]', crud.TRAN_COL, 'find', (match, LIST_SORT)
+        yield f'count_transactions[{label}]', crud.TRAN_COL, 'aggregate', [
+            {'$match': match}, {'$group': {'_id': 1, 'n': {'$sum': 1}}}]
+        yield f'aggregate_by_category[{label}]', crud.ROLLUP_COL, 'aggregate', crud.category_pipeline(rollups)
+        yield f'aggregate_by_date[{label}]', crud.ROLLUP_COL, 'aggregate', crud.date_pipeline(rollups)
+        seek = dict(match, date=dict(match.get('date', {}), **{'$lte': datetime(2023, 5, 1)}),
+                    **{'$nor': [{'date': datetime(2023, 5, 1), '_id': {'$gte': ObjectId()}}]})
+        yield f'get_transactions[{label}+cursor]', crud.TRAN_COL, 'find', (seek, LIST_SORT)
+        yield f'dashboard_summary[{label}]', crud.ROLLUP_COL, 'aggregate', crud.dashboard_pipeline(user_id, s, e, t)
+        yield (f'top_transactions[{label}]', crud.TRAN_COL, 'find',
+               (crud.tx_query(user_id, s, e, t or 'expense'), crud.TOP_SORT))
+
+
+async def explain(db, collection: str, kind: str, spec) -> dict:
+    if kind == 'find':
+        match, sort = spec
+        return await db[collection].find(match).sort(sort).limit(10).explain()
+    return await db.command('explain', {'aggregate': collection, 'pipeline': spec, 'cursor': {}},
+                            verbosity='queryPlanner')
+
+
+async def main(args) -> int:
+    app_db.DB_NAME = args.db  # point crud helpers (ensure_indexes) at the scratch database
+    db = app_db.get_db()
+    await db[crud.TRAN_COL].drop()
+    await db[crud.ROLLUP_COL].drop()
+    try:
+        user_ids = await seed(db, args.users, args.rows)
+        await crud.ensure_indexes()
+        await crud.rebuild_rollups()
+        failures = 0
+        for name, collection, kind, spec in query_shapes(user_ids[0]):
+            stages = plan_stages(await explain(db, collection, kind, spec))
+            bad = sorted(BAD_STAGES.intersection(stages))
+            status = 'FAIL' if bad else 'ok'
+            failures += bool(bad)
+            print(f'{status:4}  {name:36}  {" > ".join(stages)}')
+        print(f'\n{failures} query shape(s) without index support' if failures else '\nall query shapes use indexes')
+        return 1 if failures else 0
+    finally:
+        if not args.keep:
+            await db[crud.TRAN_COL].drop()
+            await db[crud.ROLLUP_COL].drop()
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--db', default='pfa_index_check')
+    ap.add_argument('--users', type=int, default=3)
+    ap.add_argument('--rows', type=int, default=5000, help='transactions per user')
+    ap.add_argument('--keep', action='store_true', help='keep the seeded collections')
+    sys.exit(asyncio.run(main(ap.parse_args())))
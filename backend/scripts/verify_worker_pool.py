@@ -0,0 +1,73 @@
+"""
+Check the document worker pool's timeout handling (no database needed).
+
+    cd backend
+    python -m scripts.verify_worker_pool
+
+  saturated   a one-worker pool with a 1 s timeout gets more 0.6 s tasks than it
+              can run at once; every task must succeed (time spent waiting for
+              the worker does not count against the timeout)
+  stuck       a task that never finishes times out, its worker process is
+              killed, and the healthy tasks running beside it still succeed on
+              the replacement pool
+Exits non-zero if either check fails.
+"""
+import asyncio
+import sys
+import time
+
+from app import workers
+
+
+def busy(seconds: float) -> float:
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+    return seconds
+
+
+async def saturated() -> list:
+    workers.DOC_WORKERS = 1
+    results = await asyncio.gather(*(workers.run_in_pool(busy, 0.6, timeout=1.0) for _ in range(4)),
+                                   return_exceptions=True)
+    return [f'task {i}: {r!r}' for i, r in enumerate(results) if isinstance(r, BaseException)]
+
+
+async def stuck() -> list:
+    workers.DOC_WORKERS = 2
+    stuck_task = asyncio.ensure_future(workers.run_in_pool(busy, 60, timeout=1.0))
+    healthy = [asyncio.ensure_future(workers.run_in_pool(busy, 1.5, timeout=5.0)) for _ in range(3)]
+    await asyncio.sleep(0.5)
+    procs = list(workers.get_pool()._processes.values())
+    problems = []
+    try:
+        await stuck_task
+        problems.append('stuck task returned instead of timing out')
+    except workers.WorkerTimeout:
+        pass
+    for i, r in enumerate(await asyncio.gather(*healthy, return_exceptions=True)):
+        if isinstance(r, BaseException):
+            problems.append(f'healthy task {i}: {r!r}')
+    await asyncio.sleep(0.5)
+    alive = [p.pid for p in procs if p.is_alive()]
+    if alive:
+        problems.append(f'worker processes of the timed-out pool still alive: {alive}')
+    return problems
+
+
+def main() -> int:
+    failures = 0
+    for name, check in (('saturated', saturated), ('stuck', stuck)):
+        try:
+            problems = asyncio.run(check())
+        finally:
+            workers.shutdown_pool()
+        failures += bool(problems)
+        print(f'{"FAIL" if problems else "ok":4}  {name}')
+        for p in problems:
+            print(f'      {p}')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
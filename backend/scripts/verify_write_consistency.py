@@ -0,0 +1,173 @@
+"""
+Check that writes keep the dashboard rollups and cache versions consistent when things go wrong,
+and that paging stays consistent with the stored (naive UTC) dates.
+
+Runs against a scratch database on a local mongod (dropped afterwards unless
+--keep). Each check prints ok / FAIL; the script exits non-zero on any FAIL.
+
+    cd backend
+    python -m scripts.verify_write_consistency [--db pfa_consistency_check] [--keep]
+
+  bulk_chunk_failure   create_transactions_bulk where a later chunk's insert_many
+                       writes half its rows and then raises AutoReconnect: the
+                       error propagates, and tx_rollups (compared with a full
+                       rebuild) and data_version account for every row that landed
+  batch_update_deleted_concurrently
+                       apply_transaction_batch where another request deletes an
+                       update's document between the before-image read and the
+                       bulk_write: that update is reported not_found, the others
+                       ok, and tx_rollups still equal a full rebuild
+  cursor_with_aware_end
+                       get_transactions paged by cursor with a timezone-aware end
+                       (+05:30) returns, page by page, exactly the rows of one
+                       unpaged listing, without a naive/aware comparison error
+"""
+import argparse
+import asyncio
+import sys
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo.errors import AutoReconnect
+
+from app import crud
+from app import db as app_db
+
+
+def sample_rows(n: int, base: datetime = datetime(2024, 1, 1)):
+    cats = ['Groceries', 'Transport', 'Dining']
+    return [{'type': 'expense', 'amount': 10 + i % 7, 'category': cats[i % 3], 'note': '',
+             'date': base + timedelta(hours=7 * i)} for i in range(n)]
+
+
+async def rollup_snapshot(user_id: ObjectId):
+    rows = crud.get_db()[crud.ROLLUP_COL].find({'user_id': user_id}, {'_id': 0})
+    return sorted(((d['day'], d['type'], d['category'], round(d['total'], 6), d['count']) async for d in rows),
+                  key=repr)
+
+
+async def rollups_match_rebuild(user_id: ObjectId) -> list:
+    incremental = await rollup_snapshot(user_id)
+    await crud.rebuild_rollups(user_id)
+    rebuilt = await rollup_snapshot(user_id)
+    return [] if incremental == rebuilt else [f'rollups differ from a rebuild: {incremental} != {rebuilt}']
+
+
+@contextmanager
+def failing_insert_many(fail_on_call: int):
+    """insert_many writes the first half of its documents and raises AutoReconnect on the given call."""
+    original = AsyncIOMotorCollection.insert_many
+    calls = {'n': 0}
+
+    async def insert_many(self, documents, *args, **kwargs):
+        calls['n'] += 1
+        if calls['n'] == fail_on_call:
+            documents = list(documents)
+            await original(self, documents[:len(documents) // 2], *args, **kwargs)
+            raise AutoReconnect('injected connection failure')
+        return await original(self, documents, *args, **kwargs)
+
+    AsyncIOMotorCollection.insert_many = insert_many
+    try:
+        yield
+    finally:
+        AsyncIOMotorCollection.insert_many = original
+
+
+async def bulk_chunk_failure() -> list:
+    user_id = ObjectId()
+    version = crud.data_version(user_id)
+    problems = []
+    with failing_insert_many(fail_on_call=3):
+        try:
+            await crud.create_transactions_bulk(user_id, sample_rows(50), chunk_size=10)
+            problems.append('create_transactions_bulk did not raise')
+        except AutoReconnect:
+            pass
+    stored = await crud.get_db()[crud.TRAN_COL].count_documents({'user_id': user_id})
+    if stored != 25:  # two full chunks + half of the third
+        problems.append(f'expected 25 stored rows, found {stored}')
+    if crud.data_version(user_id) == version:
+        problems.append('data_version not bumped for the rows that were committed')
+    return problems + await rollups_match_rebuild(user_id)
+
+
+@contextmanager
+def delete_before_bulk_write(user_id: ObjectId, tx_id: str):
+    """bulk_write first deletes tx_id through crud.delete_transaction, as a concurrent request would."""
+    original = AsyncIOMotorCollection.bulk_write
+    pending = [tx_id]
+
+    async def bulk_write(self, requests, *args, **kwargs):
+        if pending and self.name == crud.TRAN_COL:
+            await crud.delete_transaction(user_id, pending.pop())
+        return await original(self, requests, *args, **kwargs)
+
+    AsyncIOMotorCollection.bulk_write = bulk_write
+    try:
+        yield
+    finally:
+        AsyncIOMotorCollection.bulk_write = original
+
+
+async def batch_update_deleted_concurrently() -> list:
+    user_id = ObjectId()
+    await crud.create_transactions_bulk(user_id, sample_rows(6))
+    ids = [d['id'] for d in await crud.get_transactions(user_id, limit=10)]
+    ops = [{'index': i, 'op': 'update', 'id': tx_id, 'data': {'amount': 99.0}} for i, tx_id in enumerate(ids[:3])]
+    with delete_before_bulk_write(user_id, ids[1]):
+        results = await crud.apply_transaction_batch(user_id, ops)
+    statuses = [r['status'] for r in results]
+    problems = [] if statuses == ['ok', 'not_found', 'ok'] else [f'unexpected statuses {statuses}']
+    return problems + await rollups_match_rebuild(user_id)
+
+
+async def cursor_with_aware_end() -> list:
+    user_id = ObjectId()
+    await crud.create_transactions_bulk(user_id, sample_rows(40))
+    end = datetime(2024, 1, 10, 5, 30, tzinfo=timezone(timedelta(hours=5, minutes=30)))  # 2024-01-10 00:00 UTC
+    expected = [d['id'] for d in await crud.get_transactions(user_id, end=end, limit=100)]
+    paged, after = [], None
+    while True:
+        page = await crud.get_transactions(user_id, end=end, limit=7, after=after)
+        paged += [d['id'] for d in page]
+        if len(page) < 7:
+            break
+        after = crud.decode_cursor(crud.encode_cursor(page[-1]['date'], page[-1]['id']))
+    problems = [] if paged == expected else [f'paged ids differ from one listing: {len(paged)} vs {len(expected)} rows']
+    if len(expected) != 31:  # rows at 7 h steps up to 2024-01-10 00:00 UTC
+        problems.append(f'expected 31 rows up to the aware end, found {len(expected)}')
+    return problems
+
+
+CHECKS = [bulk_chunk_failure, batch_update_deleted_concurrently, cursor_with_aware_end]
+
+
+async def main(args) -> int:
+    app_db.DB_NAME = args.db  # point the crud helpers at the scratch database
+    db = app_db.get_db()
+    for col in (crud.TRAN_COL, crud.ROLLUP_COL):
+        await db[col].drop()
+    try:
+        await crud.ensure_indexes()
+        failures = 0
+        for check in CHECKS:
+            problems = await check()
+            failures += bool(problems)
+            print(f'{"FAIL" if problems else "ok":4}  {check.__name__}')
+            for p in problems:
+                print(f'      {p}')
+        return 1 if failures else 0
+    finally:
+        if not args.keep:
+            for col in (crud.TRAN_COL, crud.ROLLUP_COL):
+                await db[col].drop()
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--db', default='pfa_consistency_check')
+    ap.add_argument('--keep', action='store_true', help='keep the scratch collections')
+    sys.exit(asyncio.run(main(ap.parse_args())))
@@ -56,24 +56,17 @@ export default function Charts({ categories, refreshCounter }) {
       setLastParams(params);
       console.log("[Charts] calling with params=", params);
 
-      const [cRes, dRes] = await Promise.all([
-        api.get("/aggregate/category", { params }).catch((e) => {
-          console.error("agg/category err", e);
-          return { data: [] };
-        }),
-        api.get("/aggregate/date", { params }).catch((e) => {
-          console.error("agg/date err", e);
-          return { data: [] };
-        }),
-      ]);
-
-      console.log("[Charts] /aggregate/category =>", cRes.data);
-      console.log("[Charts] /aggregate/date     =>", dRes.data);
-
-      setByCat(cRes.data || []);
+      const res = await api.get("/dashboard", { params }).catch((e) => {
+        console.error("dashboard err", e);
+        return { data: {} };
+      });
+
+      console.log("[Charts] /dashboard =>", res.data);
+
+      setByCat(res.data.by_category || []);
 
       // sort by date to ensure line chart ordering (and coerce date to ISO for sorting)
-      const rawDates = (dRes.data || []).slice();
+      const rawDates = (res.data.by_date || []).slice();
       rawDates.sort((a, b) => {
         const da = new Date(a.date).getTime() || 0;
         const db = new Date(b.date).getTime() || 0;
@@ -39,6 +39,38 @@ export default function UploadReceipt({ categories, onRefresh }) {
     setCreating(false);
   }
 
+  async function createAllParsed() {
+    const items = resp?.parsed || [];
+    if (!items.length) return;
+    setCreating(true);
+    try {
+      const r = await api.post("/transactions/batch", {
+        operations: items.map((p) => ({
+          op: "create",
+          data: {
+            type: "expense",
+            amount: p.amount,
+            category: p.category || "Receipt",
+            note: "Parsed from OCR",
+            date: p.date,
+          },
+        })),
+      });
+      const created = new Set(
+        r.data.results.filter((x) => x.status === "ok").map((x) => x.index)
+      );
+      setResp((prev) => ({
+        ...prev,
+        parsed: (prev.parsed || []).filter((_, i) => !created.has(i)),
+      }));
+      if (r.data.failed) alert(`${r.data.failed} item(s) could not be created`);
+      onRefresh && onRefresh();
+    } catch (e) {
+      alert("Create failed: " + (e.response?.data?.detail || e.message));
+    }
+    setCreating(false);
+  }
+
   return (
     <div>
       <h4>Upload Receipt</h4>
@@ -62,6 +94,14 @@ export default function UploadReceipt({ categories, onRefresh }) {
         {resp && resp.parsed && resp.parsed.length > 0 && (
           <div>
             <h5>Parsed Transactions</h5>
+            <button
+              className="btn"
+              disabled={creating}
+              style={{ marginBottom: 8 }}
+              onClick={createAllParsed}
+            >
+              Create All ({resp.parsed.length})
+            </button>
             {resp.parsed.map((p, idx) => (
               <div
                 key={idx}